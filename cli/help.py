@@ -4,6 +4,7 @@ def show_usage():
         "\n\tpython teos_cli.py [global options] command [command options] [arguments]"
         "\n\nCOMMANDS:"
         "\n\tadd_appointment \tRegisters a json formatted appointment with the tower."
+        "\n\tadd_appointments \tRegisters a json formatted list of appointments with the tower."
         "\n\tget_appointment \tGets json formatted data about an appointment from the tower."
         "\n\thelp \t\t\tShows a list of commands or help for a specific command."
         "\n\nGLOBAL OPTIONS:"
@@ -30,6 +31,22 @@ def help_add_appointment():
     )
 
 
+def help_add_appointments():
+    return (
+        "NAME:"
+        "\tpython teos_cli add_appointments - Registers a json formatted list of appointments to the tower."
+        "\n\nUSAGE:"
+        "\tpython teos_cli add_appointments [command options] appointments/path_to_appointments_file"
+        "\n\nDESCRIPTION:"
+        "\n\n\tRegisters a json formatted list of appointments to the tower using a single request."
+        "\n\tif -f, --file *is* specified, then the command expects a path to a json file instead of a json encoded "
+        "\n\tstring as parameter."
+        "\n\nOPTIONS:"
+        "\n\t -f, --file path_to_json_file\t loads the appointments data from the specified json file instead of"
+        "\n\t\t\t\t\t command line"
+    )
+
+
 def help_get_appointment():
     return (
         "NAME:"
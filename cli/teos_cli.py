@@ -11,7 +11,7 @@ from getopt import getopt, GetoptError
 from requests import ConnectTimeout, ConnectionError
 from requests.exceptions import MissingSchema, InvalidSchema, InvalidURL
 
-from cli.help import show_usage, help_add_appointment, help_get_appointment
+from cli.help import show_usage, help_add_appointment, help_add_appointments, help_get_appointment
 from cli import DEFAULT_CONF, DATA_DIR, CONF_FILE_NAME, LOG_PREFIX
 
 import common.cryptographer
@@ -133,31 +133,11 @@ def add_appointment(args, teos_url, config):
         logger.error("The provided appointment JSON is empty")
         return False
 
-    valid_txid = check_sha256_hex_format(appointment_data.get("tx_id"))
-
-    if not valid_txid:
-        logger.error("The provided txid is not valid")
-        return False
-
-    tx_id = appointment_data.get("tx_id")
-    tx = appointment_data.get("tx")
+    appointment, data = build_appointment(appointment_data, cli_sk, hex_pk_der)
 
-    if None not in [tx_id, tx]:
-        appointment_data["locator"] = compute_locator(tx_id)
-        appointment_data["encrypted_blob"] = Cryptographer.encrypt(Blob(tx), tx_id)
-
-    else:
-        logger.error("Appointment data is missing some fields")
+    if appointment is None:
         return False
 
-    appointment = Appointment.from_dict(appointment_data)
-    signature = Cryptographer.sign(appointment.serialize(), cli_sk)
-
-    if not (appointment and signature):
-        return False
-
-    data = {"appointment": appointment.to_dict(), "signature": signature, "public_key": hex_pk_der.decode("utf-8")}
-
     # Send appointment to the server.
     server_response = post_appointment(data, add_appointment_endpoint)
     if server_response is None:
@@ -185,6 +165,143 @@ def add_appointment(args, teos_url, config):
     return save_appointment_receipt(appointment.to_dict(), signature, config)
 
 
+def add_appointments(args, teos_url, config):
+    """
+    Manages the add_appointments command. Works as :func:`add_appointment`, but for a list of appointments that are
+    sent to the tower in a single request.
+
+    Args:
+        args (:obj:`list`): a list of arguments to pass to ``parse_add_appointment_args``. Must contain a json encoded
+            list of appointments, or the file option and the path to a file containing one.
+        teos_url (:obj:`str`): the teos base url.
+        config (:obj:`dict`): a config dictionary following the format of :func:`create_config_dict <common.config_loader.ConfigLoader.create_config_dict>`.
+
+    Returns:
+        :obj:`bool`: True if all the appointments are accepted by the tower and their receipts are properly stored,
+        false otherwise (the receipts of the accepted ones are stored anyway).
+    """
+
+    add_appointments_endpoint = "{}/add_appointments".format(teos_url)
+
+    teos_pk, cli_sk, cli_pk_der = load_keys(
+        config.get("TEOS_PUBLIC_KEY"), config.get("CLI_PRIVATE_KEY"), config.get("CLI_PUBLIC_KEY")
+    )
+
+    try:
+        hex_pk_der = binascii.hexlify(cli_pk_der)
+
+    except binascii.Error as e:
+        logger.error("Could not successfully encode public key as hex", error=str(e))
+        return False
+
+    if teos_pk is None:
+        return False
+
+    appointments_data = parse_add_appointment_args(args)
+
+    if not isinstance(appointments_data, list) or len(appointments_data) == 0:
+        logger.error("The provided appointments JSON is not a list of appointments or is empty")
+        return False
+
+    appointments = []
+    requests_data = []
+    for appointment_data in appointments_data:
+        appointment, data = build_appointment(appointment_data, cli_sk, hex_pk_der)
+
+        if appointment is None:
+            return False
+
+        appointments.append(appointment)
+        requests_data.append(data)
+
+    server_response = post_appointment({"appointments": requests_data}, add_appointments_endpoint)
+    if server_response is None:
+        return False
+
+    response_json = process_post_appointment_response(server_response)
+
+    if response_json is None:
+        return False
+
+    results = response_json.get("appointments")
+
+    if not isinstance(results, list) or len(results) != len(appointments):
+        logger.error("The response does not contain a result for every appointment")
+        return False
+
+    all_accepted = True
+    for appointment, result in zip(appointments, results):
+        signature = result.get("signature")
+
+        if signature is None:
+            logger.error("Appointment rejected", locator=appointment.locator, error=result.get("error"))
+            all_accepted = False
+            continue
+
+        rpk = Cryptographer.recover_pk(appointment.serialize(), signature)
+        if not Cryptographer.verify_rpk(teos_pk, rpk):
+            logger.error("The returned appointment's signature is invalid", locator=appointment.locator)
+            all_accepted = False
+            continue
+
+        logger.info("Appointment accepted and signed by the Eye of Satoshi", locator=appointment.locator)
+
+        if not save_appointment_receipt(appointment.to_dict(), signature, config):
+            all_accepted = False
+
+    return all_accepted
+
+
+def build_appointment(appointment_data, cli_sk, hex_pk_der):
+    """
+    Builds an appointment from the data provided by the user and signs it.
+
+    The locator and the encrypted blob are computed from the ``tx_id`` and the ``tx`` of the given data.
+
+    Args:
+        appointment_data (:obj:`dict`): the appointment data provided by the user (``tx``, ``tx_id``, ``start_time``,
+            ``end_time`` and ``to_self_delay``).
+        cli_sk (:obj:`PrivateKey`): the client private key used to sign the appointment.
+        hex_pk_der (:obj:`bytes`): the hex encoded client public key.
+
+    Returns:
+        :obj:`tuple`: A tuple containing the :obj:`Appointment <common.appointment.Appointment>` and the data to be
+        sent to the tower (appointment, signature and public key) if the appointment can be built. ``(None, None)``
+        otherwise.
+    """
+
+    if not isinstance(appointment_data, dict):
+        logger.error("The provided appointment is not a JSON object")
+        return None, None
+
+    valid_txid = check_sha256_hex_format(appointment_data.get("tx_id"))
+
+    if not valid_txid:
+        logger.error("The provided txid is not valid")
+        return None, None
+
+    tx_id = appointment_data.get("tx_id")
+    tx = appointment_data.get("tx")
+
+    if None not in [tx_id, tx]:
+        appointment_data["locator"] = compute_locator(tx_id)
+        appointment_data["encrypted_blob"] = Cryptographer.encrypt(Blob(tx), tx_id)
+
+    else:
+        logger.error("Appointment data is missing some fields")
+        return None, None
+
+    appointment = Appointment.from_dict(appointment_data)
+    signature = Cryptographer.sign(appointment.serialize(), cli_sk)
+
+    if not (appointment and signature):
+        return None, None
+
+    data = {"appointment": appointment.to_dict(), "signature": signature, "public_key": hex_pk_der.decode("utf-8")}
+
+    return appointment, data
+
+
 def parse_add_appointment_args(args):
     """
     Parses the arguments of the add_appointment command.
@@ -404,6 +521,9 @@ def main(args, command_line_conf):
                 if command == "add_appointment":
                     add_appointment(args, teos_url, config)
 
+                elif command == "add_appointments":
+                    add_appointments(args, teos_url, config)
+
                 elif command == "get_appointment":
                     if not args:
                         logger.error("No arguments were given")
@@ -426,6 +546,9 @@ def main(args, command_line_conf):
                         if command == "add_appointment":
                             sys.exit(help_add_appointment())
 
+                        elif command == "add_appointments":
+                            sys.exit(help_add_appointments())
+
                         elif command == "get_appointment":
                             sys.exit(help_get_appointment())
 
@@ -447,7 +570,7 @@ def main(args, command_line_conf):
 
 if __name__ == "__main__":
     command_line_conf = {}
-    commands = ["add_appointment", "get_appointment", "help"]
+    commands = ["add_appointment", "add_appointments", "get_appointment", "help"]
 
     try:
         opts, args = getopt(argv[1:], "s:p:h", ["server", "port", "help"])
@@ -10,6 +10,9 @@ from common.tools import check_sha256_hex_format
 
 LN_MESSAGE_PREFIX = b"Lightning Signed Message:"
 
+# The nonce is always 0 (12-byte), since every key is derived from a different txid
+NONCE = bytes(12)
+
 
 def sha256d(message):
     """
@@ -115,22 +118,31 @@ class Cryptographer:
 
         Cryptographer.check_data_key_format(blob.data, secret)
 
-        # Transaction to be encrypted
+        logger.debug("Encrypting blob", blob=blob.data)
+
         # FIXME: The blob data should contain more things that just the transaction. Leaving like this for now.
-        tx = unhexlify(blob.data)
+        encrypted_blob = Cryptographer.encrypt_raw(unhexlify(blob.data), unhexlify(secret))
 
-        # sk is the H(txid) (32-byte) and nonce is set to 0 (12-byte)
-        sk = sha256(unhexlify(secret)).digest()
-        nonce = bytearray(12)
+        return hexlify(encrypted_blob).decode("utf8")
 
-        logger.debug("Encrypting blob", sk=hexlify(sk).decode(), nonce=hexlify(nonce).decode(), blob=blob.data)
+    @staticmethod
+    def encrypt_raw(data, secret):
+        """
+        Encrypts some raw data using ``CHACHA20POLY1305``. This is the bytes version of :meth:`encrypt`, no format
+        checks nor hex conversions are performed.
 
-        # Encrypt the data
-        cipher = ChaCha20Poly1305(sk)
-        encrypted_blob = cipher.encrypt(nonce=nonce, data=tx, associated_data=None)
-        encrypted_blob = hexlify(encrypted_blob).decode("utf8")
+        Args:
+              data (:obj:`bytes`): the data to be encrypted (a raw penalty transaction).
+              secret (:obj:`bytes`): the value used to derive the encryption key. Should be the dispute txid.
+
+        Returns:
+              :obj:`bytes`: The encrypted data.
+        """
+
+        # sk is the H(txid) (32-byte) and nonce is set to 0 (12-byte)
+        sk = sha256(secret).digest()
 
-        return encrypted_blob
+        return ChaCha20Poly1305(sk).encrypt(nonce=NONCE, data=data, associated_data=None)
 
     @staticmethod
     # ToDo: #20-test-tx-decrypting-edge-cases
@@ -151,30 +163,86 @@ class Cryptographer:
 
         Cryptographer.check_data_key_format(encrypted_blob.data, secret)
 
-        # sk is the H(txid) (32-byte) and nonce is set to 0 (12-byte)
-        sk = sha256(unhexlify(secret)).digest()
-        nonce = bytearray(12)
+        logger.info("Decrypting blob", encrypted_blob=encrypted_blob.data)
+
+        blob = Cryptographer.decrypt_raw(unhexlify(encrypted_blob.data), unhexlify(secret))
+
+        return hexlify(blob).decode("utf8") if blob is not None else None
+
+    @staticmethod
+    def decrypt_raw(data, secret):
+        """
+        Decrypts some raw data using ``CHACHA20POLY1305``. This is the bytes version of :meth:`decrypt`, no format
+        checks nor hex conversions are performed.
+
+        Args:
+              data (:obj:`bytes`): the encrypted data.
+              secret (:obj:`bytes`): the value used to derive the decryption key. Should be the dispute txid.
 
-        logger.info(
-            "Decrypting blob",
-            sk=hexlify(sk).decode(),
-            nonce=hexlify(nonce).decode(),
-            encrypted_blob=encrypted_blob.data,
-        )
+        Returns:
+              :obj:`bytes` or :obj:`None`: The decrypted data, or ``None`` if it cannot be decrypted with the given key.
+        """
 
-        # Decrypt
-        cipher = ChaCha20Poly1305(sk)
-        data = unhexlify(encrypted_blob.data)
+        # sk is the H(txid) (32-byte) and nonce is set to 0 (12-byte)
+        sk = sha256(secret).digest()
 
         try:
-            blob = cipher.decrypt(nonce=nonce, data=data, associated_data=None)
-            blob = hexlify(blob).decode("utf8")
+            return ChaCha20Poly1305(sk).decrypt(nonce=NONCE, data=data, associated_data=None)
 
         except InvalidTag:
-            blob = None
             logger.error("Can't decrypt blob with the provided key")
+            return None
+
+    @staticmethod
+    def decrypt_many(encrypted_blobs, secrets):
+        """
+        Decrypts a batch of raw blobs using ``CHACHA20POLY1305``, as :meth:`decrypt_raw` does for a single one.
+
+        This is meant for data that has already been validated (e.g. blobs loaded from the database and txids coming
+        from ``bitcoind``), so no format checks are performed and nothing is logged per blob. A cipher is built once per
+        secret, so blobs sharing the same secret reuse it.
+
+        Args:
+              encrypted_blobs (:obj:`list`): the encrypted blobs (:obj:`bytes` or any bytes-like object, such as a
+                :obj:`memoryview` over a bigger buffer).
+              secrets (:obj:`list`): the values used to derive the decryption keys (bytes-like), one per blob.
+
+        Returns:
+              :obj:`list`: The decrypted data (:obj:`bytes`) of every blob, in the same order. ``None`` for the blobs
+              that cannot be decrypted with their key.
+
+        Raises:
+              ValueError: if the number of blobs and secrets does not match.
+        """
+
+        if len(encrypted_blobs) != len(secrets):
+            raise ValueError("The number of blobs and secrets must match")
+
+        ciphers = {}
+        decrypted = []
+
+        for data, secret in zip(encrypted_blobs, secrets):
+            secret = bytes(secret)
+            cipher = ciphers.get(secret)
+
+            if cipher is None:
+                cipher = ciphers[secret] = ChaCha20Poly1305(sha256(secret).digest())
+
+            # The cipher only takes bytes, so views are copied here (once)
+            if not isinstance(data, bytes):
+                data = bytes(data)
+
+            try:
+                decrypted.append(cipher.decrypt(NONCE, data, None))
+
+            except InvalidTag:
+                decrypted.append(None)
+
+        failed = decrypted.count(None)
+        if failed:
+            logger.error("Can't decrypt some blobs with the provided keys", failed=failed, total=len(decrypted))
 
-        return blob
+        return decrypted
 
     @staticmethod
     def load_key_file(file_path):
@@ -14,12 +14,23 @@ DEFAULT_CONF = {
     "BTC_RPC_CONNECT": {"value": "127.0.0.1", "type": str},
     "BTC_RPC_PORT": {"value": 8332, "type": int},
     "BTC_NETWORK": {"value": "mainnet", "type": str},
+    "BTC_RPC_POOL_SIZE": {"value": 8, "type": int},
     "FEED_PROTOCOL": {"value": "tcp", "type": str},
     "FEED_CONNECT": {"value": "127.0.0.1", "type": str},
     "FEED_PORT": {"value": 28332, "type": int},
+    "FEED_TOPIC": {"value": "hashblock", "type": str},
+    "FEED_MEMPOOL": {"value": 0, "type": int},
     "MAX_APPOINTMENTS": {"value": 100, "type": int},
     "EXPIRY_DELTA": {"value": 6, "type": int},
+    "DECRYPT_WORKERS": {"value": 4, "type": int},
+    "SIGN_WORKERS": {"value": 2, "type": int},
+    "SIGN_QUEUE_SIZE": {"value": 1000, "type": int},
+    "API_SERVER": {"value": "waitress", "type": str},
+    "API_THREADS": {"value": 8, "type": int},
+    "API_KEEP_ALIVE_TIMEOUT": {"value": 120, "type": int},
+    "API_MAX_BODY_SIZE": {"value": 1048576, "type": int},
     "MIN_TO_SELF_DELAY": {"value": 20, "type": int},
+    "VERIFY_WORKERS": {"value": 4, "type": int},
     "LOG_FILE": {"value": "teos.log", "type": str, "path": True},
     "TEOS_SECRET_KEY": {"value": "teos_sk.der", "type": str, "path": True},
     "DB_PATH": {"value": "appointments", "type": str, "path": True},
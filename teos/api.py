@@ -1,9 +1,10 @@
 import os
 import json
 import logging
+from waitress import serve
 from flask import Flask, request, abort, jsonify
 
-from teos import HOST, PORT, LOG_PREFIX
+from teos import HOST, PORT, LOG_PREFIX, DEFAULT_CONF
 from common.logger import Logger
 from common.appointment import Appointment
 
@@ -14,6 +15,9 @@ from common.constants import HTTP_OK, HTTP_BAD_REQUEST, HTTP_SERVICE_UNAVAILABLE
 app = Flask(__name__)
 logger = Logger(actor="API", log_name_prefix=LOG_PREFIX)
 
+# Servers the API can be run with. waitress is a multi-threaded production server, flask is the development one.
+API_SERVERS = ["waitress", "flask"]
+
 
 class API:
     """
@@ -23,12 +27,27 @@ class API:
         inspector (:obj:`Inspector <teos.inspector.Inspector>`): an ``Inspector`` instance to check the correctness of
             the received data.
         watcher (:obj:`Watcher <teos.watcher.Watcher>`): a ``Watcher`` instance to pass the requests to.
+        api_params (:obj:`dict`): a dictionary with the parameters of the server the API is run with (``API_SERVER``,
+            ``API_THREADS``, ``API_KEEP_ALIVE_TIMEOUT`` and ``API_MAX_BODY_SIZE``). Defaults are used for the missing
+            ones.
+
+    Raises:
+        ValueError: if ``API_SERVER`` is not one of ``API_SERVERS``.
     """
 
-    def __init__(self, inspector, watcher):
+    def __init__(self, inspector, watcher, api_params=None):
         self.inspector = inspector
         self.watcher = watcher
 
+        self.api_params = {k: v["value"] for k, v in DEFAULT_CONF.items() if k.startswith("API")}
+        if api_params is not None:
+            self.api_params.update(api_params)
+
+        if self.api_params.get("API_SERVER") not in API_SERVERS:
+            raise ValueError(
+                "Wrong api server ({}). Must be one of {}".format(self.api_params.get("API_SERVER"), API_SERVERS)
+            )
+
     def add_appointment(self):
         """
         Main endpoint of the Watchtower.
@@ -64,11 +83,11 @@ class API:
             response = None
 
             if type(appointment) == Appointment:
-                appointment_added, signature = self.watcher.add_appointment(appointment)
+                appointment_added, receipt = self.watcher.add_appointment(appointment)
 
                 if appointment_added:
                     rcode = HTTP_OK
-                    response = {"locator": appointment.locator, "signature": signature}
+                    response = {"locator": appointment.locator, "signature": receipt.result()}
 
                 else:
                     rcode = HTTP_SERVICE_UNAVAILABLE
@@ -97,6 +116,66 @@ class API:
         else:
             return jsonify({"error": error}), rcode
 
+    def add_appointments(self):
+        """
+        Batch version of :meth:`add_appointment`.
+
+        Requests must be json encoded and contain an ``appointments`` field with a list of appointment requests, each
+        one as the ones accepted by :meth:`add_appointment`. All the appointments are inspected against the same chain
+        height, and the accepted ones are stored by the :obj:`Watcher <teos.watcher.Watcher>` in a single database
+        write.
+
+        Returns:
+            :obj:`tuple`: A tuple containing the response (``json``) and response code (``int``). If the request is
+            well formatted, the response contains an ``appointments`` list with the result of every appointment, in the
+            same order they were sent: the ``locator`` and the signed receipt (``signature``) for the accepted ones, and
+            the ``locator`` and the ``error`` for the rejected ones.
+        """
+
+        # Getting the real IP if the server is behind a reverse proxy
+        remote_addr = request.environ.get("HTTP_X_REAL_IP")
+        if not remote_addr:
+            remote_addr = request.environ.get("REMOTE_ADDR")
+
+        logger.info("Received add_appointments request", from_addr="{}".format(remote_addr))
+
+        if not request.is_json:
+            return jsonify({"error": "appointments rejected. Request is not json encoded"}), HTTP_BAD_REQUEST
+
+        try:
+            appointments_data = json.loads(request.get_json()).get("appointments")
+
+        except (TypeError, ValueError, AttributeError):
+            appointments_data = None
+
+        if not isinstance(appointments_data, list):
+            return jsonify({"error": "appointments rejected. Request does not match the standard"}), HTTP_BAD_REQUEST
+
+        inspected = self.inspector.inspect_batch(appointments_data)
+        accepted = [appointment for appointment in inspected if type(appointment) == Appointment]
+        receipts = iter(self.watcher.add_appointments(accepted))
+
+        response = []
+        for data, appointment in zip(appointments_data, inspected):
+            if type(appointment) == Appointment:
+                appointment_added, receipt = next(receipts)
+
+                if appointment_added:
+                    response.append({"locator": appointment.locator, "signature": receipt.result()})
+
+                else:
+                    response.append({"locator": appointment.locator, "error": "appointment rejected"})
+
+            else:
+                appointment_data = data.get("appointment") if isinstance(data, dict) else None
+                locator = appointment_data.get("locator") if isinstance(appointment_data, dict) else None
+                error = "appointment rejected. Error {}: {}".format(appointment[0], appointment[1])
+                response.append({"locator": locator, "error": error})
+
+        logger.info("Sending response and disconnecting", from_addr="{}".format(remote_addr), response=response)
+
+        return jsonify({"appointments": response}), HTTP_OK
+
     # FIXME: THE NEXT TWO API ENDPOINTS ARE FOR TESTING AND SHOULD BE REMOVED / PROPERLY MANAGED BEFORE PRODUCTION!
     # ToDo: #17-add-api-keys
     def get_appointment(self):
@@ -132,11 +211,10 @@ class API:
             return jsonify(response)
 
         locator_map = self.watcher.db_manager.load_locator_map(locator)
-        triggered_appointments = self.watcher.db_manager.load_all_triggered_flags()
 
         if locator_map is not None:
             for uuid in locator_map:
-                if uuid not in triggered_appointments:
+                if not self.watcher.db_manager.is_triggered(uuid):
                     appointment_data = self.watcher.db_manager.load_watcher_appointment(uuid)
 
                     if appointment_data is not None:
@@ -185,11 +263,16 @@ class API:
 
     def start(self):
         """
-        This function starts the Flask server used to run the API. Adds all the routes to the functions listed above.
+        This function starts the server used to run the API. Adds all the routes to the functions listed above.
+
+        By default the API is served by ``waitress``, using a pool of ``API_THREADS`` threads. Idle keep-alive
+        connections are closed after ``API_KEEP_ALIVE_TIMEOUT`` seconds, and requests bigger than ``API_MAX_BODY_SIZE``
+        bytes are rejected. The ``flask`` development server can still be used by setting ``API_SERVER`` to ``flask``.
         """
 
         routes = {
             "/": (self.add_appointment, ["POST"]),
+            "/add_appointments": (self.add_appointments, ["POST"]),
             "/get_appointment": (self.get_appointment, ["GET"]),
             "/get_all_appointments": (self.get_all_appointments, ["GET"]),
         }
@@ -201,4 +284,18 @@ class API:
         logging.getLogger("werkzeug").setLevel(logging.ERROR)
         os.environ["WERKZEUG_RUN_MAIN"] = "true"
 
-        app.run(host=HOST, port=PORT)
+        app.config["MAX_CONTENT_LENGTH"] = self.api_params.get("API_MAX_BODY_SIZE")
+
+        if self.api_params.get("API_SERVER") == "waitress":
+            logging.getLogger("waitress").setLevel(logging.ERROR)
+            serve(
+                app,
+                host=HOST,
+                port=PORT,
+                threads=self.api_params.get("API_THREADS"),
+                channel_timeout=self.api_params.get("API_KEEP_ALIVE_TIMEOUT"),
+                max_request_body_size=self.api_params.get("API_MAX_BODY_SIZE"),
+            )
+
+        else:
+            app.run(host=HOST, port=PORT, threaded=True)
@@ -1,11 +1,29 @@
+from time import time
+from threading import Lock
+from itertools import islice
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 from common.logger import Logger
 
 from teos import LOG_PREFIX
-from teos.tools import bitcoin_cli
+from teos.tools import bitcoin_cli, bitcoin_cli_batch
+from teos.utils.block_cache import BlockCache
+from teos.utils.header_chain import HeaderChain
 from teos.utils.auth_proxy import JSONRPCException
 
 logger = Logger(actor="BlockProcessor", log_name_prefix=LOG_PREFIX)
 
+# Blocks are prefetched in batches of PREFETCH_BATCH_SIZE, using PREFETCH_WORKERS threads and with at most
+# PREFETCH_WINDOW batches being fetched ahead of the consumer.
+PREFETCH_BATCH_SIZE = 10
+PREFETCH_WORKERS = 4
+PREFETCH_WINDOW = 8
+
+# Maximum time (in seconds) since the header chain tip was last checked against bitcoind for its height to be used
+# instead of querying bitcoind. The ChainMonitor checks the tip at least once per polling interval.
+TIP_HEIGHT_MAX_AGE = 120
+
 
 class BlockProcessor:
     """
@@ -15,12 +33,64 @@ class BlockProcessor:
     Args:
         btc_connect_params (:obj:`dict`): a dictionary with the parameters to connect to bitcoind
             (rpc user, rpc passwd, host and port)
+
+    Attributes:
+        prefetched_blocks (:obj:`dict`): a dictionary (``block_hash:block``) with the blocks that have been prefetched by
+            :meth:`prefetch_blocks` and not consumed yet.
+        prefetch_lock (:obj:`Lock`): a lock protecting ``prefetched_blocks``.
+        block_cache (:obj:`BlockCache <teos.utils.block_cache.BlockCache>`): a cache with the most recently used blocks,
+            shared by all the components using this ``BlockProcessor``.
+        header_chain (:obj:`HeaderChain <teos.utils.header_chain.HeaderChain>`): an index of the most recent headers of
+            the best chain. It is kept up to date by the :obj:`ChainMonitor <teos.chain_monitor.ChainMonitor>`.
+        header_chain_lock (:obj:`Lock`): a lock protecting updates to the ``header_chain``.
+        tip_checked_at (:obj:`float` or :obj:`None`): the time at which the ``header_chain`` tip was last known to be
+            the best chain tip of ``bitcoind``.
     """
 
     def __init__(self, btc_connect_params):
         self.btc_connect_params = btc_connect_params
+        self.prefetched_blocks = dict()
+        self.prefetch_lock = Lock()
+        self.block_cache = BlockCache()
+        self.header_chain = HeaderChain()
+        self.header_chain_lock = Lock()
+        self.tip_checked_at = None
+
+    def get_block(self, block_hash, use_cache=True):
+        """
+        Gives a block given a block hash. Blocks are only queried to ``bitcoind`` if they are not cached.
+
+        Notice that fields that change over time (``confirmations``, ``nextblockhash``) may be outdated for cached
+        blocks.
+
+        Args:
+            block_hash (:obj:`str`): The block hash to be queried.
+            use_cache (:obj:`bool`): whether the block can be taken from the cache. If ``False``, ``bitcoind`` is queried
+                and the cache is updated with the result.
+
+        Returns:
+            :obj:`dict` or :obj:`None`: A dictionary containing the requested block data if the block is found.
 
-    def get_block(self, block_hash):
+            Returns ``None`` otherwise.
+        """
+
+        if use_cache:
+            with self.prefetch_lock:
+                block = self.prefetched_blocks.get(block_hash)
+
+            if block is not None:
+                return block
+
+            return self.block_cache.get_or_load(block_hash, self.fetch_block)
+
+        block = self.fetch_block(block_hash)
+
+        if block is not None:
+            self.block_cache.put(block_hash, block)
+
+        return block
+
+    def fetch_block(self, block_hash):
         """
         Gives a block given a block hash by querying ``bitcoind``.
 
@@ -42,6 +112,96 @@ class BlockProcessor:
 
         return block
 
+    def get_blocks(self, block_hashes):
+        """
+        Gives a list of blocks given their hashes by querying ``bitcoind`` using a single batch request.
+
+        Args:
+            block_hashes (:obj:`list`): the list of block hashes to be queried.
+
+        Returns:
+            :obj:`list`: A list with the requested blocks, in the same order as ``block_hashes``. Blocks that cannot be
+            found are set to ``None``.
+        """
+
+        blocks = []
+
+        for block, error in bitcoin_cli_batch(self.btc_connect_params, "getblock", [(h,) for h in block_hashes]):
+            if error is not None:
+                logger.error("Couldn't get block from bitcoind", error=error)
+
+            blocks.append(block)
+
+        return blocks
+
+    def get_block_hashes(self, heights):
+        """
+        Gives the hashes of the best chain blocks at the given heights using a single batch request.
+
+        Args:
+            heights (:obj:`list`): the list of heights to be queried.
+
+        Returns:
+            :obj:`list`: A list with the requested block hashes, in the same order as ``heights``. Hashes that cannot be
+            found are set to ``None``.
+        """
+
+        block_hashes = []
+
+        for block_hash, error in bitcoin_cli_batch(self.btc_connect_params, "getblockhash", [(h,) for h in heights]):
+            if error is not None:
+                logger.error("Couldn't get block hash", error=error)
+
+            block_hashes.append(block_hash)
+
+        return block_hashes
+
+    def prefetch_blocks(self, block_hashes):
+        """
+        Fetches a list of blocks concurrently, in batches, so they are already available when :meth:`get_block` is
+        called for them.
+
+        This is a generator that yields the given block hashes, in order, once their block has been fetched. At most
+        ``PREFETCH_WINDOW`` batches are fetched ahead of the consumer, and the blocks of a batch are dropped once the
+        consumer moves to the next one, so memory is bounded no matter how many blocks are given. Blocks that cannot be
+        fetched are simply not cached (:meth:`get_block` will query ``bitcoind`` for them).
+
+        Args:
+            block_hashes (:obj:`list`): the list of block hashes to be fetched.
+
+        Yields:
+            :obj:`str`: The given block hashes, in the same order.
+        """
+
+        batches = (block_hashes[i : i + PREFETCH_BATCH_SIZE] for i in range(0, len(block_hashes), PREFETCH_BATCH_SIZE))
+
+        with ThreadPoolExecutor(max_workers=PREFETCH_WORKERS) as executor:
+            pending = deque(
+                (batch, executor.submit(self.get_blocks, batch)) for batch in islice(batches, PREFETCH_WINDOW)
+            )
+
+            while pending:
+                batch, future = pending.popleft()
+
+                # Keep the window full while the current batch is being consumed
+                next_batch = next(batches, None)
+                if next_batch is not None:
+                    pending.append((next_batch, executor.submit(self.get_blocks, next_batch)))
+
+                with self.prefetch_lock:
+                    self.prefetched_blocks.update(
+                        {block_hash: block for block_hash, block in zip(batch, future.result()) if block is not None}
+                    )
+
+                try:
+                    for block_hash in batch:
+                        yield block_hash
+
+                finally:
+                    with self.prefetch_lock:
+                        for block_hash in batch:
+                            self.prefetched_blocks.pop(block_hash, None)
+
     def get_best_block_hash(self):
         """
         Returns the hash of the current best chain tip.
@@ -80,28 +240,86 @@ class BlockProcessor:
 
         return block_count
 
-    def decode_raw_transaction(self, raw_tx):
+    def get_tip_height(self, max_age=TIP_HEIGHT_MAX_AGE):
         """
-        Deserializes a given raw transaction (hex encoded) and builds a dictionary representing it with all the
-        associated metadata given by ``bitcoind`` (e.g. confirmation count).
+        Returns the block height of the best chain, avoiding the ``getblockcount`` round trip if possible.
+
+        The height of the ``header_chain`` tip is used if the tip has been checked against ``bitcoind`` within the last
+        ``max_age`` seconds. Otherwise ``bitcoind`` is queried.
 
         Args:
-            raw_tx (:obj:`str`): The hex representation of the transaction.
+            max_age (:obj:`int`): the maximum time (in seconds) since the tip was last checked.
 
         Returns:
-            :obj:`dict` or :obj:`None`: The decoding of the given ``raw_tx`` if the transaction is well formatted.
+            :obj:`int` or :obj:`None`: The block height if it can be computed. ``None`` otherwise.
+        """
 
-            Returns ``None`` otherwise.
+        tip_checked_at = self.tip_checked_at
+        tip_height = self.header_chain.tip_height
+
+        if tip_height is not None and tip_checked_at is not None and time() - tip_checked_at <= max_age:
+            return tip_height
+
+        return self.get_block_count()
+
+    def confirm_tip(self, block_hash):
         """
+        Signals that a given block hash is the best chain tip of ``bitcoind``. If it matches the ``header_chain`` tip,
+        the tip height can be used by :meth:`get_tip_height` for ``max_age`` more seconds.
 
-        try:
-            tx = bitcoin_cli(self.btc_connect_params).decoderawtransaction(raw_tx)
+        Args:
+            block_hash (:obj:`str`): the best chain tip reported by ``bitcoind``.
+        """
 
-        except JSONRPCException as e:
-            tx = None
-            logger.error("Can't build transaction from decoded data", error=e.error)
+        if block_hash is not None and block_hash == self.header_chain.tip:
+            self.tip_checked_at = time()
+
+    def update_header_chain(self, block_hash):
+        """
+        Sets a new best chain tip in the ``header_chain``. The headers of the new tip and, in case of a reorg, of the
+        blocks of the new best chain that are missing are fetched from ``bitcoind`` (through the block cache).
+
+        Args:
+            block_hash (:obj:`str`): the hash of the new best chain tip.
+
+        Returns:
+            :obj:`bool`: ``True`` if the header chain was updated, ``False`` otherwise.
+        """
+
+        to_connect = []
+
+        with self.header_chain_lock:
+            while True:
+                height = self.header_chain.get_height(block_hash)
+
+                if height is None:
+                    block = self.get_block(block_hash)
+
+                    if block is None:
+                        logger.error("Couldn't update the header chain", block_hash=block_hash)
+                        return False
+
+                    height = block.get("height")
+                    self.header_chain.add_header(block_hash, height, block.get("previousblockhash"))
+
+                to_connect.append(block_hash)
+                prev_block_hash = self.header_chain.headers[block_hash][1]
+                start_height = self.header_chain.start_height
 
-        return tx
+                # Stop once the new blocks connect with the known best chain (or the beginning of the header chain)
+                if (
+                    prev_block_hash is None
+                    or start_height is None
+                    or height - 1 < start_height
+                    or self.header_chain.best_chain.get(height - 1) == prev_block_hash
+                ):
+                    break
+
+                block_hash = prev_block_hash
+
+            self.header_chain.connect(to_connect)
+
+        return True
 
     def get_distance_to_tip(self, target_block_hash):
         """
@@ -117,6 +335,13 @@ class BlockProcessor:
             Returns ``None`` otherwise.
         """
 
+        # The header chain tip is the last tip notified by the ChainMonitor
+        tip_height = self.header_chain.tip_height
+        target_block_height = self.header_chain.get_height(target_block_hash)
+
+        if tip_height is not None and target_block_height is not None:
+            return tip_height - target_block_height
+
         distance = None
 
         chain_tip = self.get_best_block_hash()
@@ -148,6 +373,23 @@ class BlockProcessor:
         current_block_hash = self.get_best_block_hash()
         missed_blocks = []
 
+        # If the last known block is in the best chain, the missed range can be computed by height and all the hashes
+        # queried at once instead of walking back the chain one full block at a time. The chain is walked back
+        # otherwise, or if the best chain changes in the meantime.
+        tip = self.get_block(current_block_hash) if current_block_hash is not None else None
+        last_known_block = (
+            self.get_block(last_know_block_hash, use_cache=False) if last_know_block_hash is not None else None
+        )
+
+        if tip is not None and last_known_block is not None and last_known_block.get("confirmations") != -1:
+            heights = range(last_known_block.get("height") + 1, tip.get("height") + 1)
+            missed_blocks = self.get_block_hashes(heights)
+
+            if len(missed_blocks) == 0 or (None not in missed_blocks and missed_blocks[-1] == current_block_hash):
+                return missed_blocks
+
+            missed_blocks = []
+
         while current_block_hash != last_know_block_hash and current_block_hash is not None:
             missed_blocks.append(current_block_hash)
 
@@ -173,7 +415,13 @@ class BlockProcessor:
             KeyError: If the block cannot be found in the blockchain.
         """
 
-        block = self.get_block(block_hash)
+        in_best_chain = self.header_chain.is_in_best_chain(block_hash)
+
+        if in_best_chain is not None:
+            return in_best_chain
+
+        # The number of confirmations of a block changes over time, so it cannot be taken from the cache
+        block = self.get_block(block_hash, use_cache=False)
 
         if block is None:
             # This should never happen as long as we are using the same node, since bitcoind never drops orphan blocks
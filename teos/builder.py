@@ -1,3 +1,6 @@
+from teos.utils.appointment_store import AppointmentStore
+
+
 class Builder:
     """
     The :class:`Builder` class is in charge of reconstructing data loaded from the database and build the data
@@ -7,8 +10,8 @@ class Builder:
     @staticmethod
     def build_appointments(appointments_data):
         """
-        Builds an appointments dictionary (``uuid: Appointment``) and a locator_uuid_map (``locator: uuid``) given a
-        dictionary of appointments from the database.
+        Builds an appointments store (``uuid: Appointment``), a locator_uuid_map (``locator: uuid``) and an
+        end_time_uuid_map (``end_time: uuid``) given a dictionary of appointments from the database.
 
         Args:
             appointments_data (:obj:`dict`): a dictionary of dictionaries representing all the
@@ -17,30 +20,43 @@ class Builder:
                     ``{uuid: {locator: str, start_time: int, ...}, uuid: {locator:...}}``
 
         Returns:
-            :obj:`tuple`: A tuple with two dictionaries. ``appointments`` containing the appointment information in
-            :obj:`Appointment <teos.appointment.Appointment>` objects and ``locator_uuid_map`` containing a map of
-            appointment (``uuid:locator``).
+            :obj:`tuple`: A tuple with an :obj:`AppointmentStore <teos.utils.appointment_store.AppointmentStore>` and
+            two dictionaries. ``appointments`` containing the appointment information (``locator`` and ``end_time``),
+            ``locator_uuid_map`` containing a map of appointment (``uuid:locator``) and ``end_time_uuid_map`` containing
+            a map of appointments indexed by ``end_time`` (``end_time:uuid``).
         """
 
-        appointments = {}
+        appointments = AppointmentStore()
         locator_uuid_map = {}
+        end_time_uuid_map = {}
 
         for uuid, data in appointments_data.items():
-            appointments[uuid] = {"locator": data.get("locator"), "end_time": data.get("end_time")}
+            appointments[uuid] = data
+
+            # The map is keyed with the locator object kept by the store, so it is not held twice
+            locator = appointments[uuid].locator
+            if locator in locator_uuid_map:
+                locator_uuid_map[locator].append(uuid)
+
+            else:
+                locator_uuid_map[locator] = [uuid]
 
-            if data.get("locator") in locator_uuid_map:
-                locator_uuid_map[data.get("locator")].append(uuid)
+            if data.get("end_time") in end_time_uuid_map:
+                end_time_uuid_map[data.get("end_time")].append(uuid)
 
             else:
-                locator_uuid_map[data.get("locator")] = [uuid]
+                end_time_uuid_map[data.get("end_time")] = [uuid]
 
-        return appointments, locator_uuid_map
+        return appointments, locator_uuid_map, end_time_uuid_map
 
     @staticmethod
     def build_trackers(tracker_data):
         """
-        Builds a tracker dictionary (``uuid: TransactionTracker``) and a tx_tracker_map (``penalty_txid: uuid``) given
-        a dictionary of trackers from the database.
+        Builds a tracker dictionary (``uuid: TransactionTracker``), a tx_tracker_map (``penalty_txid: uuid``) and a
+        height_tracker_map (``height: uuid``) given a dictionary of trackers from the database.
+
+        The confirmation height of the penalty transactions is not known at this point, so the trackers are scheduled
+        to be checked at ``appointment_end``.
 
         Args:
             tracker_data (:obj:`dict`): a dictionary of dictionaries representing all the
@@ -50,14 +66,16 @@ class Builder:
                     ``{uuid: {locator: str, dispute_txid: str, ...}, uuid: {locator:...}}``
 
         Returns:
-            :obj:`tuple`: A tuple with two dictionaries. ``trackers`` containing the trackers' information in
-            :obj:`TransactionTracker <teos.responder.TransactionTracker>` objects and a ``tx_tracker_map`` containing
-            the map of trackers (``penalty_txid: uuid``).
+            :obj:`tuple`: A tuple with three dictionaries. ``trackers`` containing the trackers' information in
+            :obj:`TransactionTracker <teos.responder.TransactionTracker>` objects, a ``tx_tracker_map`` containing
+            the map of trackers (``penalty_txid: uuid``) and a ``height_tracker_map`` containing the completion schedule
+            of the trackers (``height: uuid``).
 
         """
 
         trackers = {}
         tx_tracker_map = {}
+        height_tracker_map = {}
 
         for uuid, data in tracker_data.items():
             trackers[uuid] = {
@@ -72,7 +90,13 @@ class Builder:
             else:
                 tx_tracker_map[data.get("penalty_txid")] = [uuid]
 
-        return trackers, tx_tracker_map
+            if data.get("appointment_end") in height_tracker_map:
+                height_tracker_map[data.get("appointment_end")].append(uuid)
+
+            else:
+                height_tracker_map[data.get("appointment_end")] = [uuid]
+
+        return trackers, tx_tracker_map, height_tracker_map
 
     @staticmethod
     def populate_block_queue(block_queue, missed_blocks):
@@ -91,6 +115,28 @@ class Builder:
         for block in missed_blocks:
             block_queue.put(block)
 
+    @staticmethod
+    def feed_block_queues(block_processor, block_queues, missed_blocks):
+        """
+        Feeds a list of missed blocks to the :mod:`Watcher <teos.watcher.Watcher>` and / or the
+        :mod:`Responder <teos.responder.Responder>`, block by block.
+
+        The blocks are prefetched concurrently by the ``block_processor``, so the queues are fed from memory instead of
+        waiting for ``bitcoind`` on every block. Every block is put in the queues in the given order, waiting for each
+        queue to process it before moving to the next one.
+
+        Args:
+            block_processor (:obj:`BlockProcessor <teos.block_processor.BlockProcessor>`): a ``BlockProcessor``
+                instance, shared with the components the queues belong to.
+            block_queues (:obj:`list`): a list of ``Queue``, in the order they have to be fed.
+            missed_blocks (:obj:`list`): list of block hashes missed by the Watchtower (do to a crash or shutdown).
+        """
+
+        for block_hash in block_processor.prefetch_blocks(missed_blocks):
+            for block_queue in block_queues:
+                block_queue.put(block_hash)
+                block_queue.join()
+
     @staticmethod
     def update_states(watcher, missed_blocks_watcher, missed_blocks_responder):
         """
@@ -119,20 +165,15 @@ class Builder:
             block_diff = sorted(
                 set(missed_blocks_responder).difference(missed_blocks_watcher), key=missed_blocks_responder.index
             )
-            Builder.populate_block_queue(watcher.responder.block_queue, block_diff)
-            watcher.responder.block_queue.join()
+            Builder.feed_block_queues(watcher.block_processor, [watcher.responder.block_queue], block_diff)
 
         elif len(missed_blocks_watcher) > len(missed_blocks_responder):
             block_diff = sorted(
                 set(missed_blocks_watcher).difference(missed_blocks_responder), key=missed_blocks_watcher.index
             )
-            Builder.populate_block_queue(watcher.block_queue, block_diff)
-            watcher.block_queue.join()
+            Builder.feed_block_queues(watcher.block_processor, [watcher.block_queue], block_diff)
 
         # Once they are at the same height, we update them one by one
-        for block in missed_blocks_watcher:
-            watcher.block_queue.put(block)
-            watcher.block_queue.join()
-
-            watcher.responder.block_queue.put(block)
-            watcher.responder.block_queue.join()
+        Builder.feed_block_queues(
+            watcher.block_processor, [watcher.block_queue, watcher.responder.block_queue], missed_blocks_watcher
+        )
@@ -1,7 +1,7 @@
 from teos import LOG_PREFIX
 from teos.rpc_errors import *
 from common.logger import Logger
-from teos.tools import bitcoin_cli
+from teos.tools import bitcoin_cli, bitcoin_cli_batch
 from teos.utils.auth_proxy import JSONRPCException
 from teos.errors import UNKNOWN_JSON_RPC_EXCEPTION, RPC_TX_REORGED_AFTER_BROADCAST
 
@@ -79,48 +79,107 @@ class Carrier:
             receipt = Receipt(delivered=True)
 
         except JSONRPCException as e:
-            errno = e.error.get("code")
-            # Since we're pushing a raw transaction to the network we can face several rejections
-            if errno == RPC_VERIFY_REJECTED:
-                # DISCUSS: 37-transaction-rejection
-                receipt = Receipt(delivered=False, reason=RPC_VERIFY_REJECTED)
-                logger.error("Transaction couldn't be broadcast", error=e.error)
+            receipt = self.build_error_receipt(txid, e.error)
 
-            elif errno == RPC_VERIFY_ERROR:
-                # DISCUSS: 37-transaction-rejection
-                receipt = Receipt(delivered=False, reason=RPC_VERIFY_ERROR)
-                logger.error("Transaction couldn't be broadcast", error=e.error)
+        self.issued_receipts[txid] = receipt
 
-            elif errno == RPC_VERIFY_ALREADY_IN_CHAIN:
-                logger.info("Transaction is already in the blockchain. Getting confirmation count", txid=txid)
+        return receipt
 
-                # If the transaction is already in the chain, we get the number of confirmations and watch the tracker
-                # until the end of the appointment
-                tx_info = self.get_transaction(txid)
+    # NOTCOVERED
+    def send_transactions(self, txs):
+        """
+        Tries to send a batch of raw transactions to the Bitcoin network using a single batch request to ``bitcoind``.
 
-                if tx_info is not None:
-                    confirmations = int(tx_info.get("confirmations"))
-                    receipt = Receipt(delivered=True, confirmations=confirmations, reason=RPC_VERIFY_ALREADY_IN_CHAIN)
+        Args:
+            txs (:obj:`dict`): a dictionary of (potentially) signed raw transactions ready to be broadcast
+                (``txid:rawtx``).
 
-                else:
-                    # There's a really unlikely edge case where a transaction can be reorged between receiving the
-                    # notification and querying the data. Notice that this implies the tx being also kicked off the
-                    # mempool, which again is really unlikely.
-                    receipt = Receipt(delivered=False, reason=RPC_TX_REORGED_AFTER_BROADCAST)
-
-            elif errno == RPC_DESERIALIZATION_ERROR:
-                # Adding this here just for completeness. We should never end up here. The Carrier only sends txs
-                # handed by the Responder, who receives them from the Watcher, who checks that the tx can be properly
-                # deserialized
-                logger.info("Transaction cannot be deserialized".format(txid))
-                receipt = Receipt(delivered=False, reason=RPC_DESERIALIZATION_ERROR)
+        Returns:
+            :obj:`dict`: A dictionary of :obj:`Receipt` (``txid:receipt``), one per transaction.
+        """
+
+        receipts = dict()
+        to_send = dict()
+
+        for txid, rawtx in txs.items():
+            if txid in self.issued_receipts:
+                logger.info("Transaction already sent", txid=txid)
+                receipts[txid] = self.issued_receipts[txid]
 
             else:
-                # If something else happens (unlikely but possible) log it so we can treat it in future releases
-                logger.error("JSONRPCException", method="Carrier.send_transaction", error=e.error)
-                receipt = Receipt(delivered=False, reason=UNKNOWN_JSON_RPC_EXCEPTION)
+                logger.info("Pushing transaction to the network", txid=txid, rawtx=rawtx)
+                to_send[txid] = rawtx
 
-        self.issued_receipts[txid] = receipt
+        results = bitcoin_cli_batch(
+            self.btc_connect_params, "sendrawtransaction", [(rawtx,) for rawtx in to_send.values()]
+        )
+
+        for txid, (_, error) in zip(to_send.keys(), results):
+            if error is None:
+                receipt = Receipt(delivered=True)
+
+            else:
+                receipt = self.build_error_receipt(txid, error)
+
+            self.issued_receipts[txid] = receipt
+            receipts[txid] = receipt
+
+        return receipts
+
+    def build_error_receipt(self, txid, error):
+        """
+        Builds the :obj:`Receipt` of a transaction that ``bitcoind`` refused to broadcast.
+
+        Args:
+            txid  (:obj:`str`): the id of the transaction that was being broadcast.
+            error (:obj:`dict`): the ``json-rpc`` error returned by ``bitcoind``.
+
+        Returns:
+            :obj:`Receipt`: A receipt reporting why the transaction was not delivered (or the confirmation count if the
+            transaction was already in the blockchain).
+        """
+
+        errno = error.get("code")
+
+        # Since we're pushing a raw transaction to the network we can face several rejections
+        if errno == RPC_VERIFY_REJECTED:
+            # DISCUSS: 37-transaction-rejection
+            receipt = Receipt(delivered=False, reason=RPC_VERIFY_REJECTED)
+            logger.error("Transaction couldn't be broadcast", error=error)
+
+        elif errno == RPC_VERIFY_ERROR:
+            # DISCUSS: 37-transaction-rejection
+            receipt = Receipt(delivered=False, reason=RPC_VERIFY_ERROR)
+            logger.error("Transaction couldn't be broadcast", error=error)
+
+        elif errno == RPC_VERIFY_ALREADY_IN_CHAIN:
+            logger.info("Transaction is already in the blockchain. Getting confirmation count", txid=txid)
+
+            # If the transaction is already in the chain, we get the number of confirmations and watch the tracker
+            # until the end of the appointment
+            tx_info = self.get_transaction(txid)
+
+            if tx_info is not None:
+                confirmations = int(tx_info.get("confirmations"))
+                receipt = Receipt(delivered=True, confirmations=confirmations, reason=RPC_VERIFY_ALREADY_IN_CHAIN)
+
+            else:
+                # There's a really unlikely edge case where a transaction can be reorged between receiving the
+                # notification and querying the data. Notice that this implies the tx being also kicked off the
+                # mempool, which again is really unlikely.
+                receipt = Receipt(delivered=False, reason=RPC_TX_REORGED_AFTER_BROADCAST)
+
+        elif errno == RPC_DESERIALIZATION_ERROR:
+            # Adding this here just for completeness. We should never end up here. The Carrier only sends txs
+            # handed by the Responder, who receives them from the Watcher, who checks that the tx can be properly
+            # deserialized
+            logger.info("Transaction cannot be deserialized".format(txid))
+            receipt = Receipt(delivered=False, reason=RPC_DESERIALIZATION_ERROR)
+
+        else:
+            # If something else happens (unlikely but possible) log it so we can treat it in future releases
+            logger.error("JSONRPCException", method="Carrier.send_transaction", error=error)
+            receipt = Receipt(delivered=False, reason=UNKNOWN_JSON_RPC_EXCEPTION)
 
         return receipt
 
@@ -153,3 +212,32 @@ class Carrier:
                 logger.error("JSONRPCException", method="Carrier.get_transaction", error=e.error)
 
         return tx_info
+
+    def get_transactions(self, txids):
+        """
+        Queries the data of a list of transactions to ``bitcoind`` using a single batch request.
+
+        Args:
+            txids (:obj:`list`): a list of 32-byte hex-formatted strings representing the transaction ids.
+
+        Returns:
+            :obj:`dict`: A dictionary (``txid:tx_info``) with the data of every requested transaction. Transactions that
+            cannot be found on the chain are set to ``None``.
+        """
+
+        txids = list(dict.fromkeys(txids))
+        txs = dict()
+
+        results = bitcoin_cli_batch(self.btc_connect_params, "getrawtransaction", [(txid, 1) for txid in txids])
+
+        for txid, (tx_info, error) in zip(txids, results):
+            if error is not None:
+                if error.get("code") == RPC_INVALID_ADDRESS_OR_KEY:
+                    logger.info("Transaction not found in mempool nor blockchain", txid=txid)
+
+                else:
+                    logger.error("JSONRPCException", method="Carrier.get_transactions", error=error)
+
+            txs[txid] = tx_info
+
+        return txs
@@ -4,9 +4,14 @@ from threading import Thread, Event, Condition
 
 from teos import LOG_PREFIX
 from common.logger import Logger
+from teos.utils.tx_parser import deserialize_block
 
 logger = Logger(actor="ChainMonitor", log_name_prefix=LOG_PREFIX)
 
+# zmq topics the ChainMonitor can subscribe to. With rawblock, blocks are parsed in-process so the subscribers do not
+# need to query bitcoind for them.
+FEED_TOPICS = ["hashblock", "rawblock"]
+
 
 class ChainMonitor:
     """
@@ -21,7 +26,11 @@ class ChainMonitor:
         watcher_queue (:obj:`Queue`): the queue to be used to send blocks hashes to the ``Watcher``.
         responder_queue (:obj:`Queue`): the queue to be used to send blocks hashes to the ``Responder``.
         block_processor (:obj:`BlockProcessor <teos.block_processor.BlockProcessor>`): a blockProcessor instance.
-        bitcoind_feed_params (:obj:`dict`): a dict with the feed (ZMQ) connection parameters.
+        bitcoind_feed_params (:obj:`dict`): a dict with the feed (ZMQ) connection parameters. ``FEED_TOPIC`` sets the
+            topic to subscribe to (``hashblock`` by default, or ``rawblock``). If ``FEED_MEMPOOL`` is set, the
+            ``ChainMonitor`` also subscribes to ``rawtx``.
+        mempool_queue (:obj:`Queue`): the queue to be used to send mempool transactions to the ``Watcher``. Only used if
+            ``FEED_MEMPOOL`` is set.
 
     Attributes:
         best_tip (:obj:`str`): a block hash representing the current best tip.
@@ -31,6 +40,10 @@ class ChainMonitor:
         lock (:obj:`Condition`): a lock used to protect concurrent access to the queues and ``best_tip`` by the zmq and
             polling threads.
         zmqSubSocket (:obj:`socket`): a socket to connect to ``bitcoind`` via ``zmq``.
+        feed_topic (:obj:`str`): the ``zmq`` topic the :class:`ChainMonitor` is subscribed to.
+        mempool_queue (:obj:`Queue`): a queue to send the raw transactions (bytes) received via ``rawtx`` to the
+            :obj:`Watcher <teos.watcher.Watcher>`. ``None`` if the :class:`ChainMonitor` is not subscribed to the
+            mempool.
         watcher_queue (:obj:`Queue`): a queue to send new best tips to the :obj:`Watcher <teos.watcher.Watcher>`.
         responder_queue (:obj:`Queue`): a queue to send new best tips to the
             :obj:`Responder <teos.responder.Responder>`.
@@ -40,7 +53,7 @@ class ChainMonitor:
         block_processor (:obj:`BlockProcessor <teos.block_processor.BlockProcessor>`): a blockProcessor instance.
     """
 
-    def __init__(self, watcher_queue, responder_queue, block_processor, bitcoind_feed_params):
+    def __init__(self, watcher_queue, responder_queue, block_processor, bitcoind_feed_params, mempool_queue=None):
         self.best_tip = None
         self.last_tips = []
         self.terminate = False
@@ -48,10 +61,23 @@ class ChainMonitor:
         self.check_tip = Event()
         self.lock = Condition()
 
+        self.feed_topic = bitcoind_feed_params.get("FEED_TOPIC", "hashblock")
+
+        if self.feed_topic not in FEED_TOPICS:
+            raise ValueError("Wrong feed topic ({}). Must be one of {}".format(self.feed_topic, FEED_TOPICS))
+
         self.zmqContext = zmq.Context()
         self.zmqSubSocket = self.zmqContext.socket(zmq.SUB)
         self.zmqSubSocket.setsockopt(zmq.RCVHWM, 0)
-        self.zmqSubSocket.setsockopt_string(zmq.SUBSCRIBE, "hashblock")
+        self.zmqSubSocket.setsockopt_string(zmq.SUBSCRIBE, self.feed_topic)
+
+        if bitcoind_feed_params.get("FEED_MEMPOOL") and mempool_queue is not None:
+            self.mempool_queue = mempool_queue
+            self.zmqSubSocket.setsockopt_string(zmq.SUBSCRIBE, "rawtx")
+
+        else:
+            self.mempool_queue = None
+
         self.zmqSubSocket.connect(
             "%s://%s:%s"
             % (
@@ -105,6 +131,37 @@ class ChainMonitor:
         else:
             return False
 
+    def build_block(self, raw_block):
+        """
+        Builds a block from its serialization (as received via ``zmq``) and adds it to the block cache of the
+        :obj:`BlockProcessor <teos.block_processor.BlockProcessor>`, so the subscribers get it without querying
+        ``bitcoind``.
+
+        The height of the block is taken from the header chain. If the previous block is not known, the block is not
+        cached (and it will be queried to ``bitcoind`` when needed).
+
+        Args:
+            raw_block (:obj:`bytes`): the serialized block.
+
+        Returns:
+            :obj:`str` or :obj:`None`: The hash of the block if it can be deserialized. ``None`` otherwise.
+        """
+
+        try:
+            block = deserialize_block(raw_block)
+
+        except ValueError as e:
+            logger.error("Couldn't deserialize block", error=str(e))
+            return None
+
+        prev_block_height = self.block_processor.header_chain.get_height(block.get("previousblockhash"))
+
+        if prev_block_height is not None:
+            block["height"] = prev_block_height + 1
+            self.block_processor.block_cache.put(block.get("hash"), block)
+
+        return block.get("hash")
+
     def monitor_chain_polling(self):
         """
         Monitors ``bitcoind`` via polling. Once the method is fired, it keeps monitoring as long as ``terminate`` is not
@@ -121,8 +178,10 @@ class ChainMonitor:
 
                 self.lock.acquire()
                 if self.update_state(current_tip):
+                    self.block_processor.update_header_chain(current_tip)
                     self.notify_subscribers(current_tip)
                     logger.info("New block received via polling", block_hash=current_tip)
+                self.block_processor.confirm_tip(current_tip)
                 self.lock.release()
 
     def monitor_chain_zmq(self):
@@ -143,8 +202,21 @@ class ChainMonitor:
                 if topic == b"hashblock":
                     block_hash = binascii.hexlify(body).decode("utf-8")
 
+                elif topic == b"rawblock":
+                    block_hash = self.build_block(body)
+
+                else:
+                    block_hash = None
+
+                    # Mempool transactions are forwarded to the Watcher as they come, they do not change the state
+                    if topic == b"rawtx" and self.mempool_queue is not None:
+                        self.mempool_queue.put(body)
+
+                if block_hash is not None:
                     self.lock.acquire()
                     if self.update_state(block_hash):
+                        self.block_processor.update_header_chain(block_hash)
+                        self.block_processor.confirm_tip(block_hash)
                         self.notify_subscribers(block_hash)
                         logger.info("New block received via zmq", block_hash=block_hash)
                     self.lock.release()
@@ -154,8 +226,15 @@ class ChainMonitor:
         Main :class:`ChainMonitor` method. It initializes the ``best_tip`` to the current one (by querying the
         :obj:`BlockProcessor <teos.block_processor.BlockProcessor>`) and creates two threads, one per each monitoring
         approach (``zmq`` and ``polling``).
+
+        Every new tip is also connected to the header chain of the ``BlockProcessor`` before the subscribers are
+        notified. Every time the tip is checked against ``bitcoind`` it is confirmed to the ``BlockProcessor``, so the
+        tip height can be used without querying ``bitcoind`` (see
+        :meth:`get_tip_height <teos.block_processor.BlockProcessor.get_tip_height>`).
         """
 
         self.best_tip = self.block_processor.get_best_block_hash()
+        self.block_processor.update_header_chain(self.best_tip)
+        self.block_processor.confirm_tip(self.best_tip)
         Thread(target=self.monitor_chain_polling, daemon=True).start()
         Thread(target=self.monitor_chain_zmq, daemon=True).start()
@@ -13,18 +13,21 @@ class Cleaner:
     """
 
     @staticmethod
-    def delete_appointment_from_memory(uuid, appointments, locator_uuid_map):
+    def delete_appointment_from_memory(uuid, appointments, locator_uuid_map, end_time_uuid_map):
         """
-        Deletes an appointment from memory (appointments and locator_uuid_map dictionaries). If the given appointment
-        does not share locator with any other, the map will completely removed, otherwise, the uuid will be removed from
-        the map.
+        Deletes an appointment from memory (appointments, locator_uuid_map and end_time_uuid_map dictionaries). If the
+        given appointment does not share locator (or end_time) with any other, the map will completely removed,
+        otherwise, the uuid will be removed from the map.
 
         Args:
             uuid (:obj:`str`): the identifier of the appointment to be deleted.
-            appointments (:obj:`dict`): the appointments dictionary from where the appointment should be removed.
+            appointments (:obj:`AppointmentStore <teos.utils.appointment_store.AppointmentStore>`): the appointments
+                store from where the appointment should be removed.
             locator_uuid_map (:obj:`dict`): the locator:uuid map from where the appointment should also be removed.
+            end_time_uuid_map (:obj:`dict`): the end_time:uuid map from where the appointment should also be removed.
         """
-        locator = appointments[uuid].get("locator")
+        locator = appointments[uuid].locator
+        end_time = appointments[uuid].end_time
 
         # Delete the appointment
         appointments.pop(uuid)
@@ -36,6 +39,12 @@ class Cleaner:
             # Otherwise we just delete the appointment that matches locator:appointment_pos
             locator_uuid_map[locator].remove(uuid)
 
+        # Same for the end_time index
+        if len(end_time_uuid_map[end_time]) == 1:
+            end_time_uuid_map.pop(end_time)
+        else:
+            end_time_uuid_map[end_time].remove(uuid)
+
     @staticmethod
     def delete_appointment_from_db(uuid, db_manager):
         """
@@ -65,36 +74,42 @@ class Cleaner:
                 database.
         """
 
-        locator_map = db_manager.load_locator_map(locator)
+        # The map is read and written back within a batch, so concurrent updates of the same map are not lost
+        with db_manager.atomic_batch():
+            locator_map = db_manager.load_locator_map(locator)
+
+            if locator_map is not None:
+                if set(locator_map).issuperset(uuids):
+                    # Remove the map if all keys are requested to be deleted
+                    if set(locator_map) == set(uuids):
+                        db_manager.delete_locator_map(locator)
+                    else:
+                        # Otherwise remove only the selected keys
+                        locator_map = list(set(locator_map).difference(uuids))
+                        db_manager.update_locator_map(locator, locator_map)
 
-        if locator_map is not None:
-            if set(locator_map).issuperset(uuids):
-                # Remove the map if all keys are requested to be deleted
-                if set(locator_map) == set(uuids):
-                    db_manager.delete_locator_map(locator)
                 else:
-                    # Otherwise remove only the selected keys
-                    locator_map = list(set(locator_map).difference(uuids))
-                    db_manager.update_locator_map(locator, locator_map)
+                    logger.error("Some UUIDs not found in the db", locator=locator, all_uuids=uuids)
 
             else:
-                logger.error("Some UUIDs not found in the db", locator=locator, all_uuids=uuids)
-
-        else:
-            logger.error("Locator map not found in the db", locator=locator)
+                logger.error("Locator map not found in the db", locator=locator)
 
     @staticmethod
-    def delete_expired_appointments(expired_appointments, appointments, locator_uuid_map, db_manager):
+    def delete_expired_appointments(
+        expired_appointments, appointments, locator_uuid_map, end_time_uuid_map, db_manager
+    ):
         """
         Deletes appointments which ``end_time`` has been reached (with no trigger) both from memory
         (:obj:`Watcher <teos.watcher.Watcher>`) and disk.
 
         Args:
             expired_appointments (:obj:`list`): a list of appointments to be deleted.
-            appointments (:obj:`dict`): a dictionary containing all the :mod:`Watcher <teos.watcher.Watcher>`
-                appointments.
+            appointments (:obj:`AppointmentStore <teos.utils.appointment_store.AppointmentStore>`): a store containing
+                all the :mod:`Watcher <teos.watcher.Watcher>` appointments.
             locator_uuid_map (:obj:`dict`): a ``locator:uuid`` map for the :obj:`Watcher <teos.watcher.Watcher>`
                 appointments.
+            end_time_uuid_map (:obj:`dict`): an ``end_time:uuid`` map for the :obj:`Watcher <teos.watcher.Watcher>`
+                appointments.
             db_manager (:obj:`DBManager <teos.db_manager.DBManager>`): a ``DBManager`` instance to interact with the
                 database.
         """
@@ -102,10 +117,10 @@ class Cleaner:
         locator_maps_to_update = {}
 
         for uuid in expired_appointments:
-            locator = appointments[uuid].get("locator")
+            locator = appointments[uuid].locator
             logger.info("End time reached with no breach. Deleting appointment", locator=locator, uuid=uuid)
 
-            Cleaner.delete_appointment_from_memory(uuid, appointments, locator_uuid_map)
+            Cleaner.delete_appointment_from_memory(uuid, appointments, locator_uuid_map, end_time_uuid_map)
 
             if locator not in locator_maps_to_update:
                 locator_maps_to_update[locator] = []
@@ -119,7 +134,9 @@ class Cleaner:
         db_manager.batch_delete_watcher_appointments(expired_appointments)
 
     @staticmethod
-    def delete_completed_appointments(completed_appointments, appointments, locator_uuid_map, db_manager):
+    def delete_completed_appointments(
+        completed_appointments, appointments, locator_uuid_map, end_time_uuid_map, db_manager
+    ):
         """
         Deletes a completed appointment from memory (:obj:`Watcher <teos.watcher.Watcher>`) and disk.
 
@@ -128,23 +145,25 @@ class Cleaner:
 
         Args:
             completed_appointments (:obj:`list`): a list of appointments to be deleted.
-            appointments (:obj:`dict`): a dictionary containing all the :obj:`Watcher <teos.watcher.Watcher>`
-                appointments.
+            appointments (:obj:`AppointmentStore <teos.utils.appointment_store.AppointmentStore>`): a store containing
+                all the :obj:`Watcher <teos.watcher.Watcher>` appointments.
             locator_uuid_map (:obj:`dict`): a ``locator:uuid`` map for the :obj:`Watcher <teos.watcher.Watcher>`
                 appointments.
+            end_time_uuid_map (:obj:`dict`): an ``end_time:uuid`` map for the :obj:`Watcher <teos.watcher.Watcher>`
+                appointments.
             db_manager (:obj:`DBManager <teos.db_manager.DBManager>`): a ``DBManager`` instance to interact with the
                 database.
         """
         locator_maps_to_update = {}
 
         for uuid in completed_appointments:
-            locator = appointments[uuid].get("locator")
+            locator = appointments[uuid].locator
 
             logger.warning(
                 "Appointment cannot be completed, it contains invalid data. Deleting", locator=locator, uuid=uuid
             )
 
-            Cleaner.delete_appointment_from_memory(uuid, appointments, locator_uuid_map)
+            Cleaner.delete_appointment_from_memory(uuid, appointments, locator_uuid_map, end_time_uuid_map)
 
             if locator not in locator_maps_to_update:
                 locator_maps_to_update[locator] = []
@@ -158,23 +177,27 @@ class Cleaner:
         db_manager.batch_delete_watcher_appointments(completed_appointments)
 
     @staticmethod
-    def flag_triggered_appointments(triggered_appointments, appointments, locator_uuid_map, db_manager):
+    def flag_triggered_appointments(
+        triggered_appointments, appointments, locator_uuid_map, end_time_uuid_map, db_manager
+    ):
         """
         Deletes a list of  triggered appointment from memory (:obj:`Watcher <teos.watcher.Watcher>`) and flags them as
         triggered on disk.
 
         Args:
             triggered_appointments (:obj:`list`): a list of appointments to be flagged as triggered on the database.
-            appointments (:obj:`dict`): a dictionary containing all the :obj:`Watcher <teos.watcher.Watcher>`
-                appointments.
+            appointments (:obj:`AppointmentStore <teos.utils.appointment_store.AppointmentStore>`): a store containing
+                all the :obj:`Watcher <teos.watcher.Watcher>` appointments.
             locator_uuid_map (:obj:`dict`): a ``locator:uuid`` map for the :obj:`Watcher <teos.watcher.Watcher>`
                 appointments.
+            end_time_uuid_map (:obj:`dict`): an ``end_time:uuid`` map for the :obj:`Watcher <teos.watcher.Watcher>`
+                appointments.
             db_manager (:obj:`DBManager <teos.db_manager.DBManager>`): a ``DBManager`` instance to interact with the
                 database.
         """
 
         for uuid in triggered_appointments:
-            Cleaner.delete_appointment_from_memory(uuid, appointments, locator_uuid_map)
+            Cleaner.delete_appointment_from_memory(uuid, appointments, locator_uuid_map, end_time_uuid_map)
             db_manager.create_triggered_appointment_flag(uuid)
 
     @staticmethod
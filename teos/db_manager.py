@@ -1,7 +1,17 @@
 import json
 import plyvel
+from threading import local, RLock
+from functools import partial
+from contextlib import contextmanager
 
 from teos import LOG_PREFIX
+from teos.utils.records import (
+    encode_appointment,
+    decode_appointment,
+    decode_appointment_blob,
+    encode_tracker,
+    decode_tracker,
+)
 
 from common.logger import Logger
 
@@ -13,6 +23,13 @@ RESPONDER_PREFIX = "r"
 RESPONDER_LAST_BLOCK_KEY = "br"
 LOCATOR_MAP_PREFIX = "m"
 TRIGGERED_APPOINTMENTS_PREFIX = "ta"
+WATCHER_SNAPSHOT_KEY = "sw"
+RESPONDER_SNAPSHOT_KEY = "sr"
+MISSED_CONFIRMATIONS_KEY = "uc"
+
+# Binary record encoders / decoders for the prefixes holding appointments and trackers (see teos.utils.records)
+RECORD_ENCODERS = {WATCHER_PREFIX: encode_appointment, RESPONDER_PREFIX: encode_tracker}
+RECORD_DECODERS = {WATCHER_PREFIX: decode_appointment, RESPONDER_PREFIX: decode_tracker}
 
 
 class DBManager:
@@ -20,7 +37,7 @@ class DBManager:
     The :class:`DBManager` is the class in charge of interacting with the appointments database (``LevelDB``).
     Keys and values are stored as bytes in the database but processed as strings by the manager.
 
-    The database is split in six prefixes:
+    The database is split in the following prefixes and keys:
 
         - ``WATCHER_PREFIX``, defined as ``b'w``, is used to store :obj:`Watcher <teos.watcher.Watcher>` appointments.
         - ``RESPONDER_PREFIX``, defines as ``b'r``, is used to store :obj:`Responder <teos.responder.Responder>` trackers.
@@ -28,11 +45,30 @@ class DBManager:
         - ``RESPONDER_LAST_BLOCK_KEY``, defined as ``b'br``, is used to store the last block hash known by the :obj:`Responder <teos.responder.Responder>`.
         - ``LOCATOR_MAP_PREFIX``, defined as ``b'm``, is used to store the ``locator:uuid`` maps.
         - ``TRIGGERED_APPOINTMENTS_PREFIX``, defined as ``b'ta``, is used to stored triggered appointments (appointments that have been handed to the :obj:`Responder <teos.responder.Responder>`.)
+        - ``WATCHER_SNAPSHOT_KEY``, defined as ``b'sw``, is used to store a snapshot of the :obj:`Watcher <teos.watcher.Watcher>` in-memory appointments.
+        - ``RESPONDER_SNAPSHOT_KEY``, defined as ``b'sr``, is used to store a snapshot of the :obj:`Responder <teos.responder.Responder>` in-memory trackers.
+        - ``MISSED_CONFIRMATIONS_KEY``, defined as ``b'uc``, is used to store the missed confirmation count of the unconfirmed penalty transactions of the :obj:`Responder <teos.responder.Responder>`.
 
     Args:
         db_path (:obj:`str`): the path (relative or absolute) to the system folder containing the database. A fresh
             database will be create if the specified path does not contain one.
 
+    Appointments and trackers are stored as binary records (:mod:`teos.utils.records`). Records stored as ``json`` by
+    older versions are still read transparently and can be converted using :meth:`migrate_records`.
+
+    Writes can be grouped in a single atomic ``LevelDB`` write batch using :meth:`atomic_batch`. Batches are tracked
+    per thread, so the writes of other threads (e.g. the API) are not affected by them, and run one at a time.
+
+    Attributes:
+        db (:obj:`plyvel.DB`): the ``LevelDB`` database.
+        lock (:obj:`RLock`): a lock held by the thread running an :meth:`atomic_batch` until the batch is written.
+        local (:obj:`threading.local`): the thread-local storage holding the active write batch (``batch``), the
+            values written to it (``pending``) and the updates to apply once it is written (``on_commit``), if any.
+        triggered_appointments (:obj:`set`): the uuids of all the appointments flagged as triggered. It is loaded from
+            the database on init and kept up to date by the methods that create and delete the flags, so the flags can
+            be checked without iterating over the ``TRIGGERED_APPOINTMENTS_PREFIX`` prefix. Within an
+            :meth:`atomic_batch`, it is only updated once the batch is written.
+
     Raises:
         ValueError: If the provided ``db_path`` is not a string.
         plyvel.Error: If the db is currently unavailable (being used by another process).
@@ -54,6 +90,162 @@ class DBManager:
                 logger.info("The db is already being used by another process (LOCK)")
                 raise e
 
+        self.lock = RLock()
+        self.local = local()
+        self.triggered_appointments = set(self.load_all_triggered_flags())
+
+    @contextmanager
+    def atomic_batch(self):
+        """
+        Groups all the writes done by the current thread within the context in a single atomic write batch, so either
+        all of them are written to disk or none is (if an exception is raised).
+
+        Reads done within the context see the pending writes. Nested calls join the outer batch.
+
+        Batches of different threads are run one at a time (holding ``lock``), so a batch never starts while data it
+        may read is pending in the batch of another thread (e.g. the tracker of a breach handled by the ``Watcher``
+        when the ``Responder`` handles a reorg), and read-modify-writes, like the ones on the locator maps, do not
+        overwrite each other.
+
+        This is used to commit all the state changes derived from processing a block, together with the last known block
+        hash, in a single write.
+        """
+
+        if getattr(self.local, "batch", None) is not None:
+            yield
+            return
+
+        with self.lock:
+            self.local.batch = self.db.write_batch()
+            self.local.pending = dict()
+            self.local.on_commit = []
+
+            try:
+                yield
+                self.local.batch.write()
+
+                for update in self.local.on_commit:
+                    update()
+
+            finally:
+                self.local.batch = None
+                self.local.pending = None
+                self.local.on_commit = None
+
+    def on_commit(self, update):
+        """
+        Applies an update of the in-memory state that follows a write (e.g. to ``triggered_appointments``) once the
+        write is in the database. That is, straightaway unless the current thread is running within an
+        :meth:`atomic_batch`. In that case, the update is applied after the batch is written, or dropped along with it.
+
+        Args:
+            update (:obj:`callable`): the function applying the update.
+        """
+
+        on_commit = getattr(self.local, "on_commit", None)
+
+        if on_commit is not None:
+            on_commit.append(update)
+
+        else:
+            update()
+
+    @contextmanager
+    def write_batch(self):
+        """
+        Gives a write batch to group several writes. If the current thread is running within :meth:`atomic_batch`, the
+        writes are added to it, otherwise a new ``LevelDB`` write batch is created and written when leaving the context.
+        """
+
+        if getattr(self.local, "batch", None) is not None:
+            yield self
+
+        else:
+            with self.db.write_batch() as b:
+                yield b
+
+    def get(self, key):
+        """
+        Gets the value of a given key, taking into account the pending writes of the active :meth:`atomic_batch`.
+
+        Args:
+            key (:obj:`bytes`): the key to get.
+
+        Returns:
+            :obj:`bytes` or :obj:`None`: The value of the key if found. ``None`` otherwise.
+        """
+
+        pending = getattr(self.local, "pending", None)
+
+        if pending is not None and key in pending:
+            return pending[key]
+
+        return self.db.get(key)
+
+    def put(self, key, value):
+        """
+        Writes a value, either straight to the database or to the active :meth:`atomic_batch`.
+
+        Args:
+            key (:obj:`bytes`): the key to write.
+            value (:obj:`bytes`): the value to write.
+        """
+
+        batch = getattr(self.local, "batch", None)
+
+        if batch is not None:
+            batch.put(key, value)
+            self.local.pending[key] = value
+
+        else:
+            self.db.put(key, value)
+
+    def delete(self, key):
+        """
+        Deletes a key, either straight from the database or within the active :meth:`atomic_batch`.
+
+        Args:
+            key (:obj:`bytes`): the key to delete.
+        """
+
+        batch = getattr(self.local, "batch", None)
+
+        if batch is not None:
+            batch.delete(key)
+            self.local.pending[key] = None
+
+        else:
+            self.db.delete(key)
+
+    def iterator(self, prefix, include_value=True):
+        """
+        Iterates over the entries with a given prefix, taking into account the pending writes (and deletions) of the
+        active :meth:`atomic_batch`.
+
+        Args:
+            prefix (:obj:`bytes`): the prefix of the keys to iterate over.
+            include_value (:obj:`bool`): whether to yield ``(key, value)`` tuples or only the keys.
+
+        Yields:
+            :obj:`tuple` or :obj:`bytes`: The ``(key, value)`` of every entry, or only the ``key`` if ``include_value``
+            is False. Entries written within the batch are yielded after the ones already in the database.
+        """
+
+        pending = getattr(self.local, "pending", None)
+        pending = {k: v for k, v in pending.items() if k.startswith(prefix)} if pending else None
+
+        if not pending:
+            yield from self.db.iterator(prefix=prefix, include_value=include_value)
+            return
+
+        for k, v in self.db.iterator(prefix=prefix):
+            if k not in pending:
+                yield (k, v) if include_value else k
+
+        for k, v in pending.items():
+            if v is not None:
+                yield (k, v) if include_value else k
+
     def load_appointments_db(self, prefix):
         """
         Loads all data from the appointments database given a prefix. Two prefixes are defined: ``WATCHER_PREFIX`` and
@@ -69,11 +261,12 @@ class DBManager:
         """
 
         data = {}
+        decode = RECORD_DECODERS.get(prefix, json.loads)
 
-        for k, v in self.db.iterator(prefix=prefix.encode("utf-8")):
+        for k, v in self.iterator(prefix.encode("utf-8")):
             # Get uuid and appointment_data from the db
             uuid = k[len(prefix) :].decode("utf-8")
-            data[uuid] = json.loads(v)
+            data[uuid] = decode(v)
 
         return data
 
@@ -87,7 +280,7 @@ class DBManager:
             Returns ``None`` if the entry is not found.
         """
 
-        last_block = self.db.get(key.encode("utf-8"))
+        last_block = self.get(key.encode("utf-8"))
 
         if last_block:
             last_block = last_block.decode("utf-8")
@@ -110,14 +303,40 @@ class DBManager:
         key = key.encode("utf-8")
         value = value.encode("utf-8")
 
-        self.db.put(key, value)
+        self.put(key, value)
+
+    def create_record(self, key, value, prefix):
+        """
+        Creates a new appointment or tracker entry in the database, encoded as a binary record.
+
+        Data that does not fit the binary format is stored as ``json``.
+
+        Args:
+            key (:obj:`str`): the key of the new entry, used to identify it.
+            value (:obj:`str`): the json encoded data stored under the given ``key``.
+            prefix (:obj:`str`): the prefix added to the ``key`` (either ``WATCHER_PREFIX`` or ``RESPONDER_PREFIX``).
+        """
+
+        try:
+            record = RECORD_ENCODERS[prefix](json.loads(value))
+
+        except ValueError:
+            record = None
 
-    def load_entry(self, key):
+        if record is not None:
+            self.put((prefix + key).encode("utf-8"), record)
+
+        else:
+            self.create_entry(key, value, prefix=prefix)
+
+    def load_entry(self, key, prefix=None):
         """
-        Loads an entry from the database given a ``key``.
+        Loads an entry from the database given a ``key`` (and optionally a ``prefix``).
 
         Args:
             key (:obj:`str`): the key that identifies the entry to be loaded.
+            prefix (:obj:`str`): an optional prefix to be prepended to the ``key``. Entries under ``WATCHER_PREFIX`` and
+                ``RESPONDER_PREFIX`` are decoded as records.
 
         Returns:
             :obj:`dict` or :obj:`None`: A dictionary containing the requested data (an appointment or a tracker).
@@ -125,8 +344,13 @@ class DBManager:
             Returns ``None`` if the entry is not found.
         """
 
-        data = self.db.get(key.encode("utf-8"))
-        data = json.loads(data) if data is not None else data
+        decode = RECORD_DECODERS.get(prefix, json.loads)
+
+        if isinstance(prefix, str):
+            key = prefix + key
+
+        data = self.get(key.encode("utf-8"))
+        data = decode(data) if data is not None else data
         return data
 
     def delete_entry(self, key, prefix=None):
@@ -143,7 +367,7 @@ class DBManager:
 
         key = key.encode("utf-8")
 
-        self.db.delete(key)
+        self.delete(key)
 
     def load_watcher_appointment(self, key):
         """
@@ -155,7 +379,22 @@ class DBManager:
             Returns ``None`` otherwise.
         """
 
-        return self.load_entry(WATCHER_PREFIX + key)
+        return self.load_entry(key, prefix=WATCHER_PREFIX)
+
+    def load_encrypted_blob(self, key):
+        """
+        Loads the encrypted blob of an appointment from the database using ``WATCHER_PREFIX`` as prefix to the given
+        ``key``.
+
+        Returns:
+            :obj:`bytes`: The raw encrypted blob if the ``key`` is found.
+
+            Returns ``None`` otherwise.
+        """
+
+        data = self.get((WATCHER_PREFIX + key).encode("utf-8"))
+
+        return decode_appointment_blob(data) if data is not None else None
 
     def load_responder_tracker(self, key):
         """
@@ -167,7 +406,7 @@ class DBManager:
             Returns ``None`` otherwise.
         """
 
-        return self.load_entry(RESPONDER_PREFIX + key)
+        return self.load_entry(key, prefix=RESPONDER_PREFIX)
 
     def load_watcher_appointments(self, include_triggered=False):
         """
@@ -182,11 +421,9 @@ class DBManager:
         """
 
         appointments = self.load_appointments_db(prefix=WATCHER_PREFIX)
-        triggered_appointments = self.load_all_triggered_flags()
 
         if not include_triggered:
-            not_triggered = list(set(appointments.keys()).difference(triggered_appointments))
-            appointments = {uuid: appointments[uuid] for uuid in not_triggered}
+            appointments = {uuid: data for uuid, data in appointments.items() if not self.is_triggered(uuid)}
 
         return appointments
 
@@ -210,7 +447,7 @@ class DBManager:
             appointment (:obj: `str`): the json encoded appointment to be stored as data.
         """
 
-        self.create_entry(uuid, appointment, prefix=WATCHER_PREFIX)
+        self.create_record(uuid, appointment, prefix=WATCHER_PREFIX)
         logger.info("Adding appointment to Watchers's db", uuid=uuid)
 
     def store_responder_tracker(self, uuid, tracker):
@@ -222,7 +459,7 @@ class DBManager:
             tracker (:obj: `str`): the json encoded tracker to be stored as data.
         """
 
-        self.create_entry(uuid, tracker, prefix=RESPONDER_PREFIX)
+        self.create_record(uuid, tracker, prefix=RESPONDER_PREFIX)
         logger.info("Adding appointment to Responder's db", uuid=uuid)
 
     def load_locator_map(self, locator):
@@ -239,7 +476,7 @@ class DBManager:
         """
 
         key = (LOCATOR_MAP_PREFIX + locator).encode("utf-8")
-        locator_map = self.db.get(key)
+        locator_map = self.get(key)
 
         if locator_map is not None:
             locator_map = json.loads(locator_map.decode("utf-8"))
@@ -260,22 +497,24 @@ class DBManager:
             uuid (:obj:`str`): a 16-byte hex-encoded unique id to create (or add to) the map.
         """
 
-        locator_map = self.load_locator_map(locator)
+        # The map is read and written back within a batch, so concurrent updates of the same map are not lost
+        with self.atomic_batch():
+            locator_map = self.load_locator_map(locator)
 
-        if locator_map is not None:
-            if uuid not in locator_map:
-                locator_map.append(uuid)
-                logger.info("Updating locator map", locator=locator, uuid=uuid)
+            if locator_map is not None:
+                if uuid not in locator_map:
+                    locator_map.append(uuid)
+                    logger.info("Updating locator map", locator=locator, uuid=uuid)
 
-            else:
-                logger.info("UUID already in the map", locator=locator, uuid=uuid)
+                else:
+                    logger.info("UUID already in the map", locator=locator, uuid=uuid)
 
-        else:
-            locator_map = [uuid]
-            logger.info("Creating new locator map", locator=locator, uuid=uuid)
+            else:
+                locator_map = [uuid]
+                logger.info("Creating new locator map", locator=locator, uuid=uuid)
 
-        key = (LOCATOR_MAP_PREFIX + locator).encode("utf-8")
-        self.db.put(key, json.dumps(locator_map).encode("utf-8"))
+            key = (LOCATOR_MAP_PREFIX + locator).encode("utf-8")
+            self.put(key, json.dumps(locator_map).encode("utf-8"))
 
     def update_locator_map(self, locator, locator_map):
         """
@@ -287,14 +526,15 @@ class DBManager:
             locator_map (:obj:`list`): a list of uuids to replace the current one on the db.
         """
 
-        current_locator_map = self.load_locator_map(locator)
+        with self.atomic_batch():
+            current_locator_map = self.load_locator_map(locator)
 
-        if set(locator_map).issubset(current_locator_map) and len(locator_map) is not 0:
-            key = (LOCATOR_MAP_PREFIX + locator).encode("utf-8")
-            self.db.put(key, json.dumps(locator_map).encode("utf-8"))
+            if set(locator_map).issubset(current_locator_map) and len(locator_map) is not 0:
+                key = (LOCATOR_MAP_PREFIX + locator).encode("utf-8")
+                self.put(key, json.dumps(locator_map).encode("utf-8"))
 
-        else:
-            logger.error("Trying to update a locator_map with completely different, or empty, data")
+            else:
+                logger.error("Trying to update a locator_map with completely different, or empty, data")
 
     def delete_locator_map(self, locator):
         """
@@ -326,7 +566,7 @@ class DBManager:
            uuids (:obj:`list`): a list of 16-byte hex-encoded strings identifying the appointments to be deleted.
         """
 
-        with self.db.write_batch() as b:
+        with self.write_batch() as b:
             for uuid in uuids:
                 b.delete((WATCHER_PREFIX + uuid).encode("utf-8"))
                 logger.info("Deleting appointment from Watcher's db", uuid=uuid)
@@ -350,7 +590,7 @@ class DBManager:
            uuids (:obj:`list`): a list of 16-byte hex-encoded strings identifying the trackers to be deleted.
         """
 
-        with self.db.write_batch() as b:
+        with self.write_batch() as b:
             for uuid in uuids:
                 b.delete((RESPONDER_PREFIX + uuid).encode("utf-8"))
                 logger.info("Deleting appointment from Responder's db", uuid=uuid)
@@ -397,6 +637,31 @@ class DBManager:
 
         self.create_entry(RESPONDER_LAST_BLOCK_KEY, block_hash)
 
+    def store_missed_confirmations(self, missed_confirmations):
+        """
+        Stores the missed confirmation count of the unconfirmed penalty transactions of the
+        :obj:`Responder <teos.responder.Responder>`.
+
+        Args:
+            missed_confirmations (:obj:`dict`): the missed confirmation counts (``penalty_txid:count``).
+        """
+
+        self.put(MISSED_CONFIRMATIONS_KEY.encode("utf-8"), json.dumps(missed_confirmations).encode("utf-8"))
+
+    def load_missed_confirmations(self):
+        """
+        Loads the missed confirmation count of the unconfirmed penalty transactions of the
+        :obj:`Responder <teos.responder.Responder>`.
+
+        Returns:
+            :obj:`dict`: A dictionary with the missed confirmation counts (``penalty_txid:count``). An empty dictionary
+            if none are found.
+        """
+
+        data = self.get(MISSED_CONFIRMATIONS_KEY.encode("utf-8"))
+
+        return json.loads(data) if data is not None else dict()
+
     def create_triggered_appointment_flag(self, uuid):
         """
         Creates a flag that signals that an appointment has been triggered.
@@ -405,7 +670,8 @@ class DBManager:
             uuid (:obj:`str`): the identifier of the flag to be created.
         """
 
-        self.db.put((TRIGGERED_APPOINTMENTS_PREFIX + uuid).encode("utf-8"), "".encode("utf-8"))
+        self.put((TRIGGERED_APPOINTMENTS_PREFIX + uuid).encode("utf-8"), "".encode("utf-8"))
+        self.on_commit(partial(self.triggered_appointments.add, uuid))
         logger.info("Flagging appointment as triggered", uuid=uuid)
 
     def batch_create_triggered_appointment_flag(self, uuids):
@@ -416,11 +682,13 @@ class DBManager:
             uuids (:obj:`list`): a list of identifier for the appointments to flag.
         """
 
-        with self.db.write_batch() as b:
+        with self.write_batch() as b:
             for uuid in uuids:
                 b.put((TRIGGERED_APPOINTMENTS_PREFIX + uuid).encode("utf-8"), b"")
                 logger.info("Flagging appointment as triggered", uuid=uuid)
 
+        self.on_commit(partial(self.triggered_appointments.update, list(uuids)))
+
     def load_all_triggered_flags(self):
         """
         Loads all the appointment triggered flags from the database.
@@ -431,9 +699,29 @@ class DBManager:
 
         return [
             k.decode()[len(TRIGGERED_APPOINTMENTS_PREFIX) :]
-            for k, v in self.db.iterator(prefix=TRIGGERED_APPOINTMENTS_PREFIX.encode("utf-8"))
+            for k, v in self.iterator(TRIGGERED_APPOINTMENTS_PREFIX.encode("utf-8"))
         ]
 
+    def is_triggered(self, uuid):
+        """
+        Checks whether an appointment has been flagged as triggered, taking into account the pending writes of the
+        active :meth:`atomic_batch`.
+
+        Args:
+            uuid (:obj:`str`): the identifier of the appointment.
+
+        Returns:
+            :obj:`bool`: ``True`` if the appointment is flagged as triggered, ``False`` otherwise.
+        """
+
+        pending = getattr(self.local, "pending", None)
+        key = (TRIGGERED_APPOINTMENTS_PREFIX + uuid).encode("utf-8")
+
+        if pending is not None and key in pending:
+            return pending[key] is not None
+
+        return uuid in self.triggered_appointments
+
     def delete_triggered_appointment_flag(self, uuid):
         """
         Deletes a flag that signals that an appointment has been triggered.
@@ -443,6 +731,7 @@ class DBManager:
         """
 
         self.delete_entry(uuid, prefix=TRIGGERED_APPOINTMENTS_PREFIX)
+        self.on_commit(partial(self.triggered_appointments.discard, uuid))
         logger.info("Removing triggered flag from appointment appointment", uuid=uuid)
 
     def batch_delete_triggered_appointment_flag(self, uuids):
@@ -453,7 +742,150 @@ class DBManager:
             uuids (:obj:`list`): the identifier of the flag to be removed.
         """
 
-        with self.db.write_batch() as b:
+        with self.write_batch() as b:
             for uuid in uuids:
                 b.delete((TRIGGERED_APPOINTMENTS_PREFIX + uuid).encode("utf-8"))
                 logger.info("Removing triggered flag from appointment appointment", uuid=uuid)
+
+        self.on_commit(partial(self.triggered_appointments.difference_update, list(uuids)))
+
+    def migrate_records(self):
+        """
+        Converts all the appointments and trackers stored as ``json`` by older versions to binary records. Records that
+        do not fit the binary format are left untouched.
+
+        The conversion is done in a single write batch, so it is meant to be run offline (while the tower is stopped).
+
+        Returns:
+            :obj:`int`: The number of migrated records.
+        """
+
+        migrated = 0
+
+        with self.db.write_batch() as b:
+            for prefix, encode in RECORD_ENCODERS.items():
+                for k, v in self.db.iterator(prefix=prefix.encode("utf-8")):
+                    if v[:1] != b"{":
+                        continue
+
+                    record = encode(json.loads(v))
+
+                    if record is not None:
+                        b.put(k, record)
+                        migrated += 1
+
+        logger.info("Records migrated to the binary format", migrated=migrated)
+
+        return migrated
+
+    def store_snapshot(self, key, block_hash, data):
+        """
+        Stores a snapshot of the in-memory data of the :obj:`Watcher <teos.watcher.Watcher>` or the
+        :obj:`Responder <teos.responder.Responder>`, tagged with the last block hash they have processed.
+
+        Snapshots are only taken on a clean shutdown, once the watch threads are stopped. A snapshot that no longer
+        matches the database is discarded on load (see :meth:`load_snapshot`).
+
+        Args:
+            key (:obj:`str`): the key of the snapshot (either ``WATCHER_SNAPSHOT_KEY`` or ``RESPONDER_SNAPSHOT_KEY``).
+            block_hash (:obj:`str`): the last known block hash when the snapshot was taken.
+            data (:obj:`dict`): the in-memory data (``uuid:data``).
+        """
+
+        snapshot = {"block_hash": block_hash, "data": data}
+        self.put(key.encode("utf-8"), json.dumps(snapshot, separators=(",", ":")).encode("utf-8"))
+
+    def load_snapshot(self, key, prefix, last_block_hash, excluded=None):
+        """
+        Loads a snapshot of the in-memory data of the :obj:`Watcher <teos.watcher.Watcher>` or the
+        :obj:`Responder <teos.responder.Responder>`.
+
+        The snapshot is only used if it was taken at ``last_block_hash`` and it does not contain any entry that is not
+        in the database. Entries that are in the database but not in the snapshot (e.g. appointments received after it
+        was taken) are loaded from the database.
+
+        Args:
+            key (:obj:`str`): the key of the snapshot (either ``WATCHER_SNAPSHOT_KEY`` or ``RESPONDER_SNAPSHOT_KEY``).
+            prefix (:obj:`str`): the prefix of the entries the snapshot covers (``WATCHER_PREFIX`` or
+                ``RESPONDER_PREFIX``).
+            last_block_hash (:obj:`str`): the last known block hash stored in the database.
+            excluded (:obj:`set`): a set of uuids not covered by the snapshot (e.g. triggered appointments).
+
+        Returns:
+            :obj:`dict` or :obj:`None`: A dictionary (``uuid:data``) with the data if the snapshot matches the database.
+            ``None`` otherwise.
+        """
+
+        snapshot = self.get(key.encode("utf-8"))
+
+        if snapshot is None:
+            return None
+
+        snapshot = json.loads(snapshot)
+
+        if snapshot.get("block_hash") != last_block_hash:
+            logger.info("Snapshot does not match the last known block", key=key)
+            return None
+
+        data = snapshot.get("data")
+        excluded = excluded if excluded is not None else set()
+        uuids = {k[len(prefix) :].decode("utf-8") for k in self.iterator(prefix.encode("utf-8"), include_value=False)}
+        uuids.difference_update(excluded)
+
+        if not uuids.issuperset(data.keys()):
+            logger.info("Snapshot does not match the database", key=key)
+            return None
+
+        for uuid in uuids.difference(data.keys()):
+            data[uuid] = self.load_entry(uuid, prefix=prefix)
+
+        return data
+
+    def store_watcher_snapshot(self, block_hash, appointments):
+        """
+        Stores a snapshot of the :obj:`Watcher <teos.watcher.Watcher>` appointments (``uuid:{locator, end_time}``).
+
+        Args:
+            block_hash (:obj:`str`): the last block hash known by the :obj:`Watcher <teos.watcher.Watcher>`.
+            appointments (:obj:`dict`): the in-memory appointments of the :obj:`Watcher <teos.watcher.Watcher>`.
+        """
+
+        self.store_snapshot(WATCHER_SNAPSHOT_KEY, block_hash, appointments)
+
+    def load_watcher_snapshot(self):
+        """
+        Loads the snapshot of the :obj:`Watcher <teos.watcher.Watcher>` appointments if it matches the database.
+
+        Returns:
+            :obj:`dict` or :obj:`None`: A dictionary with the non-triggered appointments, as in
+            :meth:`load_watcher_appointments` (appointments covered by the snapshot only contain ``locator`` and
+            ``end_time``). ``None`` if the snapshot is missing or outdated.
+        """
+
+        return self.load_snapshot(
+            WATCHER_SNAPSHOT_KEY, WATCHER_PREFIX, self.load_last_block_hash_watcher(), self.triggered_appointments
+        )
+
+    def store_responder_snapshot(self, block_hash, trackers):
+        """
+        Stores a snapshot of the :obj:`Responder <teos.responder.Responder>` trackers
+        (``uuid:{penalty_txid, locator, appointment_end}``).
+
+        Args:
+            block_hash (:obj:`str`): the last block hash known by the :obj:`Responder <teos.responder.Responder>`.
+            trackers (:obj:`dict`): the in-memory trackers of the :obj:`Responder <teos.responder.Responder>`.
+        """
+
+        self.store_snapshot(RESPONDER_SNAPSHOT_KEY, block_hash, trackers)
+
+    def load_responder_snapshot(self):
+        """
+        Loads the snapshot of the :obj:`Responder <teos.responder.Responder>` trackers if it matches the database.
+
+        Returns:
+            :obj:`dict` or :obj:`None`: A dictionary with the trackers, as in :meth:`load_responder_trackers`
+            (trackers covered by the snapshot only contain ``penalty_txid``, ``locator`` and ``appointment_end``).
+            ``None`` if the snapshot is missing or outdated.
+        """
+
+        return self.load_snapshot(RESPONDER_SNAPSHOT_KEY, RESPONDER_PREFIX, self.load_last_block_hash_responder())
@@ -9,5 +9,6 @@ def show_usage():
         "\n\t--btcrpcconnect \tbitcoind rpcconnect. Defaults to 'localhost' (modifiable in conf file)."
         "\n\t--btcrpcport \t\tbitcoind rpcport. Defaults to '8332' (modifiable in conf file)."
         "\n\t--datadir \t\tspecify data directory. Defaults to '~\.teos' (modifiable in conf file)."
+        "\n\t--migratedb \t\tconverts the db records to the binary format and exits (teosd must be stopped)."
         "\n\t-h --help \t\tshows this message."
     )
@@ -1,11 +1,14 @@
 import re
+import multiprocessing
+from functools import lru_cache
 from binascii import unhexlify
+from concurrent.futures import ProcessPoolExecutor
 
 import common.cryptographer
 from common.constants import LOCATOR_LEN_HEX
 from common.cryptographer import Cryptographer, PublicKey
 
-from teos import errors, LOG_PREFIX
+from teos import errors, LOG_PREFIX, DEFAULT_CONF
 from common.logger import Logger
 from common.appointment import Appointment
 
@@ -21,6 +24,55 @@ common.cryptographer.logger = Logger(actor="Cryptographer", log_name_prefix=LOG_
 BLOCKS_IN_A_MONTH = 4320  # 4320 = roughly a month in blocks
 ENCRYPTED_BLOB_MAX_SIZE_HEX = 2 * 2048
 
+# Parsed public keys are kept (per process) for the most recent clients, so bursts from a client only parse its key once
+PUBLIC_KEY_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=PUBLIC_KEY_CACHE_SIZE)
+def load_public_key(pk):
+    """
+    Parses a hex encoded public key. The most recently used keys are cached.
+
+    Args:
+        pk (:obj:`str`): the public key (hex encoded).
+
+    Returns:
+        :obj:`PublicKey` or :obj:`None`: The parsed public key, or ``None`` if it is not a valid point.
+    """
+
+    try:
+        return PublicKey(unhexlify(pk))
+
+    except ValueError:
+        return None
+
+
+def verify_signature(message, signature, pk):
+    """
+    Checks that the public key recovered from ``signature`` and ``message`` matches ``pk``.
+
+    This is a module level function so it can be run by the workers of a process pool.
+
+    Args:
+        message (:obj:`bytes`): the signed message (a serialized appointment).
+        signature (:obj:`str`): the zbase32 signature of the message.
+        pk (:obj:`str`): the public key of the signer (hex encoded).
+
+    Returns:
+        :obj:`bool`: True if the signature is valid, False otherwise.
+    """
+
+    pk = load_public_key(pk)
+
+    try:
+        rpk = Cryptographer.recover_pk(message, signature)
+
+    except (ValueError, IndexError):
+        # Signatures that cannot be zbase32 decoded, or that are empty once decoded
+        rpk = None
+
+    return pk is not None and rpk is not None and Cryptographer.verify_rpk(pk, rpk)
+
 
 class Inspector:
     """
@@ -29,14 +81,35 @@ class Inspector:
     Args:
         block_processor (:obj:`BlockProcessor <teos.block_processor.BlockProcessor>`): a ``BlockProcessor`` instance.
         min_to_self_delay (:obj:`int`): the minimum to_self_delay accepted in appointments.
+        verify_workers (:obj:`int`): the number of processes used to verify the signatures of a batch of appointments.
 
+    Attributes:
+        verifier (:obj:`ProcessPoolExecutor`): the pool of processes used to verify signatures. ``None`` if
+            ``verify_workers`` is not greater than one. The workers are spawned (instead of forked) since the pool is
+            used from the API threads.
     """
 
-    def __init__(self, block_processor, min_to_self_delay):
+    def __init__(self, block_processor, min_to_self_delay, verify_workers=DEFAULT_CONF["VERIFY_WORKERS"]["value"]):
         self.block_processor = block_processor
         self.min_to_self_delay = min_to_self_delay
+        self.verify_workers = verify_workers
 
-    def inspect(self, appointment_data, signature, public_key):
+        if verify_workers > 1:
+            self.verifier = ProcessPoolExecutor(
+                max_workers=verify_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            self.verifier = None
+
+    def shutdown(self):
+        """
+        Shuts down the pool of processes used to verify signatures, if any.
+        """
+
+        if self.verifier is not None:
+            self.verifier.shutdown()
+
+    def inspect(self, appointment_data, signature, public_key, block_height=None, verify_sig=True):
         """
         Inspects whether the data provided by the user is correct.
 
@@ -44,6 +117,9 @@ class Inspector:
             appointment_data (:obj:`dict`): a dictionary containing the appointment data.
             signature (:obj:`str`): the appointment signature provided by the user (hex encoded).
             public_key (:obj:`str`): the user's public key (hex encoded).
+            block_height (:obj:`int`): the chain height to check the appointment against. It is obtained from the
+                :obj:`BlockProcessor <teos.block_processor.BlockProcessor>` if not given.
+            verify_sig (:obj:`bool`): whether to verify the signature. If False, only its format is checked.
 
         Returns:
             :obj:`Appointment <teos.appointment.Appointment>` or :obj:`tuple`: An appointment initialized with the
@@ -54,7 +130,9 @@ class Inspector:
             Errors are defined in :mod:`Errors <teos.errors>`.
         """
 
-        block_height = self.block_processor.get_block_count()
+        # The height is taken from the chain tip kept by the ChainMonitor, bitcoind is only queried if it may be stale
+        if block_height is None:
+            block_height = self.block_processor.get_tip_height()
 
         if block_height is not None:
             rcode, message = self.check_locator(appointment_data.get("locator"))
@@ -69,8 +147,10 @@ class Inspector:
                 rcode, message = self.check_to_self_delay(appointment_data.get("to_self_delay"))
             if rcode == 0:
                 rcode, message = self.check_blob(appointment_data.get("encrypted_blob"))
-            if rcode == 0:
+            if rcode == 0 and verify_sig:
                 rcode, message = self.check_appointment_signature(appointment_data, signature, public_key)
+            elif rcode == 0:
+                rcode, message = self.check_signature_format(signature, public_key)
 
             if rcode == 0:
                 r = Appointment.from_dict(appointment_data)
@@ -83,6 +163,72 @@ class Inspector:
 
         return r
 
+    def inspect_batch(self, appointments_data):
+        """
+        Inspects a batch of appointments. All of them are checked against the same chain height.
+
+        The signatures of the appointments that pass the rest of the checks are verified together by
+        :meth:`verify_signatures`.
+
+        Args:
+            appointments_data (:obj:`list`): a list of dictionaries, each one containing the ``appointment`` data, the
+                ``signature`` and the ``public_key`` of a user request.
+
+        Returns:
+            :obj:`list`: A list with the result of :meth:`inspect` for every appointment, in the same order.
+        """
+
+        block_height = self.block_processor.get_tip_height()
+        results = []
+
+        for data in appointments_data:
+            if isinstance(data, dict) and isinstance(data.get("appointment"), dict):
+                results.append(
+                    self.inspect(
+                        data.get("appointment"), data.get("signature"), data.get("public_key"), block_height, False
+                    )
+                )
+
+            else:
+                results.append((errors.APPOINTMENT_WRONG_FIELD_TYPE, "wrong appointment data type"))
+
+        to_verify = [i for i, r in enumerate(results) if type(r) == Appointment]
+        valid_sigs = self.verify_signatures(
+            [
+                (results[i].serialize(), appointments_data[i].get("signature"), appointments_data[i].get("public_key"))
+                for i in to_verify
+            ]
+        )
+
+        for i, valid_sig in zip(to_verify, valid_sigs):
+            if not valid_sig:
+                results[i] = (errors.APPOINTMENT_INVALID_SIGNATURE, "invalid signature")
+
+        return results
+
+    def verify_signatures(self, signed_messages):
+        """
+        Verifies a batch of signatures.
+
+        The signatures are verified by a pool of ``verify_workers`` processes, so the recovery of the public keys is not
+        bound to the API threads. Small batches (or a single worker) are verified in the calling thread.
+
+        Args:
+            signed_messages (:obj:`list`): a list of tuples ``(message, signature, public_key)`` as the ones taken by
+                :func:`verify_signature`.
+
+        Returns:
+            :obj:`list`: A list of booleans, True for the valid signatures, in the same order.
+        """
+
+        if len(signed_messages) > 1 and self.verifier is not None:
+            # Sending several signatures per task so the cost of passing them to the workers is amortised
+            chunksize = max(1, len(signed_messages) // (4 * self.verify_workers))
+            return list(self.verifier.map(verify_signature, *zip(*signed_messages), chunksize=chunksize))
+
+        else:
+            return [verify_signature(*signed_message) for signed_message in signed_messages]
+
     @staticmethod
     def check_locator(locator):
         """
@@ -361,6 +507,35 @@ class Inspector:
             ``APPOINTMENT_WRONG_FIELD_FORMAT``.
         """
 
+        rcode, message = Inspector.check_signature_format(signature, pk)
+
+        if rcode == 0:
+            appointment = Appointment.from_dict(appointment_data)
+
+            if not verify_signature(appointment.serialize(), signature, pk):
+                rcode = errors.APPOINTMENT_INVALID_SIGNATURE
+                message = "invalid signature"
+
+        return rcode, message
+
+    @staticmethod
+    def check_signature_format(signature, pk):
+        """
+        Checks if the provided user signature and public key are properly formatted (the signature is not verified).
+
+        Args:
+            signature (:obj:`str`): the user's signature (hex encoded).
+            pk (:obj:`str`): the user's public key (hex encoded).
+
+        Returns:
+            :obj:`tuple`: A tuple (return code, message) as follows:
+
+            - ``(0, None)`` if the ``signature`` and ``pk`` are properly formatted.
+            - ``!= (0, None)`` otherwise.
+
+            The possible return errors are: ``APPOINTMENT_EMPTY_FIELD`` and ``APPOINTMENT_WRONG_FIELD``.
+        """
+
         message = None
         rcode = 0
 
@@ -372,18 +547,12 @@ class Inspector:
             rcode = errors.APPOINTMENT_EMPTY_FIELD
             message = "empty public key received"
 
-        elif re.match(r"^[0-9A-Fa-f]{66}$", pk) is None:
+        elif not isinstance(signature, str):
+            rcode = errors.APPOINTMENT_WRONG_FIELD_TYPE
+            message = "wrong signature data type ({})".format(type(signature))
+
+        elif not isinstance(pk, str) or re.match(r"^[0-9A-Fa-f]{66}$", pk) is None:
             rcode = errors.APPOINTMENT_WRONG_FIELD
             message = "public key must be a hex encoded 33-byte long value"
 
-        else:
-            appointment = Appointment.from_dict(appointment_data)
-            rpk = Cryptographer.recover_pk(appointment.serialize(), signature)
-            pk = PublicKey(unhexlify(pk))
-            valid_sig = Cryptographer.verify_rpk(pk, rpk)
-
-            if not valid_sig:
-                rcode = errors.APPOINTMENT_INVALID_SIGNATURE
-                message = "invalid signature"
-
         return rcode, message
@@ -0,0 +1,112 @@
+from time import monotonic
+from queue import Queue
+from collections import deque
+from threading import Thread, Lock
+from concurrent.futures import Future
+
+import common.cryptographer
+from common.logger import Logger
+from common.cryptographer import Cryptographer
+
+from teos import LOG_PREFIX
+
+logger = Logger(actor="ReceiptSigner", log_name_prefix=LOG_PREFIX)
+common.cryptographer.logger = Logger(actor="Cryptographer", log_name_prefix=LOG_PREFIX)
+
+# Number of recent signing latencies the percentiles are computed from
+LATENCY_WINDOW_SIZE = 1000
+LATENCY_PERCENTILES = [50, 90, 99]
+
+# The latency percentiles are logged every REPORT_INTERVAL signed receipts
+REPORT_INTERVAL = 1000
+
+
+class ReceiptSigner:
+    """
+    The :class:`ReceiptSigner` signs the receipts of the accepted appointments using a dedicated pool of threads, so
+    signing does not hold the threads serving the API requests.
+
+    Receipts are queued in a bounded queue. Once the queue is full, new submissions block until the workers catch up.
+
+    Args:
+        signing_key (:mod:`PrivateKey`): the private key used to sign the receipts.
+        workers (:obj:`int`): the number of signing threads.
+        queue_size (:obj:`int`): the maximum number of receipts waiting to be signed.
+
+    Attributes:
+        queue (:obj:`Queue`): the receipts waiting to be signed (``message``, ``future`` and submission time).
+        latencies (:obj:`deque`): the latencies (in seconds) of the last ``LATENCY_WINDOW_SIZE`` signed receipts,
+            measured from their submission.
+        signed (:obj:`int`): the number of receipts signed so far.
+    """
+
+    def __init__(self, signing_key, workers, queue_size):
+        self.signing_key = signing_key
+        self.queue = Queue(maxsize=queue_size)
+        self.latencies = deque(maxlen=LATENCY_WINDOW_SIZE)
+        self.signed = 0
+        self.lock = Lock()
+
+        for _ in range(max(workers, 1)):
+            Thread(target=self.do_sign, daemon=True).start()
+
+    def submit(self, message):
+        """
+        Queues a receipt to be signed. Blocks if the queue is full.
+
+        Args:
+            message (:obj:`bytes`): the data to be signed (a serialized appointment).
+
+        Returns:
+            :obj:`Future`: A future that resolves to the signature (:obj:`str`).
+        """
+
+        future = Future()
+        self.queue.put((message, future, monotonic()))
+
+        return future
+
+    def do_sign(self):
+        """
+        Signs the queued receipts. This is the target of every signing thread.
+        """
+
+        while True:
+            message, future, submitted_at = self.queue.get()
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(Cryptographer.sign(message, self.signing_key))
+
+                except Exception as e:
+                    future.set_exception(e)
+
+            with self.lock:
+                self.latencies.append(monotonic() - submitted_at)
+                self.signed += 1
+                report = self.signed % REPORT_INTERVAL == 0
+
+            if report:
+                logger.info("Receipt signing latency (ms)", signed=self.signed, **self.get_latency_percentiles())
+
+            self.queue.task_done()
+
+    def get_latency_percentiles(self):
+        """
+        Computes the signing latency percentiles over the last ``LATENCY_WINDOW_SIZE`` signed receipts.
+
+        Returns:
+            :obj:`dict`: A dictionary with the ``LATENCY_PERCENTILES`` (``p50``, ``p90`` and ``p99``) in milliseconds.
+            Empty if no receipt has been signed yet.
+        """
+
+        with self.lock:
+            latencies = sorted(self.latencies)
+
+        if len(latencies) == 0:
+            return {}
+
+        return {
+            "p{}".format(p): round(1000 * latencies[min(len(latencies) - 1, len(latencies) * p // 100)], 3)
+            for p in LATENCY_PERCENTILES
+        }
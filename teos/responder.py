@@ -1,6 +1,7 @@
 import json
+import heapq
 from queue import Queue
-from threading import Thread
+from threading import Thread, RLock
 
 from teos import LOG_PREFIX
 from common.logger import Logger
@@ -116,9 +117,17 @@ class Responder:
             Each entry is identified by a ``uuid``.
         tx_tracker_map (:obj:`dict`): A ``penalty_txid:uuid`` map used to allow the :obj:`Responder` to deal with
             several trackers triggered by the same ``penalty_txid``.
-        unconfirmed_txs (:obj:`list`): A list that keeps track of all unconfirmed ``penalty_txs``.
-        missed_confirmations (:obj:`dict`): A dictionary that keeps count of how many confirmations each ``penalty_tx``
-            has missed. Used to trigger rebroadcast if needed.
+        height_tracker_map (:obj:`dict`): A ``height:uuid`` map with the height at which each tracker may be completed
+            (``appointment_end`` is reached and the ``penalty_tx`` has ``MIN_CONFIRMATIONS``). Used to check only the
+            trackers that are due instead of all of them.
+        scheduled_heights (:obj:`list`): A min-heap with the heights in ``height_tracker_map``, so the due ones can be
+            found without going through the whole schedule. It is rebuilt whenever ``height_tracker_map`` is set.
+        confirmation_heights (:obj:`dict`): A ``penalty_txid:height`` map with the height at which each monitored
+            ``penalty_tx`` was confirmed (if known).
+        unconfirmed_txs (:obj:`set`): A set that keeps track of all unconfirmed ``penalty_txs``.
+        missed_confirmations (:obj:`dict`): A ``penalty_txid:count`` map that keeps count of how many confirmations
+            each unconfirmed ``penalty_tx`` has missed. Used to trigger rebroadcast if needed. It is stored in the
+            database on every block, so the counts (and ``unconfirmed_txs``) survive restarts.
         block_queue (:obj:`Queue`): A queue used by the :obj:`Responder` to receive block hashes from ``bitcoind``. It
         is populated by the :obj:`ChainMonitor <teos.chain_monitor.ChainMonitor>`.
         db_manager (:obj:`DBManager <teos.db_manager.DBManager>`): A ``DBManager`` instance to interact with the
@@ -127,19 +136,36 @@ class Responder:
         block_processor (:obj:`DBManager <teos.block_processor.BlockProcessor>`): a ``BlockProcessor`` instance to get
             data from bitcoind.
         last_known_block (:obj:`str`): the last block known by the ``Responder``.
+        lock (:obj:`RLock`): a lock used to protect the in-memory trackers from being updated by the block thread of the
+            ``Responder`` and the threads handing breaches to it (block and mempool threads of the
+            :obj:`Watcher <teos.watcher.Watcher>`) at the same time. If both are needed, the database batch
+            (:meth:`DBManager.atomic_batch <teos.db_manager.DBManager.atomic_batch>`) is started before taking it.
 
     """
 
     def __init__(self, db_manager, carrier, block_processor):
         self.trackers = dict()
         self.tx_tracker_map = dict()
-        self.unconfirmed_txs = []
-        self.missed_confirmations = dict()
+        self.height_tracker_map = dict()
+        self.confirmation_heights = dict()
+        self.missed_confirmations = db_manager.load_missed_confirmations()
+        self.unconfirmed_txs = set(self.missed_confirmations)
         self.block_queue = Queue()
         self.db_manager = db_manager
         self.carrier = carrier
         self.block_processor = block_processor
         self.last_known_block = db_manager.load_last_block_hash_responder()
+        self.lock = RLock()
+
+    @property
+    def height_tracker_map(self):
+        return self._height_tracker_map
+
+    @height_tracker_map.setter
+    def height_tracker_map(self, height_tracker_map):
+        self._height_tracker_map = height_tracker_map
+        self.scheduled_heights = list(height_tracker_map)
+        heapq.heapify(self.scheduled_heights)
 
     def awake(self):
         responder_thread = Thread(target=self.do_watch, daemon=True)
@@ -196,19 +222,21 @@ class Responder:
             into the blockchain.
         """
 
-        receipt = self.carrier.send_transaction(penalty_rawtx, penalty_txid)
+        # Breaches may be handed from the Watcher block and mempool threads while the Responder is processing a block
+        with self.lock:
+            receipt = self.carrier.send_transaction(penalty_rawtx, penalty_txid)
 
-        if receipt.delivered:
-            self.add_tracker(
-                uuid, locator, dispute_txid, penalty_txid, penalty_rawtx, appointment_end, receipt.confirmations
-            )
+            if receipt.delivered:
+                self.add_tracker(
+                    uuid, locator, dispute_txid, penalty_txid, penalty_rawtx, appointment_end, receipt.confirmations
+                )
 
-        else:
-            # TODO: Add the missing reasons (e.g. RPC_VERIFY_REJECTED)
-            # TODO: Use self.on_sync(block_hash) to check whether or not we failed because we are out of sync
-            logger.warning(
-                "Tracker cannot be created", reason=receipt.reason, uuid=uuid, on_sync=self.on_sync(block_hash)
-            )
+            else:
+                # TODO: Add the missing reasons (e.g. RPC_VERIFY_REJECTED)
+                # TODO: Use self.on_sync(block_hash) to check whether or not we failed because we are out of sync
+                logger.warning(
+                    "Tracker cannot be created", reason=receipt.reason, uuid=uuid, on_sync=self.on_sync(block_hash)
+                )
 
         return receipt
 
@@ -217,7 +245,8 @@ class Responder:
         Creates a :obj:`TransactionTracker` after successfully broadcasting a ``penalty_tx``.
 
         A reduction of :obj:`TransactionTracker` is stored in ``trackers`` and ``tx_tracker_map`` and the
-        ``penalty_txid`` added to ``unconfirmed_txs`` if ``confirmations=0``. Finally, all the data is stored in the
+        ``penalty_txid`` added to ``unconfirmed_txs`` if ``confirmations=0``. Trackers for transactions that are already
+        confirmed are scheduled for completion in ``height_tracker_map``. Finally, all the data is stored in the
         database.
 
         Args:
@@ -234,24 +263,38 @@ class Responder:
 
         tracker = TransactionTracker(locator, dispute_txid, penalty_txid, penalty_rawtx, appointment_end)
 
-        # We only store the penalty_txid, locator and appointment_end in memory. The rest is dumped into the db.
-        self.trackers[uuid] = {
-            "penalty_txid": tracker.penalty_txid,
-            "locator": locator,
-            "appointment_end": appointment_end,
-        }
+        # The tracker and its missed confirmation count are written together, so a restart cannot leave the penalty out
+        # of unconfirmed_txs (which is rebuilt from the stored counts)
+        with self.db_manager.atomic_batch(), self.lock:
+            # We only store the penalty_txid, locator and appointment_end in memory. The rest is dumped into the db.
+            self.trackers[uuid] = {
+                "penalty_txid": tracker.penalty_txid,
+                "locator": locator,
+                "appointment_end": appointment_end,
+            }
 
-        if penalty_txid in self.tx_tracker_map:
-            self.tx_tracker_map[penalty_txid].append(uuid)
+            if penalty_txid in self.tx_tracker_map:
+                self.tx_tracker_map[penalty_txid].append(uuid)
 
-        else:
-            self.tx_tracker_map[penalty_txid] = [uuid]
+            else:
+                self.tx_tracker_map[penalty_txid] = [uuid]
+
+            if penalty_txid in self.confirmation_heights:
+                completion_height = self.confirmation_heights[penalty_txid] + MIN_CONFIRMATIONS - 1
+                self.schedule_tracker(uuid, max(appointment_end, completion_height))
 
-        # In the case we receive two trackers with the same penalty txid we only add it to the unconfirmed txs list once
-        if penalty_txid not in self.unconfirmed_txs and confirmations == 0:
-            self.unconfirmed_txs.append(penalty_txid)
+            elif confirmations > 0:
+                # The confirmation height is unknown, so the confirmation count will be checked with bitcoind once the
+                # appointment end is reached.
+                self.schedule_tracker(uuid, appointment_end)
 
-        self.db_manager.store_responder_tracker(uuid, tracker.to_json())
+            # In the case we receive two trackers with the same penalty txid we only add it to the unconfirmed txs once
+            elif penalty_txid not in self.unconfirmed_txs:
+                self.unconfirmed_txs.add(penalty_txid)
+                self.missed_confirmations[penalty_txid] = 0
+                self.db_manager.store_missed_confirmations(self.missed_confirmations)
+
+            self.db_manager.store_responder_tracker(uuid, tracker.to_json())
 
         logger.info(
             "New tracker added", dispute_txid=dispute_txid, penalty_txid=penalty_txid, appointment_end=appointment_end
@@ -274,69 +317,89 @@ class Responder:
             block = self.block_processor.get_block(block_hash)
             logger.info("New block received", block_hash=block_hash, prev_block_hash=block.get("previousblockhash"))
 
-            if len(self.trackers) > 0 and block is not None:
-                txids = block.get("tx")
+            # All the db changes derived from the block are written at once, along with the last known block. The lock
+            # keeps the Watcher threads from adding trackers while the block is processed. The batch is started first,
+            # so it waits for the pending batch of the Watcher (if any) to be written, as the Watcher takes both in the
+            # same order (batch, then the lock of the Responder)
+            with self.db_manager.atomic_batch(), self.lock:
+                if len(self.trackers) > 0 and block is not None:
+                    txids = block.get("tx")
+
+                    if self.last_known_block == block.get("previousblockhash"):
+                        height = block.get("height")
+                        self.check_confirmations(txids, height)
+
+                        completed_trackers = self.get_completed_trackers(height)
+                        completed_txids = {self.trackers[uuid].get("penalty_txid") for uuid in completed_trackers}
+                        Cleaner.delete_completed_trackers(
+                            completed_trackers, height, self.trackers, self.tx_tracker_map, self.db_manager
+                        )
 
-                if self.last_known_block == block.get("previousblockhash"):
-                    self.check_confirmations(txids)
+                        # Forget the confirmation height of the penalty transactions that are not tracked anymore
+                        for penalty_txid in completed_txids:
+                            if penalty_txid not in self.tx_tracker_map:
+                                self.confirmation_heights.pop(penalty_txid, None)
 
-                    height = block.get("height")
-                    completed_trackers = self.get_completed_trackers(height)
-                    Cleaner.delete_completed_trackers(
-                        completed_trackers, height, self.trackers, self.tx_tracker_map, self.db_manager
-                    )
+                        txs_to_rebroadcast = self.get_txs_to_rebroadcast()
+                        self.rebroadcast(txs_to_rebroadcast)
 
-                    txs_to_rebroadcast = self.get_txs_to_rebroadcast()
-                    self.rebroadcast(txs_to_rebroadcast)
+                        self.db_manager.store_missed_confirmations(self.missed_confirmations)
 
-                # NOTCOVERED
-                else:
-                    logger.warning(
-                        "Reorg found",
-                        local_prev_block_hash=self.last_known_block,
-                        remote_prev_block_hash=block.get("previousblockhash"),
-                    )
+                    # NOTCOVERED
+                    else:
+                        logger.warning(
+                            "Reorg found",
+                            local_prev_block_hash=self.last_known_block,
+                            remote_prev_block_hash=block.get("previousblockhash"),
+                        )
 
-                    # ToDo: #24-properly-handle-reorgs
-                    self.handle_reorgs(block_hash)
+                        # ToDo: #24-properly-handle-reorgs
+                        self.handle_reorgs(block_hash)
 
-                # Clear the receipts issued in this block
-                self.carrier.issued_receipts = {}
+                    # Clear the receipts issued in this block
+                    self.carrier.issued_receipts = {}
 
-                if len(self.trackers) is 0:
-                    logger.info("No more pending trackers")
+                    if len(self.trackers) is 0:
+                        logger.info("No more pending trackers")
+
+                # Register the last processed block for the responder
+                self.db_manager.store_last_block_hash_responder(block_hash)
 
-            # Register the last processed block for the responder
-            self.db_manager.store_last_block_hash_responder(block_hash)
             self.last_known_block = block.get("hash")
             self.block_queue.task_done()
 
-    def check_confirmations(self, txs):
+    def check_confirmations(self, txs, height):
         """
         Checks if any of the monitored ``penalty_txs`` has received it's first confirmation or keeps missing them.
 
-        This method manages ``unconfirmed_txs`` and ``missed_confirmations``.
+        This method manages ``unconfirmed_txs`` and ``missed_confirmations``. Trackers whose ``penalty_tx`` gets
+        confirmed are scheduled for completion in ``height_tracker_map``, and the transaction is no longer counted as
+        missing confirmations.
 
         Args:
             txs (:obj:`list`): A list of confirmed tx ids (the list of transactions included in the last received
                 block).
+            height (:obj:`int`): the height of the last received block.
         """
 
-        # If a new confirmed tx matches a tx we are watching, then we remove it from the unconfirmed txs map
+        # If a new confirmed tx matches a tx we are watching, then we remove it from the unconfirmed txs
         for tx in txs:
-            if tx in self.tx_tracker_map and tx in self.unconfirmed_txs:
+            if tx in self.unconfirmed_txs and tx in self.tx_tracker_map:
                 self.unconfirmed_txs.remove(tx)
+                self.missed_confirmations.pop(tx, None)
+                self.confirmation_heights[tx] = height
+
+                # The trackers can be completed once the end is reached and the transaction is buried deep enough
+                for uuid in self.tx_tracker_map[tx]:
+                    appointment_end = self.trackers[uuid].get("appointment_end")
+                    self.schedule_tracker(uuid, max(appointment_end, height + MIN_CONFIRMATIONS - 1))
 
                 logger.info("Confirmation received for transaction", tx=tx)
 
         # We also add a missing confirmation to all those txs waiting to be confirmed that have not been confirmed in
-        # the current block
-        for tx in self.unconfirmed_txs:
-            if tx in self.missed_confirmations:
-                self.missed_confirmations[tx] += 1
-
-            else:
-                self.missed_confirmations[tx] = 1
+        # the current block. A snapshot is iterated, so it is safe even if a tracker is added meanwhile
+        for tx in list(self.unconfirmed_txs):
+            self.missed_confirmations[tx] = self.missed_confirmations.get(tx, 0) + 1
 
             logger.info("Transaction missed a confirmation", tx=tx, missed_confirmations=self.missed_confirmations[tx])
 
@@ -350,18 +413,55 @@ class Responder:
 
         txs_to_rebroadcast = []
 
-        for tx, missed_conf in self.missed_confirmations.items():
+        for tx, missed_conf in list(self.missed_confirmations.items()):
             if missed_conf >= CONFIRMATIONS_BEFORE_RETRY:
                 # If a transactions has missed too many confirmations we add it to the rebroadcast list
                 txs_to_rebroadcast.append(tx)
 
         return txs_to_rebroadcast
 
+    def schedule_tracker(self, uuid, height):
+        """
+        Schedules a tracker to be checked for completion at a given height.
+
+        Args:
+            uuid (:obj:`str`): the identifier of the tracker.
+            height (:obj:`int`): the height at which the tracker may be completed.
+        """
+
+        if height in self.height_tracker_map:
+            self.height_tracker_map[height].append(uuid)
+
+        else:
+            self.height_tracker_map[height] = [uuid]
+            heapq.heappush(self.scheduled_heights, height)
+
+    def unschedule_tracker(self, uuid, height):
+        """
+        Removes a tracker from the completion schedule at a given height.
+
+        Args:
+            uuid (:obj:`str`): the identifier of the tracker.
+            height (:obj:`int`): the height at which the tracker was scheduled.
+        """
+
+        if len(self.height_tracker_map[height]) == 1:
+            self.height_tracker_map.pop(height)
+
+        else:
+            self.height_tracker_map[height].remove(uuid)
+
     def get_completed_trackers(self, height):
         """
         Gets the trackers that has already been fulfilled based on a given height (``end_time`` was reached with a
         minimum confirmation count).
 
+        Only the trackers scheduled up to ``height`` in ``height_tracker_map`` are checked, and the due heights are
+        popped from ``scheduled_heights``, so the cost depends on the trackers that are due. The confirmation count is
+        computed from ``confirmation_heights``, and ``bitcoind`` is only queried if the confirmation height of the
+        ``penalty_tx`` is unknown (e.g. after bootstrapping from the database). Trackers that are not buried deep enough
+        yet are rescheduled.
+
         Args:
             height (:obj:`int`): the height of the last received block.
 
@@ -370,26 +470,66 @@ class Responder:
         """
 
         completed_trackers = {}
-        checked_txs = {}
 
-        for uuid, tracker_data in self.trackers.items():
-            appointment_end = tracker_data.get("appointment_end")
-            penalty_txid = tracker_data.get("penalty_txid")
-            if appointment_end <= height and penalty_txid not in self.unconfirmed_txs:
+        # Heights that were unscheduled (or pushed twice) may still be in the heap, they are skipped here
+        due_heights = []
+        while len(self.scheduled_heights) > 0 and self.scheduled_heights[0] <= height:
+            due_height = heapq.heappop(self.scheduled_heights)
 
-                if penalty_txid not in checked_txs:
-                    tx = self.carrier.get_transaction(penalty_txid)
-                else:
+            if due_height in self.height_tracker_map and due_height not in due_heights:
+                due_heights.append(due_height)
+
+        # The penalties with unknown confirmation height are queried to bitcoind using a single batch request
+        unknown_txids = []
+        for due_height in due_heights:
+            for uuid in self.height_tracker_map[due_height]:
+                penalty_txid = self.trackers.get(uuid, {}).get("penalty_txid")
+
+                if (
+                    penalty_txid is not None
+                    and penalty_txid not in self.confirmation_heights
+                    and penalty_txid not in self.unconfirmed_txs
+                ):
+                    unknown_txids.append(penalty_txid)
+
+        checked_txs = self.carrier.get_transactions(unknown_txids)
+
+        for due_height in due_heights:
+            for uuid in list(self.height_tracker_map[due_height]):
+                tracker_data = self.trackers.get(uuid)
+
+                # Trackers that have already been deleted, or whose penalty is unconfirmed (it'll be rescheduled once
+                # it gets confirmed), are taken out of the schedule
+                if tracker_data is None or tracker_data.get("penalty_txid") in self.unconfirmed_txs:
+                    self.unschedule_tracker(uuid, due_height)
+                    continue
+
+                penalty_txid = tracker_data.get("penalty_txid")
+                confirmation_height = self.confirmation_heights.get(penalty_txid)
+
+                if confirmation_height is None:
                     tx = checked_txs.get(penalty_txid)
 
-                if tx is not None:
-                    confirmations = tx.get("confirmations")
-                    checked_txs[penalty_txid] = tx
+                    if tx is not None and tx.get("confirmations") is not None:
+                        confirmation_height = height - tx.get("confirmations") + 1
+                        self.confirmation_heights[penalty_txid] = confirmation_height
+
+                if confirmation_height is not None:
+                    confirmations = height - confirmation_height + 1
 
-                    if confirmations is not None and confirmations >= MIN_CONFIRMATIONS:
+                    if confirmations >= MIN_CONFIRMATIONS:
                         # The end of the appointment has been reached
                         completed_trackers[uuid] = confirmations
 
+                    else:
+                        self.unschedule_tracker(uuid, due_height)
+                        self.schedule_tracker(uuid, confirmation_height + MIN_CONFIRMATIONS - 1)
+
+        # The heights with trackers left (completed trackers, or with unknown confirmations) are checked again next time
+        for due_height in due_heights:
+            if due_height in self.height_tracker_map:
+                heapq.heappush(self.scheduled_heights, due_height)
+
         return completed_trackers
 
     def rebroadcast(self, txs_to_rebroadcast):
@@ -412,6 +552,8 @@ class Responder:
         # ToDo: #23-define-behaviour-approaching-end
 
         receipts = []
+        trackers_to_rebroadcast = []
+        penalty_rawtxs = dict()
 
         for txid in txs_to_rebroadcast:
             self.missed_confirmations[txid] = 0
@@ -424,12 +566,19 @@ class Responder:
                     "Transaction has missed many confirmations. Rebroadcasting", penalty_txid=tracker.penalty_txid
                 )
 
-                receipt = self.carrier.send_transaction(tracker.penalty_rawtx, tracker.penalty_txid)
-                receipts.append((txid, receipt))
+                trackers_to_rebroadcast.append((txid, tracker))
+                penalty_rawtxs[tracker.penalty_txid] = tracker.penalty_rawtx
+
+        # All the penalties are sent using a single batch request
+        penalty_receipts = self.carrier.send_transactions(penalty_rawtxs)
 
-                if not receipt.delivered:
-                    # FIXME: Can this actually happen?
-                    logger.warning("Transaction failed", penalty_txid=tracker.penalty_txid)
+        for txid, tracker in trackers_to_rebroadcast:
+            receipt = penalty_receipts[tracker.penalty_txid]
+            receipts.append((txid, receipt))
+
+            if not receipt.delivered:
+                # FIXME: Can this actually happen?
+                logger.warning("Transaction failed", penalty_txid=tracker.penalty_txid)
 
         return receipts
 
@@ -444,21 +593,32 @@ class Responder:
 
         """
 
+        trackers = dict()
         for uuid in self.trackers.keys():
-            tracker = TransactionTracker.from_dict(self.db_manager.load_responder_tracker(uuid))
+            trackers[uuid] = TransactionTracker.from_dict(self.db_manager.load_responder_tracker(uuid))
+
+        # Both the dispute and penalty transactions of every tracker are queried using a single batch request
+        txs = self.carrier.get_transactions(
+            [tracker.dispute_txid for tracker in trackers.values()]
+            + [tracker.penalty_txid for tracker in trackers.values()]
+        )
 
+        for uuid, tracker in trackers.items():
             # First we check if the dispute transaction is known (exists either in mempool or blockchain)
-            dispute_tx = self.carrier.get_transaction(tracker.dispute_txid)
+            dispute_tx = txs.get(tracker.dispute_txid)
 
             if dispute_tx is not None:
                 # If the dispute is there, we check the penalty
-                penalty_tx = self.carrier.get_transaction(tracker.penalty_txid)
+                penalty_tx = txs.get(tracker.penalty_txid)
 
                 if penalty_tx is not None:
                     # If the penalty exists we need to check is it's on the blockchain or not so we can update the
                     # unconfirmed transactions list accordingly.
                     if penalty_tx.get("confirmations") is None:
-                        self.unconfirmed_txs.append(tracker.penalty_txid)
+                        self.unconfirmed_txs.add(tracker.penalty_txid)
+                        self.missed_confirmations.setdefault(tracker.penalty_txid, 0)
+                        self.db_manager.store_missed_confirmations(self.missed_confirmations)
+                        self.confirmation_heights.pop(tracker.penalty_txid, None)
 
                         logger.info(
                             "Penalty transaction back in mempool. Updating unconfirmed transactions",
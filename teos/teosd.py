@@ -25,18 +25,68 @@ from teos import LOG_PREFIX, DATA_DIR, DEFAULT_CONF, CONF_FILE_NAME
 logger = Logger(actor="Daemon", log_name_prefix=LOG_PREFIX)
 common.cryptographer.logger = Logger(actor="Cryptographer", log_name_prefix=LOG_PREFIX)
 
+# Seconds the signal handler waits for the watch threads to be done with what they are processing
+SHUTDOWN_LOCK_TIMEOUT = 10
+
 
 def handle_signals(signal_received, frame):
+    chain_monitor.terminate = True
+
+    if watcher is not None:
+        # The locks are taken in the same order as the watch threads do and held until the process exits, so the watch
+        # threads stop (and the API stops accepting appointments) once they are done with what they are processing, and
+        # nothing is written after the db is closed. The handler runs on the main thread, which may already hold one of
+        # them (e.g. while bootstrapping, or if it serves the API), so they are taken with a timeout instead of waiting
+        # forever. The snapshot is skipped if they can't be taken, and the state is loaded from the db on the next run
+        locks = [watcher.lock, db_manager.lock, watcher.responder.lock]
+
+        if all(lock.acquire(timeout=SHUTDOWN_LOCK_TIMEOUT) for lock in locks):
+            logger.info("Storing appointments and trackers snapshot")
+            db_manager.store_watcher_snapshot(db_manager.load_last_block_hash_watcher(), watcher.appointments.to_dict())
+            db_manager.store_responder_snapshot(
+                db_manager.load_last_block_hash_responder(), dict(watcher.responder.trackers)
+            )
+
+        else:
+            logger.error("Could not stop the watch threads in time. Skipping the appointments and trackers snapshot")
+
+    if inspector is not None:
+        logger.info("Stopping the signature verification workers")
+        inspector.shutdown()
+
     logger.info("Closing connection with appointments db")
     db_manager.db.close()
-    chain_monitor.terminate = True
 
     logger.info("Shutting down TEOS")
     exit(0)
 
 
+def migrate_db(command_line_conf):
+    """
+    Converts the appointments and trackers stored as ``json`` in the database to binary records. The tower must not be
+    running while the database is migrated.
+
+    Args:
+        command_line_conf (:obj:`dict`): the configuration options given through the command line.
+    """
+
+    config_loader = ConfigLoader(DATA_DIR, CONF_FILE_NAME, DEFAULT_CONF, command_line_conf)
+    config = config_loader.build_config()
+    setup_data_folder(DATA_DIR)
+    setup_logging(config.get("LOG_FILE"), LOG_PREFIX)
+
+    db_manager = DBManager(config.get("DB_PATH"))
+    migrated = db_manager.migrate_records()
+    db_manager.db.close()
+
+    print("{} records migrated".format(migrated))
+
+
 def main(command_line_conf):
-    global db_manager, chain_monitor
+    global db_manager, chain_monitor, watcher, inspector
+
+    watcher = None
+    inspector = None
 
     signal(SIGINT, handle_signals)
     signal(SIGTERM, handle_signals)
@@ -53,6 +103,7 @@ def main(command_line_conf):
 
     bitcoind_connect_params = {k: v for k, v in config.items() if k.startswith("BTC")}
     bitcoind_feed_params = {k: v for k, v in config.items() if k.startswith("FEED")}
+    api_params = {k: v for k, v in config.items() if k.startswith("API")}
 
     if not can_connect_to_bitcoind(bitcoind_connect_params):
         logger.error("Can't connect to bitcoind. Shutting down")
@@ -77,15 +128,29 @@ def main(command_line_conf):
                 secret_key_der,
                 config.get("MAX_APPOINTMENTS"),
                 config.get("EXPIRY_DELTA"),
+                config.get("DECRYPT_WORKERS"),
+                config.get("SIGN_WORKERS"),
+                config.get("SIGN_QUEUE_SIZE"),
+                config.get("FEED_MEMPOOL"),
             )
 
             # Create the chain monitor and start monitoring the chain
             chain_monitor = ChainMonitor(
-                watcher.block_queue, watcher.responder.block_queue, block_processor, bitcoind_feed_params
+                watcher.block_queue,
+                watcher.responder.block_queue,
+                block_processor,
+                bitcoind_feed_params,
+                watcher.mempool_queue,
             )
 
-            watcher_appointments_data = db_manager.load_watcher_appointments()
-            responder_trackers_data = db_manager.load_responder_trackers()
+            # Use the snapshot of the in-memory data if it is up to date, otherwise the data is loaded from the db
+            watcher_appointments_data = db_manager.load_watcher_snapshot()
+            if watcher_appointments_data is None:
+                watcher_appointments_data = db_manager.load_watcher_appointments()
+
+            responder_trackers_data = db_manager.load_responder_snapshot()
+            if responder_trackers_data is None:
+                responder_trackers_data = db_manager.load_responder_trackers()
 
             if len(watcher_appointments_data) == 0 and len(responder_trackers_data) == 0:
                 logger.info("Fresh bootstrap")
@@ -98,15 +163,19 @@ def main(command_line_conf):
 
                 # Update the Watcher backed up data if found.
                 if len(watcher_appointments_data) != 0:
-                    watcher.appointments, watcher.locator_uuid_map = Builder.build_appointments(
-                        watcher_appointments_data
-                    )
+                    (
+                        watcher.appointments,
+                        watcher.locator_uuid_map,
+                        watcher.end_time_uuid_map,
+                    ) = Builder.build_appointments(watcher_appointments_data)
 
                 # Update the Responder with backed up data if found.
                 if len(responder_trackers_data) != 0:
-                    watcher.responder.trackers, watcher.responder.tx_tracker_map = Builder.build_trackers(
-                        responder_trackers_data
-                    )
+                    (
+                        watcher.responder.trackers,
+                        watcher.responder.tx_tracker_map,
+                        watcher.responder.height_tracker_map,
+                    ) = Builder.build_trackers(responder_trackers_data)
 
                 # Awaking components so the states can be updated.
                 watcher.awake()
@@ -136,12 +205,10 @@ def main(command_line_conf):
 
                 # If only one of the instances needs to be updated, it can be done separately.
                 if len(missed_blocks_watcher) == 0 and len(missed_blocks_responder) != 0:
-                    Builder.populate_block_queue(watcher.responder.block_queue, missed_blocks_responder)
-                    watcher.responder.block_queue.join()
+                    Builder.feed_block_queues(block_processor, [watcher.responder.block_queue], missed_blocks_responder)
 
                 elif len(missed_blocks_responder) == 0 and len(missed_blocks_watcher) != 0:
-                    Builder.populate_block_queue(watcher.block_queue, missed_blocks_watcher)
-                    watcher.block_queue.join()
+                    Builder.feed_block_queues(block_processor, [watcher.block_queue], missed_blocks_watcher)
 
                 # Otherwise they need to be updated at the same time, block by block
                 elif len(missed_blocks_responder) != 0 and len(missed_blocks_watcher) != 0:
@@ -150,7 +217,8 @@ def main(command_line_conf):
             # Fire the API and the ChainMonitor
             # FIXME: 92-block-data-during-bootstrap-db
             chain_monitor.monitor_chain()
-            API(Inspector(block_processor, config.get("MIN_TO_SELF_DELAY")), watcher).start()
+            inspector = Inspector(block_processor, config.get("MIN_TO_SELF_DELAY"), config.get("VERIFY_WORKERS"))
+            API(inspector, watcher, api_params).start()
         except Exception as e:
             logger.error("An error occurred: {}. Shutting down".format(e))
             exit(1)
@@ -158,12 +226,22 @@ def main(command_line_conf):
 
 if __name__ == "__main__":
     command_line_conf = {}
+    migrate = False
 
     try:
         opts, _ = getopt(
             argv[1:],
             "h",
-            ["btcnetwork=", "btcrpcuser=", "btcrpcpassword=", "btcrpcconnect=", "btcrpcport=", "datadir=", "help"],
+            [
+                "btcnetwork=",
+                "btcrpcuser=",
+                "btcrpcpassword=",
+                "btcrpcconnect=",
+                "btcrpcport=",
+                "datadir=",
+                "migratedb",
+                "help",
+            ],
         )
         for opt, arg in opts:
             if opt in ["--btcnetwork"]:
@@ -181,10 +259,16 @@ if __name__ == "__main__":
                     exit("btcrpcport must be an integer")
             if opt in ["--datadir"]:
                 DATA_DIR = os.path.expanduser(arg)
+            if opt in ["--migratedb"]:
+                migrate = True
             if opt in ["-h", "--help"]:
                 exit(show_usage())
 
     except GetoptError as e:
         exit(e)
 
-    main(command_line_conf)
+    if migrate:
+        migrate_db(command_line_conf)
+
+    else:
+        main(command_line_conf)
@@ -1,37 +1,98 @@
 from socket import timeout
 from http.client import HTTPException
 
-from teos.utils.auth_proxy import AuthServiceProxy, JSONRPCException
+from teos.utils.auth_proxy import JSONRPCException
+from teos.utils.rpc_pool import PooledServiceProxy, get_pool, POOL_SIZE
 
 """
 Tools is a module with general methods that can used by different entities in the codebase.
 """
 
+MISSING_BATCH_RESPONSE = {"code": -343, "message": "missing JSON-RPC result"}
+
 
 # NOTCOVERED
 def bitcoin_cli(btc_connect_params):
     """
     An ``http`` connection with ``bitcoind`` using the ``json-rpc`` interface.
 
+    Calls are run through a process-wide pool of keep-alive connections, so the connections are shared by every
+    component using the same connection parameters.
+
     Args:
         btc_connect_params (:obj:`dict`): a dictionary with the parameters to connect to bitcoind
             (rpc user, rpc passwd, host and port)
 
     Returns:
-        :obj:`AuthServiceProxy <teos.utils.auth_proxy.AuthServiceProxy>`: An authenticated service proxy to ``bitcoind``
-        that can be used to send ``json-rpc`` commands.
+        :obj:`PooledServiceProxy <teos.utils.rpc_pool.PooledServiceProxy>`: An authenticated service proxy to
+        ``bitcoind`` that can be used to send ``json-rpc`` commands.
     """
 
-    return AuthServiceProxy(
-        "http://%s:%s@%s:%d"
-        % (
-            btc_connect_params.get("BTC_RPC_USER"),
-            btc_connect_params.get("BTC_RPC_PASSWD"),
-            btc_connect_params.get("BTC_RPC_CONNECT"),
-            btc_connect_params.get("BTC_RPC_PORT"),
-        )
+    service_url = "http://%s:%s@%s:%d" % (
+        btc_connect_params.get("BTC_RPC_USER"),
+        btc_connect_params.get("BTC_RPC_PASSWD"),
+        btc_connect_params.get("BTC_RPC_CONNECT"),
+        btc_connect_params.get("BTC_RPC_PORT"),
     )
 
+    return PooledServiceProxy(get_pool(service_url, btc_connect_params.get("BTC_RPC_POOL_SIZE", POOL_SIZE)))
+
+
+# NOTCOVERED
+def bitcoin_cli_batch(btc_connect_params, method, params_list):
+    """
+    Runs the same ``json-rpc`` command for a list of parameters using a single ``json-rpc`` batch request.
+
+    If ``bitcoind`` rejects the batch request as a whole, the calls are sent one by one instead.
+
+    Args:
+        btc_connect_params (:obj:`dict`): a dictionary with the parameters to connect to bitcoind
+            (rpc user, rpc passwd, host and port)
+        method (:obj:`str`): the name of the ``json-rpc`` command.
+        params_list (:obj:`list`): a list with the parameters of every call. Each item is a :obj:`tuple` of
+            positional arguments.
+
+    Returns:
+        :obj:`list`: A list of tuples ``(result, error)``, one per item of ``params_list`` and in the same order.
+        ``error`` is ``None`` if the call succeeded and a dictionary with the ``json-rpc`` error otherwise (in which
+        case ``result`` is ``None``).
+    """
+
+    if not params_list:
+        return []
+
+    rpc = bitcoin_cli(btc_connect_params)
+    requests = [getattr(rpc, method).get_request(*params) for params in params_list]
+
+    # The ids given by AuthServiceProxy come from a counter shared by all threads, so every batch uses its own ids
+    for i, request in enumerate(requests):
+        request["id"] = i
+
+    try:
+        responses = rpc.batch(requests)
+
+    except JSONRPCException:
+        responses = None
+
+    results = []
+
+    if isinstance(responses, list):
+        responses = {response.get("id"): response for response in responses}
+
+        for i in range(len(requests)):
+            response = responses.get(i, {"result": None, "error": MISSING_BATCH_RESPONSE})
+            results.append((response.get("result"), response.get("error")))
+
+    else:
+        for params in params_list:
+            try:
+                results.append((getattr(rpc, method)(*params), None))
+
+            except JSONRPCException as e:
+                results.append((None, e.error))
+
+    return results
+
 
 # NOTCOVERED
 def can_connect_to_bitcoind(btc_connect_params):
@@ -0,0 +1,95 @@
+"""
+Compact in-memory store for the appointments watched by the ``Watcher``.
+
+The ``Watcher`` only needs the ``locator`` and ``end_time`` of every appointment in memory, but keeping them as a
+dictionary per appointment costs several hundred bytes each. Here every appointment is a ``__slots__`` record that
+keeps the ``uuid`` and ``locator`` objects it is given, so the store, the ``locator_uuid_map`` and the
+``end_time_uuid_map`` of the ``Watcher`` share them instead of holding a copy each. That way a tower can hold millions
+of them.
+
+``locators`` are kept as hex strings, not bytes. They are derived from the hex txids given by ``bitcoind``'s RPC and
+are only compared with them, so converting them would add a copy per lookup instead of saving one.
+"""
+
+from collections.abc import MutableMapping
+
+
+class AppointmentSummary:
+    """
+    The in-memory record of an appointment.
+
+    Args:
+        locator (:obj:`str`): the appointment locator (hex encoded).
+        end_time (:obj:`int`): the block height at which the appointment expires.
+    """
+
+    __slots__ = ("locator", "end_time")
+
+    def __init__(self, locator, end_time):
+        self.locator = locator
+        self.end_time = end_time
+
+    def to_dict(self):
+        """
+        Returns:
+            :obj:`dict`: The record as a dictionary (``locator`` and ``end_time``).
+        """
+
+        return {"locator": self.locator, "end_time": self.end_time}
+
+
+class AppointmentStore(MutableMapping):
+    """
+    The :class:`AppointmentStore` is a dictionary-like container (``uuid:AppointmentSummary``) with the same interface
+    as the dictionary of appointments it replaces, so it can be used by the :obj:`Cleaner <teos.cleaner.Cleaner>` and
+    the :obj:`Builder <teos.builder.Builder>` as is.
+
+    Appointments can be set either as :obj:`AppointmentSummary` or as dictionaries (``{locator, end_time}``), but are
+    always returned as :obj:`AppointmentSummary`, so their fields are accessed as attributes without building anything
+    on access. ``uuids`` and ``locators`` are kept as given (not copied nor interned), so the maps of the ``Watcher``
+    can be keyed with the same objects and nothing outlives the appointments.
+
+    Args:
+        appointments (:obj:`dict`): an optional dictionary of appointments (``uuid:{locator, end_time}``) to populate
+            the store with.
+
+    Attributes:
+        records (:obj:`dict`): the appointments (``uuid:AppointmentSummary``).
+    """
+
+    def __init__(self, appointments=None):
+        self.records = dict()
+
+        if appointments is not None:
+            self.update(appointments)
+
+    def __getitem__(self, uuid):
+        return self.records[uuid]
+
+    def __setitem__(self, uuid, appointment):
+        if isinstance(appointment, AppointmentSummary):
+            locator, end_time = appointment.locator, appointment.end_time
+        else:
+            locator, end_time = appointment.get("locator"), appointment.get("end_time")
+
+        self.records[uuid] = AppointmentSummary(locator, end_time)
+
+    def __delitem__(self, uuid):
+        del self.records[uuid]
+
+    def __contains__(self, uuid):
+        return uuid in self.records
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def to_dict(self):
+        """
+        Returns:
+            :obj:`dict`: The appointments as a dictionary (``uuid:{locator, end_time}``), e.g. to be snapshotted.
+        """
+
+        return {uuid: record.to_dict() for uuid, record in self.records.items()}
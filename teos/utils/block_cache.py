@@ -0,0 +1,150 @@
+"""
+Bounded cache for the blocks fetched from ``bitcoind``.
+
+The same block is needed by several components of the tower (the ``Watcher``, the ``Responder``, the ``ChainMonitor``,
+...), usually at the same time. The cache makes sure it is only pulled from ``bitcoind`` once.
+"""
+
+from collections import OrderedDict
+from threading import Lock, Event
+
+BLOCK_CACHE_SIZE = 100
+
+# Blocks can have very different sizes, so the number of transactions in the cache is bounded too (a txid is roughly a
+# hundred bytes in memory, so this is around 100MB).
+BLOCK_CACHE_MAX_TXS = 1000000
+
+
+class BlockCache:
+    """
+    The :class:`BlockCache` is a thread-safe least recently used (LRU) cache of blocks, keyed by block hash.
+
+    Args:
+        max_blocks (:obj:`int`): the maximum number of blocks in the cache.
+        max_txs (:obj:`int`): the maximum number of transactions (summed over all the cached blocks) in the cache.
+
+    Attributes:
+        blocks (:obj:`OrderedDict`): the cached blocks (``block_hash:block``). The most recently used one is at the end.
+        txs (:obj:`int`): the number of transactions in the cached blocks.
+        loading (:obj:`dict`): the blocks being loaded at the moment (``block_hash:Event``).
+        hits (:obj:`int`): the number of times a block has been found in the cache.
+        misses (:obj:`int`): the number of times a block has not been found in the cache.
+        lock (:obj:`Lock`): a lock protecting the cache.
+    """
+
+    def __init__(self, max_blocks=BLOCK_CACHE_SIZE, max_txs=BLOCK_CACHE_MAX_TXS):
+        self.max_blocks = max_blocks
+        self.max_txs = max_txs
+
+        self.blocks = OrderedDict()
+        self.txs = 0
+        self.loading = dict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+
+    def get(self, block_hash):
+        """
+        Gets a block from the cache.
+
+        Args:
+            block_hash (:obj:`str`): the hash of the block.
+
+        Returns:
+            :obj:`dict` or :obj:`None`: The block if it is in the cache. ``None`` otherwise.
+        """
+
+        with self.lock:
+            block = self.blocks.get(block_hash)
+
+            if block is not None:
+                self.blocks.move_to_end(block_hash)
+                self.hits += 1
+
+            else:
+                self.misses += 1
+
+            return block
+
+    def put(self, block_hash, block):
+        """
+        Adds a block to the cache, evicting the least recently used ones if the cache is full.
+
+        Args:
+            block_hash (:obj:`str`): the hash of the block.
+            block (:obj:`dict`): the block.
+        """
+
+        with self.lock:
+            self.add(block_hash, block)
+
+    def add(self, block_hash, block):
+        # Must be called holding the lock
+        if block_hash in self.blocks:
+            self.txs -= len(self.blocks.pop(block_hash).get("tx", []))
+
+        self.blocks[block_hash] = block
+        self.txs += len(block.get("tx", []))
+
+        # The last added block is always kept, even if it does not fit by itself
+        while len(self.blocks) > 1 and (len(self.blocks) > self.max_blocks or self.txs > self.max_txs):
+            _, evicted_block = self.blocks.popitem(last=False)
+            self.txs -= len(evicted_block.get("tx", []))
+
+    def get_or_load(self, block_hash, load_block):
+        """
+        Gets a block from the cache, loading it if it is not there.
+
+        If the same block is requested by several threads at the same time, only one of them loads it and the rest wait
+        for the result.
+
+        Args:
+            block_hash (:obj:`str`): the hash of the block.
+            load_block (:obj:`function`): the function used to load the block. It receives the block hash and returns
+                the block or ``None`` if it cannot be found. ``None`` is not cached.
+
+        Returns:
+            :obj:`dict` or :obj:`None`: The block if it can be found. ``None`` otherwise.
+        """
+
+        while True:
+            with self.lock:
+                block = self.blocks.get(block_hash)
+
+                if block is not None:
+                    self.blocks.move_to_end(block_hash)
+                    self.hits += 1
+                    return block
+
+                loaded = self.loading.get(block_hash)
+
+                if loaded is None:
+                    loaded = Event()
+                    self.loading[block_hash] = loaded
+                    self.misses += 1
+                    break
+
+            # Someone else is loading the block, wait for it and try again (it won't be there if it could not be loaded)
+            loaded.wait()
+
+        try:
+            block = load_block(block_hash)
+
+            if block is not None:
+                with self.lock:
+                    self.add(block_hash, block)
+
+            return block
+
+        finally:
+            with self.lock:
+                self.loading.pop(block_hash, None)
+
+            loaded.set()
+
+    def clear(self):
+        """Removes all the blocks from the cache."""
+
+        with self.lock:
+            self.blocks = OrderedDict()
+            self.txs = 0
@@ -0,0 +1,125 @@
+"""
+In-memory index of the most recent block headers.
+
+It lets the tower answer questions such as "how far is this block from the tip?" or "is this block still in the best
+chain?" with dictionary lookups, instead of downloading full blocks from ``bitcoind``.
+"""
+
+# Number of blocks (below the tip) kept in the header chain
+HEADER_CHAIN_SIZE = 2016
+
+
+class HeaderChain:
+    """
+    The :class:`HeaderChain` keeps the ``height`` and ``previousblockhash`` of the last ``max_size`` blocks, alongside
+    the best chain they belong to.
+
+    The best chain is only known from the lowest height the chain has seen (``start_height``) up to the tip. Queries
+    about blocks out of that range return ``None`` so the caller can fall back to ``bitcoind``.
+
+    Args:
+        max_size (:obj:`int`): the number of blocks (below the tip) kept in the header chain.
+
+    Attributes:
+        headers (:obj:`dict`): a dictionary (``block_hash:(height, prev_block_hash)``) with all the known headers,
+            including the ones that have been forked out.
+        best_chain (:obj:`dict`): a dictionary (``height:block_hash``) with the blocks of the best chain.
+        tip (:obj:`str`): the hash of the best chain tip.
+        start_height (:obj:`int`): the lowest height of the best chain known by the header chain.
+    """
+
+    def __init__(self, max_size=HEADER_CHAIN_SIZE):
+        self.max_size = max_size
+        self.headers = dict()
+        self.best_chain = dict()
+        self.tip = None
+        self.start_height = None
+
+    @property
+    def tip_height(self):
+        return self.get_height(self.tip) if self.tip is not None else None
+
+    def add_header(self, block_hash, height, prev_block_hash):
+        """
+        Adds a header to the chain. Adding a header does not modify the best chain.
+
+        Args:
+            block_hash (:obj:`str`): the hash of the block.
+            height (:obj:`int`): the height of the block.
+            prev_block_hash (:obj:`str`): the hash of the previous block.
+        """
+
+        self.headers[block_hash] = (height, prev_block_hash)
+
+    def get_height(self, block_hash):
+        """
+        Gives the height of a block.
+
+        Args:
+            block_hash (:obj:`str`): the hash of the block.
+
+        Returns:
+            :obj:`int` or :obj:`None`: The height of the block if its header is known. ``None`` otherwise.
+        """
+
+        header = self.headers.get(block_hash)
+
+        return header[0] if header is not None else None
+
+    def is_in_best_chain(self, block_hash):
+        """
+        Checks whether a block is in the best chain.
+
+        Args:
+            block_hash (:obj:`str`): the hash of the block.
+
+        Returns:
+            :obj:`bool` or :obj:`None`: Whether the block is in the best chain. ``None`` if it cannot be told (the header
+            is unknown or below ``start_height``).
+        """
+
+        height = self.get_height(block_hash)
+
+        if height is None or self.start_height is None or height < self.start_height:
+            return None
+
+        return self.best_chain.get(height) == block_hash
+
+    def connect(self, block_hashes):
+        """
+        Sets a new best chain tip.
+
+        Args:
+            block_hashes (:obj:`list`): the hashes of the blocks to be connected to the best chain, from the new tip
+                backwards. All of them must be already known (:meth:`add_header`). Blocks of the old best chain above
+                the new tip are disconnected.
+        """
+
+        if not block_hashes:
+            return
+
+        old_tip_height = self.tip_height
+
+        for block_hash in block_hashes:
+            self.best_chain[self.get_height(block_hash)] = block_hash
+
+        if self.start_height is None:
+            self.start_height = self.get_height(block_hashes[-1])
+
+        self.tip = block_hashes[0]
+
+        # The new tip may be lower than the old one if the chain has been reorganized
+        if old_tip_height is not None:
+            for height in range(self.tip_height + 1, old_tip_height + 1):
+                self.best_chain.pop(height, None)
+
+        self.prune()
+
+    def prune(self):
+        # Forget the headers that are too deep. The cost is amortized by pruning only once the chain has doubled its size
+        cutoff = self.tip_height - self.max_size
+
+        if len(self.headers) > 2 * self.max_size:
+            self.headers = {h: header for h, header in self.headers.items() if header[0] > cutoff}
+            self.best_chain = {height: h for height, h in self.best_chain.items() if height > cutoff}
+            self.start_height = max(self.start_height, cutoff + 1)
@@ -0,0 +1,284 @@
+"""
+Binary record format for the appointments and trackers stored in the database.
+
+Records start with a version byte (``RECORD_VERSION``), followed by the fixed-width fields as raw bytes, the heights as
+varints and the variable-length field (the encrypted blob or the penalty transaction) as raw bytes until the end of the
+record:
+
+    - Appointment: ``version | locator (16) | start_time | end_time | to_self_delay | encrypted_blob``
+    - Tracker: ``version | locator (16) | dispute_txid (32) | penalty_txid (32) | appointment_end | penalty_rawtx``
+
+Legacy records are json-encoded dictionaries, so they always start with ``{``. The decoders fall back to ``json`` for
+them, so both formats can coexist in the same database.
+"""
+
+import re
+import json
+
+RECORD_VERSION = 1
+
+APPOINTMENT_FIELDS = {"locator", "start_time", "end_time", "to_self_delay", "encrypted_blob"}
+TRACKER_FIELDS = {"locator", "dispute_txid", "penalty_txid", "penalty_rawtx", "appointment_end"}
+
+
+def encode_varint(value):
+    """
+    Encodes a non-negative integer as an unsigned LEB128 varint.
+
+    Args:
+        value (:obj:`int`): the integer to encode.
+
+    Returns:
+        :obj:`bytes`: The encoded integer.
+    """
+
+    data = bytearray()
+
+    while value > 0x7F:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+
+    data.append(value)
+
+    return bytes(data)
+
+
+def decode_varint(data, pos):
+    """
+    Decodes an unsigned LEB128 varint.
+
+    Args:
+        data (:obj:`bytes`): the data containing the varint.
+        pos (:obj:`int`): the position where the varint starts.
+
+    Returns:
+        :obj:`tuple`: A tuple ``(value, pos)`` with the decoded integer and the position right after it.
+
+    Raises:
+        :obj:`ValueError`: if the data ends before the varint does.
+    """
+
+    value = 0
+    shift = 0
+
+    while True:
+        if pos >= len(data):
+            raise ValueError("Truncated varint")
+
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+
+        if not byte & 0x80:
+            return value, pos
+
+
+def is_hex(value, size=None):
+    """
+    Checks whether a value can be encoded as a raw bytes field. Only lowercase hex is accepted, so decoding the record
+    gives back exactly the same string.
+
+    Args:
+        value: the value to check (a hex encoded :obj:`str`).
+        size (:obj:`int`): the expected size of the value in bytes, if fixed.
+
+    Returns:
+        :obj:`bool`: True if the value is a lowercase hex string (of ``size`` bytes, if given), False otherwise.
+    """
+
+    return (
+        isinstance(value, str)
+        and re.match(r"^([0-9a-f]{2})*$", value) is not None
+        and (size is None or len(value) == 2 * size)
+    )
+
+
+def is_height(value):
+    """
+    Checks whether a value can be encoded as a height (varint) field.
+
+    Args:
+        value: the value to check (an :obj:`int`).
+
+    Returns:
+        :obj:`bool`: True if the value is a non-negative integer, False otherwise.
+    """
+
+    return type(value) == int and value >= 0
+
+
+def encode_appointment(appointment_data):
+    """
+    Encodes an appointment as a binary record.
+
+    Args:
+        appointment_data (:obj:`dict`): the appointment data, as given by
+            :meth:`Appointment.to_dict <common.appointment.Appointment.to_dict>`.
+
+    Returns:
+        :obj:`bytes` or :obj:`None`: The binary record if the data fits the format. ``None`` otherwise (e.g. missing or
+        unexpected fields), in which case the data should be stored as ``json``.
+    """
+
+    if (
+        not isinstance(appointment_data, dict)
+        or set(appointment_data.keys()) != APPOINTMENT_FIELDS
+        or not is_hex(appointment_data.get("locator"), 16)
+        or not is_hex(appointment_data.get("encrypted_blob"))
+        or not all(is_height(appointment_data.get(k)) for k in ["start_time", "end_time", "to_self_delay"])
+    ):
+        return None
+
+    return (
+        bytes([RECORD_VERSION])
+        + bytes.fromhex(appointment_data.get("locator"))
+        + encode_varint(appointment_data.get("start_time"))
+        + encode_varint(appointment_data.get("end_time"))
+        + encode_varint(appointment_data.get("to_self_delay"))
+        + bytes.fromhex(appointment_data.get("encrypted_blob"))
+    )
+
+
+def decode_appointment(record):
+    """
+    Decodes an appointment record, either binary or legacy ``json``.
+
+    Args:
+        record (:obj:`bytes`): the record as stored in the database.
+
+    Returns:
+        :obj:`dict`: The appointment data.
+
+    Raises:
+        :obj:`ValueError`: if the record cannot be decoded.
+    """
+
+    if record[:1] == b"{":
+        return json.loads(record)
+
+    if record[:1] != bytes([RECORD_VERSION]):
+        raise ValueError("Unknown record version ({})".format(record[:1].hex()))
+
+    if len(record) < 17:
+        raise ValueError("Truncated appointment record")
+
+    locator = record[1:17].hex()
+    start_time, pos = decode_varint(record, 17)
+    end_time, pos = decode_varint(record, pos)
+    to_self_delay, pos = decode_varint(record, pos)
+
+    return {
+        "locator": locator,
+        "start_time": start_time,
+        "end_time": end_time,
+        "to_self_delay": to_self_delay,
+        "encrypted_blob": record[pos:].hex(),
+    }
+
+
+def decode_appointment_blob(record):
+    """
+    Decodes only the encrypted blob of an appointment record, either binary or legacy ``json``.
+
+    This is all the :obj:`Watcher <teos.watcher.Watcher>` needs to handle a breach, and the blob is given as raw bytes
+    so it does not have to be hex encoded just to be decoded again.
+
+    Args:
+        record (:obj:`bytes`): the record as stored in the database.
+
+    Returns:
+        :obj:`bytes`: The encrypted blob.
+
+    Raises:
+        :obj:`ValueError`: if the record cannot be decoded.
+    """
+
+    if record[:1] == b"{":
+        encrypted_blob = json.loads(record).get("encrypted_blob")
+
+        if not isinstance(encrypted_blob, str):
+            raise ValueError("Wrong encrypted_blob in appointment record")
+
+        return bytes.fromhex(encrypted_blob)
+
+    if record[:1] != bytes([RECORD_VERSION]):
+        raise ValueError("Unknown record version ({})".format(record[:1].hex()))
+
+    if len(record) < 17:
+        raise ValueError("Truncated appointment record")
+
+    # Skip start_time, end_time and to_self_delay
+    pos = 17
+    for _ in range(3):
+        _, pos = decode_varint(record, pos)
+
+    return record[pos:]
+
+
+def encode_tracker(tracker_data):
+    """
+    Encodes a tracker as a binary record.
+
+    Args:
+        tracker_data (:obj:`dict`): the tracker data, as given by
+            :meth:`TransactionTracker.to_dict <teos.responder.TransactionTracker.to_dict>`.
+
+    Returns:
+        :obj:`bytes` or :obj:`None`: The binary record if the data fits the format. ``None`` otherwise, in which case
+        the data should be stored as ``json``.
+    """
+
+    if (
+        not isinstance(tracker_data, dict)
+        or set(tracker_data.keys()) != TRACKER_FIELDS
+        or not is_hex(tracker_data.get("locator"), 16)
+        or not is_hex(tracker_data.get("dispute_txid"), 32)
+        or not is_hex(tracker_data.get("penalty_txid"), 32)
+        or not is_hex(tracker_data.get("penalty_rawtx"))
+        or not is_height(tracker_data.get("appointment_end"))
+    ):
+        return None
+
+    return (
+        bytes([RECORD_VERSION])
+        + bytes.fromhex(tracker_data.get("locator"))
+        + bytes.fromhex(tracker_data.get("dispute_txid"))
+        + bytes.fromhex(tracker_data.get("penalty_txid"))
+        + encode_varint(tracker_data.get("appointment_end"))
+        + bytes.fromhex(tracker_data.get("penalty_rawtx"))
+    )
+
+
+def decode_tracker(record):
+    """
+    Decodes a tracker record, either binary or legacy ``json``.
+
+    Args:
+        record (:obj:`bytes`): the record as stored in the database.
+
+    Returns:
+        :obj:`dict`: The tracker data.
+
+    Raises:
+        :obj:`ValueError`: if the record cannot be decoded.
+    """
+
+    if record[:1] == b"{":
+        return json.loads(record)
+
+    if record[:1] != bytes([RECORD_VERSION]):
+        raise ValueError("Unknown record version ({})".format(record[:1].hex()))
+
+    if len(record) < 81:
+        raise ValueError("Truncated tracker record")
+
+    appointment_end, pos = decode_varint(record, 81)
+
+    return {
+        "locator": record[1:17].hex(),
+        "dispute_txid": record[17:49].hex(),
+        "penalty_txid": record[49:81].hex(),
+        "penalty_rawtx": record[pos:].hex(),
+        "appointment_end": appointment_end,
+    }
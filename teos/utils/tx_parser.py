@@ -0,0 +1,243 @@
+"""
+Local (in-process) deserializer for Bitcoin transactions and blocks.
+
+It follows the same rules ``bitcoind`` applies when deserializing a transaction (e.g. ``decoderawtransaction``), so
+the tower can check whether a decrypted blob is a well formatted transaction, and compute its id, without querying
+``bitcoind``. No consensus or policy checks are performed.
+"""
+
+import struct
+from hashlib import sha256
+from decimal import Decimal
+from binascii import unhexlify
+
+# Same limit bitcoind enforces on any CompactSize read from the wire (MAX_SIZE in serialize.h)
+MAX_SIZE = 0x02000000
+WITNESS_SCALE_FACTOR = 4
+COIN = Decimal(100000000)
+BLOCK_HEADER_SIZE = 80
+
+
+class TxReader:
+    """
+    Sequential reader over the bytes of a serialized transaction.
+
+    Args:
+        data (:obj:`bytes`): the serialized transaction.
+
+    Attributes:
+        pos (:obj:`int`): the position of the next byte to be read.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def read(self, n):
+        """
+        Reads ``n`` bytes.
+
+        Raises:
+            :obj:`ValueError`: if there are less than ``n`` bytes left.
+        """
+
+        if self.pos + n > len(self.data):
+            raise ValueError("Unexpected end of data")
+
+        chunk = self.data[self.pos : self.pos + n]
+        self.pos += n
+
+        return chunk
+
+    def read_uint(self, fmt, n):
+        return struct.unpack(fmt, self.read(n))[0]
+
+    def read_compact_size(self):
+        """
+        Reads a ``CompactSize`` unsigned integer.
+
+        Raises:
+            :obj:`ValueError`: if the value is not canonically encoded or it is bigger than ``MAX_SIZE``.
+        """
+
+        size = self.read(1)[0]
+
+        if size == 0xFD:
+            size = self.read_uint("<H", 2)
+            minimum = 0xFD
+
+        elif size == 0xFE:
+            size = self.read_uint("<I", 4)
+            minimum = 0x10000
+
+        elif size == 0xFF:
+            size = self.read_uint("<Q", 8)
+            minimum = 0x100000000
+
+        else:
+            minimum = 0
+
+        if size < minimum:
+            raise ValueError("Non-canonical CompactSize")
+
+        if size > MAX_SIZE:
+            raise ValueError("CompactSize exceeds MAX_SIZE")
+
+        return size
+
+    def read_var_bytes(self):
+        return self.read(self.read_compact_size())
+
+
+def sha256d(data):
+    """Computes the double sha256 of ``data``."""
+
+    return sha256(sha256(data).digest()).digest()
+
+
+def read_tx(reader):
+    """
+    Reads a transaction from a :obj:`TxReader`, leaving the reader right after it.
+
+    Args:
+        reader (:obj:`TxReader`): the reader, placed at the beginning of a serialized transaction.
+
+    Returns:
+        :obj:`dict`: A dictionary with the decoded transaction, as described in :func:`deserialize_tx`.
+
+    Raises:
+        :obj:`ValueError`: if the data is not a well formatted transaction.
+    """
+
+    data = reader.data
+    start = reader.pos
+
+    version = reader.read_uint("<i", 4)
+    body_start = reader.pos
+
+    vin_count = reader.read_compact_size()
+    segwit = False
+
+    if vin_count == 0:
+        # This is either the segwit marker or a transaction with no inputs
+        flag = reader.read(1)[0]
+
+        if flag != 1:
+            raise ValueError("Transaction has no inputs")
+
+        segwit = True
+        body_start = reader.pos
+        vin_count = reader.read_compact_size()
+
+    vin = []
+    for _ in range(vin_count):
+        prev_txid = reader.read(32)[::-1].hex()
+        prev_vout = reader.read_uint("<I", 4)
+        script_sig = reader.read_var_bytes()
+        sequence = reader.read_uint("<I", 4)
+
+        vin.append({"txid": prev_txid, "vout": prev_vout, "scriptSig": {"hex": script_sig.hex()}, "sequence": sequence})
+
+    vout = []
+    for n in range(reader.read_compact_size()):
+        value = reader.read_uint("<q", 8)
+        script_pubkey = reader.read_var_bytes()
+
+        vout.append({"value": Decimal(value) / COIN, "n": n, "scriptPubKey": {"hex": script_pubkey.hex()}})
+
+    body_end = reader.pos
+
+    if segwit:
+        has_witness = False
+
+        for txin in vin:
+            witness = [reader.read_var_bytes().hex() for _ in range(reader.read_compact_size())]
+            txin["txinwitness"] = witness
+            has_witness = has_witness or len(witness) > 0
+
+        if not has_witness:
+            raise ValueError("Superfluous witness record")
+
+    locktime = reader.read_uint("<I", 4)
+    end = reader.pos
+
+    if vin_count == 0:
+        raise ValueError("Transaction has no inputs")
+
+    # The txid commits to the non-witness serialization only: version, inputs, outputs and locktime
+    stripped_tx = data[start : start + 4] + data[body_start:body_end] + data[end - 4 : end]
+    size = end - start
+    weight = len(stripped_tx) * (WITNESS_SCALE_FACTOR - 1) + size
+
+    return {
+        "txid": sha256d(stripped_tx)[::-1].hex(),
+        "hash": sha256d(data[start:end])[::-1].hex(),
+        "version": version,
+        "size": size,
+        "vsize": (weight + WITNESS_SCALE_FACTOR - 1) // WITNESS_SCALE_FACTOR,
+        "weight": weight,
+        "locktime": locktime,
+        "vin": vin,
+        "vout": vout,
+    }
+
+
+def deserialize_tx(raw_tx):
+    """
+    Deserializes a raw transaction and builds a dictionary representing it. The fields are named after the ones
+    returned by ``bitcoind``'s ``decoderawtransaction``.
+
+    Both legacy and segwit (BIP144) serializations are supported.
+
+    Args:
+        raw_tx (:obj:`bytes` or :obj:`str`): the raw transaction, either as bytes or hex encoded.
+
+    Returns:
+        :obj:`dict`: A dictionary with the decoded transaction (``txid``, ``hash``, ``version``, ``size``, ``vsize``,
+        ``weight``, ``locktime``, ``vin`` and ``vout``).
+
+    Raises:
+        :obj:`ValueError`: if ``raw_tx`` is not a well formatted transaction.
+    """
+
+    if isinstance(raw_tx, str):
+        raw_tx = unhexlify(raw_tx)
+
+    elif not isinstance(raw_tx, bytes):
+        raise ValueError("Wrong transaction data type ({})".format(type(raw_tx)))
+
+    reader = TxReader(raw_tx)
+    tx = read_tx(reader)
+
+    if reader.pos != len(reader.data):
+        raise ValueError("Trailing data after the transaction")
+
+    return tx
+
+
+def deserialize_block(raw_block):
+    """
+    Deserializes a raw block and builds a dictionary with the data the tower needs from it. The fields are named after
+    the ones returned by ``bitcoind``'s ``getblock``.
+
+    Args:
+        raw_block (:obj:`bytes`): the serialized block (as sent by ``bitcoind`` through ``zmq``).
+
+    Returns:
+        :obj:`dict`: A dictionary with the block ``hash``, ``previousblockhash`` and ``tx`` (the list of txids).
+
+    Raises:
+        :obj:`ValueError`: if ``raw_block`` is not a well formatted block.
+    """
+
+    if not isinstance(raw_block, bytes):
+        raise ValueError("Wrong block data type ({})".format(type(raw_block)))
+
+    reader = TxReader(raw_block)
+    header = reader.read(BLOCK_HEADER_SIZE)
+    txs = [read_tx(reader).get("txid") for _ in range(reader.read_compact_size())]
+
+    if reader.pos != len(raw_block):
+        raise ValueError("Trailing data after the block")
+
+    return {"hash": sha256d(header)[::-1].hex(), "previousblockhash": header[4:36][::-1].hex(), "tx": txs}
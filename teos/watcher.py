@@ -1,15 +1,19 @@
+import heapq
 from uuid import uuid4
 from queue import Queue
-from threading import Thread
+from threading import Thread, Lock
+from concurrent.futures import ThreadPoolExecutor
 
 import common.cryptographer
 from common.logger import Logger
 from common.tools import compute_locator
-from common.appointment import Appointment
 from common.cryptographer import Cryptographer
 
-from teos import LOG_PREFIX
+from teos import LOG_PREFIX, DEFAULT_CONF
 from teos.cleaner import Cleaner
+from teos.receipt_signer import ReceiptSigner
+from teos.utils.appointment_store import AppointmentStore, AppointmentSummary
+from teos.utils.tx_parser import deserialize_tx
 
 logger = Logger(actor="Watcher", log_name_prefix=LOG_PREFIX)
 common.cryptographer.logger = Logger(actor="Cryptographer", log_name_prefix=LOG_PREFIX)
@@ -28,7 +32,9 @@ class Watcher:
     If an appointment reaches its end with no breach, the data is simply deleted.
 
     The :class:`Watcher` receives information about new received blocks via the ``block_queue`` that is populated by the
-    :obj:`ChainMonitor <teos.chain_monitor.ChainMonitor>`.
+    :obj:`ChainMonitor <teos.chain_monitor.ChainMonitor>`. If the ``ChainMonitor`` is subscribed to the mempool, it
+    also receives the unconfirmed transactions via the ``mempool_queue``, so breaches can be responded to before the
+    dispute transaction is mined.
 
     Args:
         db_manager (:obj:`DBManager <teos.db_manager>`): a ``DBManager`` instance to interact with the database.
@@ -38,15 +44,28 @@ class Watcher:
         sk_der (:obj:`bytes`): a DER encoded private key used to sign appointment receipts (signaling acceptance).
         max_appointments (:obj:`int`): the maximum ammount of appointments accepted by the ``Watcher`` at the same time.
         expiry_delta (:obj:`int`): the additional time the ``Watcher`` will keep an expired appointment around.
+        decrypt_workers (:obj:`int`): the number of threads used to decrypt the blobs of the triggered appointments.
+        sign_workers (:obj:`int`): the number of threads used to sign the receipts of the accepted appointments.
+        sign_queue_size (:obj:`int`): the maximum number of receipts waiting to be signed.
+        feed_mempool (:obj:`int`): whether the ``Watcher`` receives the mempool transactions (``FEED_MEMPOOL``).
 
     Attributes:
-        appointments (:obj:`dict`): a dictionary containing a simplification of the appointments (:obj:`Appointment
-            <teos.appointment.Appointment>` instances) accepted by the tower (``locator`` and ``end_time``).
-            It's populated trough ``add_appointment``.
+        appointments (:obj:`AppointmentStore <teos.utils.appointment_store.AppointmentStore>`): a dictionary-like
+            store containing a simplification of the appointments (:obj:`Appointment <teos.appointment.Appointment>`
+            instances) accepted by the tower (``locator`` and ``end_time``). It's populated trough ``add_appointment``.
         locator_uuid_map (:obj:`dict`): a ``locator:uuid`` map used to allow the :obj:`Watcher` to deal with several
             appointments with the same ``locator``.
+        end_time_uuid_map (:obj:`dict`): an ``end_time:uuid`` map used to find the appointments that expire at a given
+            height without going through all the ``appointments``.
+        scheduled_end_times (:obj:`list`): A min-heap with the ``end_times`` in ``end_time_uuid_map``, so the expired
+            ones can be found without going through the whole map. It is rebuilt whenever ``end_time_uuid_map`` is set.
         block_queue (:obj:`Queue`): A queue used by the :obj:`Watcher` to receive block hashes from ``bitcoind``. It is
         populated by the :obj:`ChainMonitor <teos.chain_monitor.ChainMonitor>`.
+        mempool_queue (:obj:`Queue`): A queue used by the :obj:`Watcher` to receive raw transactions from the mempool.
+        It is populated by the :obj:`ChainMonitor <teos.chain_monitor.ChainMonitor>`. ``None`` if ``feed_mempool`` is
+        not set.
+        lock (:obj:`Lock`): a lock used to protect the in-memory appointments from being updated by the block, the
+            mempool and the API threads at the same time.
         db_manager (:obj:`DBManager <teos.db_manager>`): A db manager instance to interact with the database.
         block_processor (:obj:`BlockProcessor <teos.block_processor.BlockProcessor>`): a ``BlockProcessor`` instance to
             get block from bitcoind.
@@ -54,27 +73,61 @@ class Watcher:
         signing_key (:mod:`PrivateKey`): a private key used to sign accepted appointments.
         max_appointments (:obj:`int`): the maximum ammount of appointments accepted by the ``Watcher`` at the same time.
         expiry_delta (:obj:`int`): the additional time the ``Watcher`` will keep an expired appointment around.
+        decrypt_workers (:obj:`int`): the number of threads used to decrypt the blobs of the triggered appointments.
+        receipt_signer (:obj:`ReceiptSigner <teos.receipt_signer.ReceiptSigner>`): the pool of threads in charge of
+            signing the appointment receipts.
 
     Raises:
         ValueError: if `teos_sk_file` is not found.
 
     """
 
-    def __init__(self, db_manager, block_processor, responder, sk_der, max_appointments, expiry_delta):
-        self.appointments = dict()
+    def __init__(
+        self,
+        db_manager,
+        block_processor,
+        responder,
+        sk_der,
+        max_appointments,
+        expiry_delta,
+        decrypt_workers=DEFAULT_CONF["DECRYPT_WORKERS"]["value"],
+        sign_workers=DEFAULT_CONF["SIGN_WORKERS"]["value"],
+        sign_queue_size=DEFAULT_CONF["SIGN_QUEUE_SIZE"]["value"],
+        feed_mempool=DEFAULT_CONF["FEED_MEMPOOL"]["value"],
+    ):
+        self.appointments = AppointmentStore()
         self.locator_uuid_map = dict()
+        self.end_time_uuid_map = dict()
         self.block_queue = Queue()
+        self.mempool_queue = Queue() if feed_mempool else None
+        self.lock = Lock()
         self.db_manager = db_manager
         self.block_processor = block_processor
         self.responder = responder
         self.max_appointments = max_appointments
         self.expiry_delta = expiry_delta
+        self.decrypt_workers = decrypt_workers
         self.signing_key = Cryptographer.load_private_key_der(sk_der)
+        self.receipt_signer = ReceiptSigner(self.signing_key, sign_workers, sign_queue_size)
+
+    @property
+    def end_time_uuid_map(self):
+        return self._end_time_uuid_map
+
+    @end_time_uuid_map.setter
+    def end_time_uuid_map(self, end_time_uuid_map):
+        self._end_time_uuid_map = end_time_uuid_map
+        self.scheduled_end_times = list(end_time_uuid_map)
+        heapq.heapify(self.scheduled_end_times)
 
     def awake(self):
         watcher_thread = Thread(target=self.do_watch, daemon=True)
         watcher_thread.start()
 
+        # The mempool is only watched if the ChainMonitor is feeding it
+        if self.mempool_queue is not None:
+            Thread(target=self.do_watch_mempool, daemon=True).start()
+
         return watcher_thread
 
     def add_appointment(self, appointment):
@@ -91,7 +144,7 @@ class Watcher:
         The tower may store multiple appointments with the same ``locator`` to avoid DoS attacks based on data
         rewriting. `locators`` should be derived from the ``dispute_txid``, but that task is performed by the user, and
         the tower has no way of verifying whether or not they have been properly derived. Therefore, appointments are
-        identified by ``uuid`` and stored in ``appointments`` and ``locator_uuid_map``.
+        identified by ``uuid`` and stored in ``appointments``, ``locator_uuid_map`` and ``end_time_uuid_map``.
 
         Args:
             appointment (:obj:`Appointment <teos.appointment.Appointment>`): the appointment to be added to the
@@ -101,37 +154,77 @@ class Watcher:
             :obj:`tuple`: A tuple signaling if the appointment has been added or not (based on ``max_appointments``).
             The structure looks as follows:
 
-            - ``(True, signature)`` if the appointment has been accepted.
+            - ``(True, receipt)`` if the appointment has been accepted. ``receipt`` is a :obj:`Future` that resolves to
+              the signature of the appointment once it is signed by the ``receipt_signer``.
             - ``(False, None)`` otherwise.
 
         """
 
-        if len(self.appointments) < self.max_appointments:
+        return self.add_appointments([appointment])[0]
 
-            uuid = uuid4().hex
-            self.appointments[uuid] = {"locator": appointment.locator, "end_time": appointment.end_time}
+    def add_appointments(self, appointments):
+        """
+        Adds a batch of appointments, as :meth:`add_appointment` does for a single one, while ``max_appointments`` has
+        not been reached.
 
-            if appointment.locator in self.locator_uuid_map:
-                self.locator_uuid_map[appointment.locator].append(uuid)
+        All the accepted appointments are stored in the database using a single write batch.
 
-            else:
-                self.locator_uuid_map[appointment.locator] = [uuid]
+        Args:
+            appointments (:obj:`list`): a list of :obj:`Appointment <teos.appointment.Appointment>` to be added to the
+                :obj:`Watcher`.
 
-            self.db_manager.store_watcher_appointment(uuid, appointment.to_json())
-            self.db_manager.create_append_locator_map(appointment.locator, uuid)
+        Returns:
+            :obj:`list`: A list with a tuple per appointment, in the same order, as returned by :meth:`add_appointment`.
+        """
 
-            appointment_added = True
-            signature = Cryptographer.sign(appointment.serialize(), self.signing_key)
+        added = []
 
-            logger.info("New appointment accepted", locator=appointment.locator)
+        # The appointments are added while holding the lock, since the API may be serving several requests at the same
+        # time (and the block and mempool threads may be updating the appointments too)
+        with self.lock, self.db_manager.atomic_batch():
+            for appointment in appointments:
+                appointment_added = len(self.appointments) < self.max_appointments
 
-        else:
-            appointment_added = False
-            signature = None
+                if appointment_added:
+                    uuid = uuid4().hex
+                    self.appointments[uuid] = AppointmentSummary(appointment.locator, appointment.end_time)
+
+                    # The maps are keyed with the locator object kept by the store, so it is not held twice
+                    locator = self.appointments[uuid].locator
+                    if locator in self.locator_uuid_map:
+                        self.locator_uuid_map[locator].append(uuid)
+
+                    else:
+                        self.locator_uuid_map[locator] = [uuid]
+
+                    if appointment.end_time in self.end_time_uuid_map:
+                        self.end_time_uuid_map[appointment.end_time].append(uuid)
+
+                    else:
+                        self.end_time_uuid_map[appointment.end_time] = [uuid]
+                        heapq.heappush(self.scheduled_end_times, appointment.end_time)
+
+                    self.db_manager.store_watcher_appointment(uuid, appointment.to_json())
+                    self.db_manager.create_append_locator_map(appointment.locator, uuid)
 
-            logger.info("Maximum appointments reached, appointment rejected", locator=appointment.locator)
+                added.append(appointment_added)
 
-        return appointment_added, signature
+        # Receipts are submitted once the lock is released, since the submission blocks if the receipt_signer is busy
+        results = []
+        for appointment, appointment_added in zip(appointments, added):
+            if appointment_added:
+                receipt = self.receipt_signer.submit(appointment.serialize())
+
+                logger.info("New appointment accepted", locator=appointment.locator)
+
+            else:
+                receipt = None
+
+                logger.info("Maximum appointments reached, appointment rejected", locator=appointment.locator)
+
+            results.append((appointment_added, receipt))
+
+        return results
 
     def do_watch(self):
         """
@@ -146,64 +239,165 @@ class Watcher:
             block = self.block_processor.get_block(block_hash)
             logger.info("New block received", block_hash=block_hash, prev_block_hash=block.get("previousblockhash"))
 
-            if len(self.appointments) > 0 and block is not None:
-                txids = block.get("tx")
+            # All the db changes derived from the block are written at once, along with the last known block
+            with self.lock, self.db_manager.atomic_batch():
+                if len(self.appointments) > 0 and block is not None:
+                    txids = block.get("tx")
+
+                    expired_appointments = self.get_expired_appointments(block["height"])
+
+                    Cleaner.delete_expired_appointments(
+                        expired_appointments,
+                        self.appointments,
+                        self.locator_uuid_map,
+                        self.end_time_uuid_map,
+                        self.db_manager,
+                    )
 
-                expired_appointments = [
-                    uuid
-                    for uuid, appointment_data in self.appointments.items()
-                    if block["height"] > appointment_data.get("end_time") + self.expiry_delta
-                ]
+                    valid_breaches, invalid_breaches = self.filter_valid_breaches(self.get_breaches(txids))
+
+                    triggered_flags = []
+                    appointments_to_delete = []
+
+                    for uuid, breach in valid_breaches.items():
+                        logger.info(
+                            "Notifying responder and deleting appointment",
+                            penalty_txid=breach["penalty_txid"],
+                            locator=breach["locator"],
+                            uuid=uuid,
+                        )
+
+                        receipt = self.responder.handle_breach(
+                            uuid,
+                            breach["locator"],
+                            breach["dispute_txid"],
+                            breach["penalty_txid"],
+                            breach["penalty_rawtx"],
+                            self.appointments[uuid].end_time,
+                            block_hash,
+                        )
+
+                        # FIXME: Only necessary because of the triggered appointment approach. Fix if it changes.
+
+                        if receipt.delivered:
+                            Cleaner.delete_appointment_from_memory(
+                                uuid, self.appointments, self.locator_uuid_map, self.end_time_uuid_map
+                            )
+                            triggered_flags.append(uuid)
+                        else:
+                            appointments_to_delete.append(uuid)
+
+                    # Appointments are only flagged as triggered if they are delivered, otherwise they are just deleted.
+                    appointments_to_delete.extend(invalid_breaches)
+                    self.db_manager.batch_create_triggered_appointment_flag(triggered_flags)
+
+                    Cleaner.delete_completed_appointments(
+                        appointments_to_delete,
+                        self.appointments,
+                        self.locator_uuid_map,
+                        self.end_time_uuid_map,
+                        self.db_manager,
+                    )
 
-                Cleaner.delete_expired_appointments(
-                    expired_appointments, self.appointments, self.locator_uuid_map, self.db_manager
-                )
+                    if len(self.appointments) is 0:
+                        logger.info("No more pending appointments")
 
-                valid_breaches, invalid_breaches = self.filter_valid_breaches(self.get_breaches(txids))
+                # Register the last processed block for the watcher
+                self.db_manager.store_last_block_hash_watcher(block_hash)
 
-                triggered_flags = []
-                appointments_to_delete = []
+            self.block_queue.task_done()
 
-                for uuid, breach in valid_breaches.items():
-                    logger.info(
-                        "Notifying responder and deleting appointment",
-                        penalty_txid=breach["penalty_txid"],
-                        locator=breach["locator"],
-                        uuid=uuid,
-                    )
+    def do_watch_mempool(self):
+        """
+        Monitors the mempool for breaches whilst there are pending appointments.
 
-                    receipt = self.responder.handle_breach(
-                        uuid,
-                        breach["locator"],
-                        breach["dispute_txid"],
-                        breach["penalty_txid"],
-                        breach["penalty_rawtx"],
-                        self.appointments[uuid].get("end_time"),
-                        block_hash,
-                    )
+        Transactions are received via the ``mempool_queue`` as soon as they are accepted by ``bitcoind``. If one of them
+        triggers an appointment, the penalty is handed to the :obj:`Responder <teos.responder.Responder>` straightaway,
+        so it does not have to wait for the dispute transaction to be mined.
 
-                    # FIXME: Only necessary because of the triggered appointment approach. Fix if it changes.
+        Only breaches whose penalty is delivered are handled here. Those appointments are removed from memory, so the
+        breach is not handled again when the dispute transaction is mined. Any other breach is left to ``do_watch``,
+        since the dispute transaction may never make it into a block.
 
-                    if receipt.delivered:
-                        Cleaner.delete_appointment_from_memory(uuid, self.appointments, self.locator_uuid_map)
-                        triggered_flags.append(uuid)
-                    else:
-                        appointments_to_delete.append(uuid)
+        This runs in its own thread (only started if the mempool is fed), so the breaches are handled holding the lock
+        of the :obj:`Watcher`, and :meth:`Responder.handle_breach <teos.responder.Responder.handle_breach>` takes the
+        one of the ``Responder``.
+        """
 
-                # Appointments are only flagged as triggered if they are delivered, otherwise they are just deleted.
-                appointments_to_delete.extend(invalid_breaches)
-                self.db_manager.batch_create_triggered_appointment_flag(triggered_flags)
+        while True:
+            raw_tx = self.mempool_queue.get()
+
+            try:
+                txid = deserialize_tx(raw_tx).get("txid")
+
+            except ValueError as e:
+                logger.error("Couldn't deserialize mempool transaction", error=str(e))
+                txid = None
+
+            with self.lock:
+                # Most transactions won't match any locator, so they are checked before building the breaches
+                if txid is not None and compute_locator(txid) in self.locator_uuid_map:
+                    valid_breaches, _ = self.filter_valid_breaches(self.get_breaches([txid]))
+                    best_tip = self.block_processor.header_chain.tip
+                    triggered_flags = []
+
+                    with self.db_manager.atomic_batch():
+                        for uuid, breach in valid_breaches.items():
+                            receipt = self.responder.handle_breach(
+                                uuid,
+                                breach["locator"],
+                                breach["dispute_txid"],
+                                breach["penalty_txid"],
+                                breach["penalty_rawtx"],
+                                self.appointments[uuid].end_time,
+                                best_tip,
+                            )
+
+                            if receipt.delivered:
+                                logger.info(
+                                    "Breach responded from the mempool",
+                                    penalty_txid=breach["penalty_txid"],
+                                    locator=breach["locator"],
+                                    uuid=uuid,
+                                )
+
+                                Cleaner.delete_appointment_from_memory(
+                                    uuid, self.appointments, self.locator_uuid_map, self.end_time_uuid_map
+                                )
+                                triggered_flags.append(uuid)
+
+                        self.db_manager.batch_create_triggered_appointment_flag(triggered_flags)
+
+            self.mempool_queue.task_done()
+
+    def get_expired_appointments(self, height):
+        """
+        Gets the appointments that have expired at a given height (``end_time + expiry_delta`` has been passed).
 
-                Cleaner.delete_completed_appointments(
-                    appointments_to_delete, self.appointments, self.locator_uuid_map, self.db_manager
-                )
+        The expired ``end_times`` are popped from ``scheduled_end_times`` and their appointments looked up in
+        ``end_time_uuid_map``, so the cost depends on the appointments that are expiring and not on the whole map.
+        Blocks may be skipped, so every ``end_time`` up to ``height - expiry_delta - 1`` is popped, not only the last
+        one. The returned appointments are expected to be deleted (``Cleaner.delete_expired_appointments``).
 
-                if len(self.appointments) is 0:
-                    logger.info("No more pending appointments")
+        Args:
+            height (:obj:`int`): the height of the last received block.
 
-            # Register the last processed block for the watcher
-            self.db_manager.store_last_block_hash_watcher(block_hash)
-            self.block_queue.task_done()
+        Returns:
+            :obj:`list`: A list with the ``uuids`` of the expired appointments. An empty list if none are found.
+        """
+
+        expired_appointments = []
+        expired_end_times = set()
+
+        # End times whose appointments were already deleted (or pushed twice) may still be in the heap, they are skipped
+        while len(self.scheduled_end_times) > 0 and height > self.scheduled_end_times[0] + self.expiry_delta:
+            end_time = heapq.heappop(self.scheduled_end_times)
+
+            if end_time in self.end_time_uuid_map and end_time not in expired_end_times:
+                expired_end_times.add(end_time)
+                expired_appointments.extend(self.end_time_uuid_map[end_time])
+
+        return expired_appointments
 
     def get_breaches(self, txids):
         """
@@ -217,11 +411,15 @@ class Watcher:
             found.
         """
 
-        potential_locators = {compute_locator(txid): txid for txid in txids}
+        breaches = {}
+
+        # Check if any of the tx_ids in the received block is an actual match. The locators are probed one by one, so no
+        # copy of the locator map is made
+        for txid in txids:
+            locator = compute_locator(txid)
 
-        # Check is any of the tx_ids in the received block is an actual match
-        intersection = set(self.locator_uuid_map.keys()).intersection(potential_locators.keys())
-        breaches = {locator: potential_locators[locator] for locator in intersection}
+            if locator in self.locator_uuid_map:
+                breaches[locator] = txid
 
         if len(breaches) > 0:
             logger.info("List of breaches", breaches=breaches)
@@ -231,6 +429,48 @@ class Watcher:
 
         return breaches
 
+    @staticmethod
+    def decrypt_penalties(triggered_blobs):
+        """
+        Decrypts a batch of encrypted blobs using their ``dispute_txid`` and deserializes the penalty transactions they
+        contain.
+
+        The blobs are handled as raw bytes and decrypted by :meth:`Cryptographer.decrypt_many
+        <common.cryptographer.Cryptographer.decrypt_many>`. The penalty transactions are only hex encoded if they are
+        valid (to be sent to ``bitcoind`` by the :obj:`Responder <teos.responder.Responder>`). The ``dispute_txids``
+        are kept as hex everywhere else, so they are only converted here, to be used as keys.
+
+        Args:
+            triggered_blobs (:obj:`list`): a list of tuples ``(encrypted_blob, dispute_txid, uuid)``, with the raw
+                encrypted blob (:obj:`bytes`), the id of the transaction that triggered the appointment and the
+                identifier of the appointment the blob belongs to (for logging).
+
+        Returns:
+            :obj:`list`: A list of tuples ``(penalty_tx, penalty_rawtx)``, in the same order. Both are ``None`` if the
+            blob does not contain a valid transaction.
+        """
+
+        penalty_rawtxs = Cryptographer.decrypt_many(
+            [encrypted_blob for encrypted_blob, _, _ in triggered_blobs],
+            [bytes.fromhex(dispute_txid) for _, dispute_txid, _ in triggered_blobs],
+        )
+
+        penalties = []
+        for (_, _, uuid), penalty_rawtx in zip(triggered_blobs, penalty_rawtxs):
+            penalty_tx = None
+
+            if penalty_rawtx is not None:
+                # The transaction is deserialized locally, there's no need to ask bitcoind to decode it
+                try:
+                    penalty_tx = deserialize_tx(penalty_rawtx)
+
+                except ValueError as e:
+                    logger.error("Can't build transaction from decrypted data", uuid=uuid, error=str(e))
+
+            penalties.append((penalty_tx, penalty_rawtx.hex()) if penalty_tx is not None else (None, None))
+
+        return penalties
+
     def filter_valid_breaches(self, breaches):
         """
         Filters what of the found breaches contain valid transaction data.
@@ -239,6 +479,12 @@ class Watcher:
         transaction until a breach if seen. Blobs that contain arbitrary data are dropped and not sent to the
         :obj:`Responder <teos.responder.Responder>`.
 
+        The blobs are decrypted in batches by a pool of ``decrypt_workers`` threads. The blobs are loaded from the
+        database by the calling thread, so they are read within its
+        :meth:`atomic_batch <teos.db_manager.DBManager.atomic_batch>` (if any). The breaches are returned in the same
+        order they would be found sequentially, so the order in which they are handed to the
+        :obj:`Responder <teos.responder.Responder>` does not depend on the pool.
+
         Args:
             breaches (:obj:`dict`): a dictionary containing channel breaches (``locator:txid``).
 
@@ -252,39 +498,46 @@ class Watcher:
         valid_breaches = {}
         invalid_breaches = []
 
-        # A cache of the already decrypted blobs so replicate decryption can be avoided
-        decrypted_blobs = {}
-
+        triggered = []
         for locator, dispute_txid in breaches.items():
             for uuid in self.locator_uuid_map[locator]:
-                appointment = Appointment.from_dict(self.db_manager.load_watcher_appointment(uuid))
+                triggered.append((uuid, locator, dispute_txid, self.db_manager.load_encrypted_blob(uuid)))
 
-                if appointment.encrypted_blob.data in decrypted_blobs:
-                    penalty_tx, penalty_rawtx = decrypted_blobs[appointment.encrypted_blob.data]
+        # Replicated blobs are only decrypted once
+        blobs = {}
+        for uuid, _, dispute_txid, encrypted_blob in triggered:
+            if encrypted_blob not in blobs:
+                blobs[encrypted_blob] = (encrypted_blob, dispute_txid, uuid)
 
-                else:
-                    try:
-                        penalty_rawtx = Cryptographer.decrypt(appointment.encrypted_blob, dispute_txid)
+        triggered_blobs = list(blobs.values())
 
-                    except ValueError:
-                        penalty_rawtx = None
+        if len(triggered_blobs) > 1 and self.decrypt_workers > 1:
+            # Every worker gets a contiguous chunk, so the results can be put back together in order
+            chunk_size = -(-len(triggered_blobs) // self.decrypt_workers)
+            chunks = [triggered_blobs[i : i + chunk_size] for i in range(0, len(triggered_blobs), chunk_size)]
 
-                    penalty_tx = self.block_processor.decode_raw_transaction(penalty_rawtx)
-                    decrypted_blobs[appointment.encrypted_blob.data] = (penalty_tx, penalty_rawtx)
+            with ThreadPoolExecutor(max_workers=self.decrypt_workers) as executor:
+                decrypted = [penalty for chunk in executor.map(self.decrypt_penalties, chunks) for penalty in chunk]
 
-                if penalty_tx is not None:
-                    valid_breaches[uuid] = {
-                        "locator": locator,
-                        "dispute_txid": dispute_txid,
-                        "penalty_txid": penalty_tx.get("txid"),
-                        "penalty_rawtx": penalty_rawtx,
-                    }
+        else:
+            decrypted = self.decrypt_penalties(triggered_blobs)
 
-                    logger.info(
-                        "Breach found for locator", locator=locator, uuid=uuid, penalty_txid=penalty_tx.get("txid")
-                    )
+        decrypted_blobs = dict(zip(blobs.keys(), decrypted))
 
-                else:
-                    invalid_breaches.append(uuid)
+        for uuid, locator, dispute_txid, encrypted_blob in triggered:
+            penalty_tx, penalty_rawtx = decrypted_blobs[encrypted_blob]
+
+            if penalty_tx is not None:
+                valid_breaches[uuid] = {
+                    "locator": locator,
+                    "dispute_txid": dispute_txid,
+                    "penalty_txid": penalty_tx.get("txid"),
+                    "penalty_rawtx": penalty_rawtx,
+                }
+
+                logger.info("Breach found for locator", locator=locator, uuid=uuid, penalty_txid=penalty_tx.get("txid"))
+
+            else:
+                invalid_breaches.append(uuid)
 
         return valid_breaches, invalid_breaches
@@ -136,6 +136,40 @@ def test_add_appointment_with_invalid_signature(monkeypatch):
     assert result is False
 
 
+@responses.activate
+def test_add_appointments(monkeypatch):
+    # Simulate a request to add_appointments for two copies of dummy_appointment, make sure that the right endpoint is
+    # requested once and the return value is True
+    monkeypatch.setattr(teos_cli, "load_keys", load_dummy_keys)
+
+    add_appointments_endpoint = "{}/add_appointments".format(teos_endpoint)
+    response = {"appointments": [{"locator": dummy_appointment.locator, "signature": get_dummy_signature()}] * 2}
+    responses.add(responses.POST, add_appointments_endpoint, json=response, status=200)
+    result = teos_cli.add_appointments(
+        [json.dumps([dummy_appointment_request, dummy_appointment_request])], teos_endpoint, config
+    )
+
+    assert len(responses.calls) == 1
+    assert responses.calls[0].request.url == add_appointments_endpoint
+    assert result
+
+    # If any of the appointments is rejected the return value is False
+    response = {
+        "appointments": [
+            {"locator": dummy_appointment.locator, "signature": get_dummy_signature()},
+            {"locator": dummy_appointment.locator, "error": "appointment rejected"},
+        ]
+    }
+    responses.replace(responses.POST, add_appointments_endpoint, json=response, status=200)
+    result = teos_cli.add_appointments(
+        [json.dumps([dummy_appointment_request, dummy_appointment_request])], teos_endpoint, config
+    )
+
+    shutil.rmtree(config.get("APPOINTMENTS_FOLDER_NAME"))
+
+    assert result is False
+
+
 def test_parse_add_appointment_args():
     # If no args are passed, function should fail.
     appt_data = teos_cli.parse_add_appointment_args(None)
@@ -0,0 +1,58 @@
+"""
+Micro-benchmark for ``Cryptographer.decrypt_many``.
+
+Simulates a breach storm, with several blobs triggered by the same dispute txs, and compares decrypting the batch at
+once with decrypting every blob on its own (checking formats, hex decoding, building a cipher per blob and logging).
+
+This is not part of the test suite, since timings depend on the machine. Run it from the repository root with:
+
+    python -m test.common.benchmarks.decrypt_many
+"""
+
+from os import urandom
+from time import perf_counter
+from binascii import unhexlify
+
+import common.cryptographer
+from common.blob import Blob
+from common.logger import Logger
+from common.cryptographer import Cryptographer
+from common.encrypted_blob import EncryptedBlob
+
+common.cryptographer.logger = Logger(actor="Cryptographer", log_name_prefix="")
+
+DISPUTE_TXS = 50
+BLOBS = 1000
+ROUNDS = 5
+
+
+def main():
+    dispute_txids = [urandom(32).hex() for _ in range(DISPUTE_TXS)]
+    secrets = [dispute_txids[i % len(dispute_txids)] for i in range(BLOBS)]
+    blobs = [Cryptographer.encrypt(Blob(urandom(125).hex()), secret) for secret in secrets]
+
+    encrypted_blobs = [EncryptedBlob(blob) for blob in blobs]
+    raw_blobs = [unhexlify(blob) for blob in blobs]
+    raw_secrets = [unhexlify(secret) for secret in secrets]
+
+    sequential_times = []
+    batch_times = []
+    for _ in range(ROUNDS):
+        start = perf_counter()
+        sequential = [Cryptographer.decrypt(blob, secret) for blob, secret in zip(encrypted_blobs, secrets)]
+        sequential_times.append(perf_counter() - start)
+
+        start = perf_counter()
+        batch = Cryptographer.decrypt_many(raw_blobs, raw_secrets)
+        batch_times.append(perf_counter() - start)
+
+    assert [unhexlify(data) for data in sequential] == batch
+
+    print("Decrypting {} blobs (best of {} rounds)".format(BLOBS, ROUNDS))
+    print("  one by one:   {:.2f} ms".format(1000 * min(sequential_times)))
+    print("  decrypt_many: {:.2f} ms".format(1000 * min(batch_times)))
+    print("  speedup:      {:.2f}x".format(min(sequential_times) / min(batch_times)))
+
+
+if __name__ == "__main__":
+    main()
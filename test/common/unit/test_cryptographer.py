@@ -132,6 +132,44 @@ def test_decrypt():
     assert Cryptographer.decrypt(EncryptedBlob(encrypted_data), key) == data
 
 
+def test_encrypt_decrypt_raw():
+    # The raw versions work on bytes and match the hex encoded ones
+    assert Cryptographer.encrypt_raw(unhexlify(data), unhexlify(key)) == unhexlify(encrypted_data)
+    assert Cryptographer.decrypt_raw(unhexlify(encrypted_data), unhexlify(key)) == unhexlify(data)
+
+    # Data that cannot be decrypted with the given key returns None
+    assert Cryptographer.decrypt_raw(unhexlify(encrypted_data), unhexlify(get_random_value_hex(32))) is None
+
+
+def test_decrypt_many():
+    # Blobs are decrypted in order, those that cannot be decrypted with their key return None
+    blobs = [unhexlify(encrypted_data), unhexlify(encrypted_data), unhexlify(get_random_value_hex(64))]
+    secrets = [unhexlify(key), unhexlify(get_random_value_hex(32)), unhexlify(key)]
+    assert Cryptographer.decrypt_many(blobs, secrets) == [unhexlify(data), None, None]
+
+    # Views over a bigger buffer can be used too
+    buffer = bytes(10) + unhexlify(encrypted_data)
+    assert Cryptographer.decrypt_many([memoryview(buffer)[10:]], [memoryview(unhexlify(key))]) == [unhexlify(data)]
+
+    assert Cryptographer.decrypt_many([], []) == []
+
+    # Several blobs triggered by the same dispute txs decrypt to the same data as decrypting them one by one
+    dispute_txids = [get_random_value_hex(32) for _ in range(10)]
+    secrets = [dispute_txids[i % len(dispute_txids)] for i in range(100)]
+    blobs = [Cryptographer.encrypt(Blob(get_random_value_hex(250)), secret) for secret in secrets]
+
+    sequential = [unhexlify(Cryptographer.decrypt(EncryptedBlob(blob), secret)) for blob, secret in zip(blobs, secrets)]
+    batch = Cryptographer.decrypt_many([unhexlify(blob) for blob in blobs], [unhexlify(secret) for secret in secrets])
+    assert batch == sequential
+
+    try:
+        Cryptographer.decrypt_many(blobs, secrets[:1])
+        assert False
+
+    except ValueError:
+        assert True
+
+
 def test_load_key_file():
     dummy_sk = ec.generate_private_key(ec.SECP256K1, default_backend())
     dummy_sk_der = dummy_sk.private_bytes(
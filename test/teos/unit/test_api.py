@@ -105,6 +105,47 @@ def test_add_appointment_multiple_times(new_appt_data, n=MULTIPLE_APPOINTMENTS):
         assert r.status_code == 200
 
 
+def test_add_appointment_concurrently(new_appt_data, n=MULTIPLE_APPOINTMENTS):
+    # The API serves several requests at the same time, all of them should be accepted
+    responses = []
+    threads = [Thread(target=lambda: responses.append(add_appointment(new_appt_data))) for _ in range(n)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert len(responses) == n and all(r.status_code == 200 for r in responses)
+
+
+def test_add_appointments(new_appt_data):
+    # Appointments are accepted or rejected one by one, and the results are returned in the same order
+    wrong_appt_data = json.loads(json.dumps(new_appt_data))
+    wrong_appt_data["appointment"]["to_self_delay"] = 0
+
+    batch = [new_appt_data, wrong_appt_data, new_appt_data]
+    r = requests.post(url=TEOS_API + "/add_appointments", json=json.dumps({"appointments": batch}), timeout=5)
+    assert r.status_code == 200
+
+    results = json.loads(r.content).get("appointments")
+    assert len(results) == len(batch)
+    assert results[0].get("signature") is not None and results[2].get("signature") is not None
+    assert results[1].get("signature") is None and results[1].get("error") is not None
+    assert all(result.get("locator") == new_appt_data["appointment"]["locator"] for result in results)
+
+    appointments.extend([new_appt_data["appointment"]] * 2)
+
+    # Requests that do not contain a list of appointments are rejected as a whole
+    r = requests.post(url=TEOS_API + "/add_appointments", json=json.dumps(new_appt_data), timeout=5)
+    assert r.status_code == 400
+
+
+def test_init_wrong_server():
+    with pytest.raises(ValueError):
+        API(None, None, {"API_SERVER": "gunicorn"})
+
+
 def test_request_multiple_appointments_same_locator(new_appt_data, n=MULTIPLE_APPOINTMENTS):
     for _ in range(n):
         r = add_appointment(new_appt_data)
@@ -0,0 +1,84 @@
+import json
+import pytest
+from uuid import uuid4
+
+from teos.utils.appointment_store import AppointmentStore, AppointmentSummary
+
+from test.teos.unit.conftest import get_random_value_hex
+
+
+def test_init():
+    appointments = {uuid4().hex: {"locator": get_random_value_hex(16), "end_time": i} for i in range(10)}
+    store = AppointmentStore(appointments)
+
+    assert len(store) == 10 and store.to_dict() == appointments
+    assert all(isinstance(record, AppointmentSummary) for record in store.records.values())
+
+
+def test_set_get_item():
+    store = AppointmentStore()
+    uuid = uuid4().hex
+    locator = get_random_value_hex(16)
+
+    # Appointments can be set as dicts, but are given back as records with the same fields
+    store[uuid] = {"locator": locator, "end_time": 100}
+    record = store[uuid]
+
+    assert isinstance(record, AppointmentSummary)
+    assert record.locator == locator and record.end_time == 100
+    assert store.get(uuid) is record
+
+    # And also as records
+    other_uuid = uuid4().hex
+    store[other_uuid] = AppointmentSummary(locator, 200)
+    assert store[other_uuid].to_dict() == {"locator": locator, "end_time": 200}
+
+    with pytest.raises(KeyError):
+        store[uuid4().hex]
+
+
+def test_shared_keys():
+    store = AppointmentStore()
+    uuid = uuid4().hex
+    other_uuid = uuid4().hex
+    locator = get_random_value_hex(16)
+
+    # uuids and locators are kept as given, so the maps can share the objects with the store
+    store[uuid] = {"locator": locator, "end_time": 100}
+    store[other_uuid] = AppointmentSummary(locator, 200)
+
+    assert next(k for k in store.records if k == uuid) is uuid
+    assert store[uuid].locator is locator and store[other_uuid].locator is locator
+
+    # Equal locators are not interned, so nothing is kept once the appointments are gone
+    copied_locator = "".join(list(locator))
+    store[uuid] = {"locator": copied_locator, "end_time": 100}
+    assert store[uuid].locator is copied_locator
+
+
+def test_del_item():
+    uuid = uuid4().hex
+    store = AppointmentStore({uuid: {"locator": get_random_value_hex(16), "end_time": 100}})
+
+    store.pop(uuid)
+    assert uuid not in store and len(store) == 0
+
+    with pytest.raises(KeyError):
+        del store[uuid]
+
+
+def test_contains():
+    uuid = uuid4().hex
+    store = AppointmentStore({uuid: {"locator": get_random_value_hex(16), "end_time": 100}})
+
+    assert uuid in store
+    assert uuid4().hex not in store
+    assert "not_a_uuid" not in store and None not in store
+
+
+def test_to_dict():
+    # The store can be turned into a dict (e.g. to be snapshotted)
+    appointments = {uuid4().hex: {"locator": get_random_value_hex(16), "end_time": i} for i in range(10)}
+    store = AppointmentStore(appointments)
+
+    assert json.loads(json.dumps(store.to_dict())) == appointments
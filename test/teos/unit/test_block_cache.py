@@ -0,0 +1,83 @@
+from time import sleep
+from threading import Thread
+
+from teos.utils.block_cache import BlockCache
+
+from test.teos.unit.conftest import get_random_value_hex
+
+
+def get_random_block(n_txs=1):
+    return {"hash": get_random_value_hex(32), "tx": [get_random_value_hex(32) for _ in range(n_txs)]}
+
+
+def test_get_put():
+    cache = BlockCache()
+    block = get_random_block()
+
+    assert cache.get(block.get("hash")) is None
+    cache.put(block.get("hash"), block)
+    assert cache.get(block.get("hash")) == block
+
+    assert cache.hits == 1 and cache.misses == 1
+
+
+def test_put_max_blocks():
+    cache = BlockCache(max_blocks=3)
+    blocks = [get_random_block() for _ in range(4)]
+
+    for block in blocks[:3]:
+        cache.put(block.get("hash"), block)
+
+    # Using the oldest block makes the second one the least recently used, so it is the one evicted
+    cache.get(blocks[0].get("hash"))
+    cache.put(blocks[3].get("hash"), blocks[3])
+
+    assert list(cache.blocks.keys()) == [blocks[2].get("hash"), blocks[0].get("hash"), blocks[3].get("hash")]
+
+
+def test_put_max_txs():
+    cache = BlockCache(max_txs=10)
+    small_block = get_random_block(5)
+    big_block = get_random_block(20)
+
+    cache.put(small_block.get("hash"), small_block)
+    assert cache.txs == 5
+
+    # A block bigger than the cache evicts everything else but is kept
+    cache.put(big_block.get("hash"), big_block)
+    assert list(cache.blocks.keys()) == [big_block.get("hash")]
+    assert cache.txs == 20
+
+
+def test_get_or_load():
+    cache = BlockCache()
+    block = get_random_block()
+    loads = []
+
+    def load_block(block_hash):
+        loads.append(block_hash)
+        sleep(0.5)
+        return block
+
+    # Concurrent requests for the same block only load it once
+    results = []
+    threads = [
+        Thread(target=lambda: results.append(cache.get_or_load(block.get("hash"), load_block))) for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [block] * 5
+    assert loads == [block.get("hash")]
+    assert cache.misses == 1 and cache.hits == 4
+
+
+def test_get_or_load_not_found():
+    cache = BlockCache()
+    block_hash = get_random_value_hex(32)
+
+    # Blocks that cannot be loaded are not cached
+    assert cache.get_or_load(block_hash, lambda h: None) is None
+    assert len(cache.blocks) == 0 and len(cache.loading) == 0
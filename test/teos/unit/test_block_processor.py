@@ -3,16 +3,6 @@ import pytest
 from test.teos.unit.conftest import get_random_value_hex, generate_block, generate_blocks, fork, bitcoind_connect_params
 
 
-hex_tx = (
-    "0100000001c997a5e56e104102fa209c6a852dd90660a20b2d9c352423edce25857fcd3704000000004847304402"
-    "204e45e16932b8af514961a1d3a1a25fdf3f4f7732e9d624c6c61548ab5fb8cd410220181522ec8eca07de4860a4"
-    "acdd12909d831cc56cbbac4622082221a8768d1d0901ffffffff0200ca9a3b00000000434104ae1a62fe09c5f51b"
-    "13905f07f06b99a2f7159b2225f374cd378d71302fa28414e7aab37397f554a7df5f142c21c1b7303b8a0626f1ba"
-    "ded5c72a704f7e6cd84cac00286bee0000000043410411db93e1dcdb8a016b49840f8c53bc1eb68a382e97b1482e"
-    "cad7b148a6909a5cb2e0eaddfb84ccf9744464f82e160bfa9b8b64f9d4c03f999b8643f656b412a3ac00000000"
-)
-
-
 def test_get_best_block_hash(run_bitcoind, block_processor):
     best_block_hash = block_processor.get_best_block_hash()
     # As long as bitcoind is running (or mocked in this case) we should always a block hash
@@ -36,19 +26,93 @@ def test_get_random_block(block_processor):
     assert block is None
 
 
+def test_get_block_cached(block_processor):
+    best_block_hash = block_processor.get_best_block_hash()
+    block_processor.block_cache.clear()
+
+    # The block is only queried once, then it is served from the cache
+    block = block_processor.get_block(best_block_hash)
+    assert block_processor.get_block(best_block_hash) is block
+
+    # Unless the cache is explicitly skipped
+    assert block_processor.get_block(best_block_hash, use_cache=False) is not block
+    assert block_processor.block_cache.get(best_block_hash) is not block
+
+
+def test_get_blocks(block_processor):
+    best_block_hash = block_processor.get_best_block_hash()
+    random_block_hash = get_random_value_hex(32)
+
+    # Blocks are returned in the same order they are requested, and the unknown ones are None
+    blocks = block_processor.get_blocks([best_block_hash, random_block_hash])
+
+    assert len(blocks) == 2
+    assert blocks[0].get("hash") == best_block_hash
+    assert blocks[1] is None
+
+
+def test_get_block_hashes(block_processor):
+    best_block_hash = block_processor.get_best_block_hash()
+    height = block_processor.get_block(best_block_hash).get("height")
+
+    # Hashes are returned in the same order as the heights, and the ones out of range are None
+    assert block_processor.get_block_hashes([height, height + 1]) == [best_block_hash, None]
+
+
+def test_prefetch_blocks(block_processor):
+    block_hashes = []
+    for _ in range(15):
+        generate_block()
+        block_hashes.append(block_processor.get_best_block_hash())
+
+    # Unknown blocks are yielded but not cached
+    block_hashes.insert(5, get_random_value_hex(32))
+
+    prefetched = []
+    for block_hash in block_processor.prefetch_blocks(block_hashes):
+        prefetched.append(block_hash)
+
+        if block_hash == block_hashes[5]:
+            assert block_hash not in block_processor.prefetched_blocks
+        else:
+            assert block_processor.prefetched_blocks.get(block_hash).get("hash") == block_hash
+
+    # Blocks are yielded in order and nothing is left in memory
+    assert prefetched == block_hashes
+    assert block_processor.prefetched_blocks == {}
+
+
 def test_get_block_count(block_processor):
     block_count = block_processor.get_block_count()
     assert isinstance(block_count, int) and block_count >= 0
 
 
-def test_decode_raw_transaction(block_processor):
-    # We cannot exhaustively test this (we rely on bitcoind for this) but we can try to decode a correct transaction
-    assert block_processor.decode_raw_transaction(hex_tx) is not None
+def test_get_tip_height(block_processor):
+    block_processor.update_header_chain(block_processor.get_best_block_hash())
+
+    # The tip height is only used once the tip has been confirmed
+    block_processor.tip_checked_at = None
+    assert block_processor.get_tip_height() == block_processor.get_block_count()
+
+    block_processor.confirm_tip(block_processor.header_chain.tip)
+    generate_block()
+
+    # The header chain has not been updated with the last block, so the cached height is one block behind
+    assert block_processor.get_tip_height() == block_processor.get_block_count() - 1
+
+    # And bitcoind is queried if it may be stale
+    assert block_processor.get_tip_height(max_age=-1) == block_processor.get_block_count()
+
+
+def test_confirm_tip(block_processor):
+    block_processor.tip_checked_at = None
 
+    # Only the header chain tip can be confirmed
+    block_processor.confirm_tip(get_random_value_hex(32))
+    assert block_processor.tip_checked_at is None
 
-def test_decode_raw_transaction_invalid(block_processor):
-    # Same but with an invalid one
-    assert block_processor.decode_raw_transaction(hex_tx[::-1]) is None
+    block_processor.confirm_tip(block_processor.header_chain.tip)
+    assert block_processor.tip_checked_at is not None
 
 
 def test_get_missed_blocks(block_processor):
@@ -110,3 +174,30 @@ def test_find_last_common_ancestor(block_processor):
     last_common_ancestor, dropped_txs = block_processor.find_last_common_ancestor(best_block_hash)
     assert last_common_ancestor == ancestor
     assert len(dropped_txs) == 3
+
+
+def test_update_header_chain(block_processor):
+    block_processor.update_header_chain(block_processor.get_best_block_hash())
+    start_block_hash = block_processor.header_chain.tip
+    generate_blocks(3)
+
+    # Jumping straight to the new tip connects the blocks in between
+    best_block_hash = block_processor.get_best_block_hash()
+    assert block_processor.update_header_chain(best_block_hash)
+    assert block_processor.header_chain.tip == best_block_hash
+    assert len(block_processor.get_missed_blocks(start_block_hash)) == 3
+    for block_hash in block_processor.get_missed_blocks(start_block_hash):
+        assert block_processor.header_chain.is_in_best_chain(block_hash)
+
+    # The distance to the tip is now computed from the header chain
+    assert block_processor.get_distance_to_tip(start_block_hash) == 3
+
+    # After a fork, the forked out blocks are not in the best chain anymore
+    fork(start_block_hash)
+    generate_blocks(5)
+    assert block_processor.update_header_chain(block_processor.get_best_block_hash())
+    assert not block_processor.is_block_in_best_chain(best_block_hash)
+    assert block_processor.find_last_common_ancestor(best_block_hash)[0] == start_block_hash
+
+    # Unknown blocks are not added
+    assert not block_processor.update_header_chain(get_random_value_hex(32))
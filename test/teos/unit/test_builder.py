@@ -1,6 +1,7 @@
 import pytest
 from uuid import uuid4
 from queue import Queue
+from threading import Thread
 
 from teos.builder import Builder
 from teos.watcher import Watcher
@@ -39,14 +40,19 @@ def test_build_appointments():
             appointments_data[uuid] = appointment.to_dict()
 
     # Use the builder to create the data structures
-    appointments, locator_uuid_map = Builder.build_appointments(appointments_data)
+    appointments, locator_uuid_map, end_time_uuid_map = Builder.build_appointments(appointments_data)
 
     # Check that the created appointments match the data
     for uuid, appointment in appointments.items():
         assert uuid in appointments_data.keys()
-        assert appointments_data[uuid].get("locator") == appointment.get("locator")
-        assert appointments_data[uuid].get("end_time") == appointment.get("end_time")
-        assert uuid in locator_uuid_map[appointment.get("locator")]
+        assert appointments_data[uuid].get("locator") == appointment.locator
+        assert appointments_data[uuid].get("end_time") == appointment.end_time
+        assert uuid in locator_uuid_map[appointment.locator]
+        assert uuid in end_time_uuid_map[appointment.end_time]
+
+    # The locator map is keyed with the locator object kept by the store for the first appointment of each locator
+    for locator, uuids in locator_uuid_map.items():
+        assert appointments[uuids[0]].locator is locator
 
 
 def test_build_trackers():
@@ -66,7 +72,7 @@ def test_build_trackers():
 
             trackers_data[uuid4().hex] = tracker.to_dict()
 
-    trackers, tx_tracker_map = Builder.build_trackers(trackers_data)
+    trackers, tx_tracker_map, height_tracker_map = Builder.build_trackers(trackers_data)
 
     # Check that the built trackers match the data
     for uuid, tracker in trackers.items():
@@ -76,6 +82,7 @@ def test_build_trackers():
         assert tracker.get("locator") == trackers_data[uuid].get("locator")
         assert tracker.get("appointment_end") == trackers_data[uuid].get("appointment_end")
         assert uuid in tx_tracker_map[tracker.get("penalty_txid")]
+        assert uuid in height_tracker_map[tracker.get("appointment_end")]
 
 
 def test_populate_block_queue():
@@ -93,6 +100,30 @@ def test_populate_block_queue():
     assert len(blocks) == 0
 
 
+def test_feed_block_queues(block_processor):
+    blocks = []
+    for _ in range(5):
+        generate_block()
+        blocks.append(bitcoin_cli(bitcoind_connect_params).getbestblockhash())
+
+    # Every block is fed to every queue, in order, and only once the previous one has been processed
+    processed = []
+    queues = [Queue(), Queue()]
+
+    def process(i):
+        while True:
+            block_hash = queues[i].get()
+            processed.append((i, block_processor.get_block(block_hash).get("hash")))
+            queues[i].task_done()
+
+    for i in range(len(queues)):
+        Thread(target=process, args=[i], daemon=True).start()
+
+    Builder.feed_block_queues(block_processor, queues, blocks)
+
+    assert processed == [(i, block_hash) for block_hash in blocks for i in range(len(queues))]
+
+
 def test_update_states_empty_list(db_manager, carrier, block_processor):
     w = Watcher(
         db_manager=db_manager,
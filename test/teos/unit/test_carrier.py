@@ -48,6 +48,25 @@ def test_send_transaction_invalid_format(carrier):
     assert receipt.delivered is False and receipt.reason == RPC_DESERIALIZATION_ERROR
 
 
+def test_send_transactions(carrier):
+    txs = [create_dummy_transaction() for _ in range(5)]
+    rawtxs = {tx.tx_id.hex(): tx.hex() for tx in txs}
+
+    # Add one that does not fit the format
+    invalid_txid = create_dummy_transaction().tx_id.hex()
+    rawtxs[invalid_txid] = invalid_txid
+
+    receipts = carrier.send_transactions(rawtxs)
+
+    assert receipts.keys() == rawtxs.keys()
+    for txid, receipt in receipts.items():
+        if txid == invalid_txid:
+            assert receipt.delivered is False and receipt.reason == RPC_DESERIALIZATION_ERROR
+        else:
+            assert receipt.delivered is True
+            sent_txs.append(txid)
+
+
 def test_get_transaction(carrier):
     # We should be able to get back every transaction we've sent
     for tx in sent_txs:
@@ -60,3 +79,12 @@ def test_get_non_existing_transaction(carrier):
     tx_info = carrier.get_transaction(get_random_value_hex(32))
 
     assert tx_info is None
+
+
+def test_get_transactions(carrier):
+    non_existing_txid = get_random_value_hex(32)
+    txs = carrier.get_transactions(sent_txs + [non_existing_txid])
+
+    # Every sent transaction is found, the random one is not
+    assert all(txs[txid] is not None for txid in sent_txs)
+    assert txs[non_existing_txid] is None
@@ -1,11 +1,13 @@
 import zmq
 import time
+import pytest
 from queue import Queue
 from threading import Thread, Event, Condition
 
 from teos.chain_monitor import ChainMonitor
 
 from test.teos.unit.conftest import get_random_value_hex, generate_block, bitcoind_connect_params, bitcoind_feed_params
+from test.teos.unit.test_tx_parser import hex_tx
 
 
 def test_init(run_bitcoind, block_processor):
@@ -62,6 +64,47 @@ def test_update_state(block_processor):
     assert chain_monitor.best_tip == another_block_hash and new_block_hash == chain_monitor.last_tips[-1]
 
 
+def test_init_wrong_feed_topic(block_processor):
+    with pytest.raises(ValueError):
+        ChainMonitor(Queue(), Queue(), block_processor, {**bitcoind_feed_params, "FEED_TOPIC": "rawtx"})
+
+
+def test_init_mempool_feed(block_processor):
+    # The mempool queue is only used if the mempool feed is enabled
+    chain_monitor = ChainMonitor(Queue(), Queue(), block_processor, bitcoind_feed_params, Queue())
+    assert chain_monitor.mempool_queue is None
+
+    mempool_queue = Queue()
+    chain_monitor = ChainMonitor(
+        Queue(), Queue(), block_processor, {**bitcoind_feed_params, "FEED_MEMPOOL": 1}, mempool_queue
+    )
+    assert chain_monitor.mempool_queue is mempool_queue
+
+
+def test_build_block(block_processor):
+    chain_monitor = ChainMonitor(Queue(), Queue(), block_processor, {**bitcoind_feed_params, "FEED_TOPIC": "rawblock"})
+    block_processor.update_header_chain(block_processor.get_best_block_hash())
+    tip = block_processor.header_chain.tip
+
+    # A block with a single transaction on top of the current tip
+    header = bytes.fromhex("01000000") + bytes.fromhex(tip)[::-1] + bytes(44)
+    raw_block = header + bytes([1]) + bytes.fromhex(hex_tx)
+
+    # The block is parsed and cached, so it does not need to be queried to bitcoind
+    block_hash = chain_monitor.build_block(raw_block)
+    block = block_processor.get_block(block_hash)
+    assert block.get("previousblockhash") == tip
+    assert block.get("height") == block_processor.header_chain.tip_height + 1
+    assert len(block.get("tx")) == 1
+
+    # Blocks on top of unknown blocks are not cached
+    block_hash = chain_monitor.build_block(bytes(80) + bytes([1]) + bytes.fromhex(hex_tx))
+    assert block_processor.block_cache.get(block_hash) is None
+
+    # And wrong data is ignored
+    assert chain_monitor.build_block(header) is None
+
+
 def test_monitor_chain_polling(db_manager, block_processor):
     # Try polling with the Watcher
     wq = Queue()
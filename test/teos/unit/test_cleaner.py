@@ -3,6 +3,7 @@ from uuid import uuid4
 
 from teos.responder import TransactionTracker
 from teos.cleaner import Cleaner
+from teos.utils.appointment_store import AppointmentStore
 from common.appointment import Appointment
 
 from test.teos.unit.conftest import get_random_value_hex
@@ -16,17 +17,25 @@ ITERATIONS = 10
 
 
 def set_up_appointments(db_manager, total_appointments):
-    appointments = dict()
+    appointments = AppointmentStore()
     locator_uuid_map = dict()
+    end_time_uuid_map = dict()
 
     for i in range(total_appointments):
         uuid = uuid4().hex
         locator = get_random_value_hex(LOCATOR_LEN_BYTES)
+        end_time = random.randint(0, ITEMS)
 
-        appointment = Appointment(locator, None, None, None, None)
-        appointments[uuid] = {"locator": appointment.locator}
+        appointment = Appointment(locator, None, end_time, None, None)
+        appointments[uuid] = {"locator": appointment.locator, "end_time": appointment.end_time}
         locator_uuid_map[locator] = [uuid]
 
+        if end_time in end_time_uuid_map:
+            end_time_uuid_map[end_time].append(uuid)
+
+        else:
+            end_time_uuid_map[end_time] = [uuid]
+
         db_manager.store_watcher_appointment(uuid, appointment.to_json())
         db_manager.create_append_locator_map(locator, uuid)
 
@@ -34,13 +43,14 @@ def set_up_appointments(db_manager, total_appointments):
         if i % 2:
             uuid = uuid4().hex
 
-            appointments[uuid] = {"locator": appointment.locator}
+            appointments[uuid] = {"locator": appointment.locator, "end_time": appointment.end_time}
             locator_uuid_map[locator].append(uuid)
+            end_time_uuid_map[end_time].append(uuid)
 
             db_manager.store_watcher_appointment(uuid, appointment.to_json())
             db_manager.create_append_locator_map(locator, uuid)
 
-    return appointments, locator_uuid_map
+    return appointments, locator_uuid_map, end_time_uuid_map
 
 
 def set_up_trackers(db_manager, total_trackers):
@@ -77,18 +87,22 @@ def set_up_trackers(db_manager, total_trackers):
 
 
 def test_delete_appointment_from_memory(db_manager):
-    appointments, locator_uuid_map = set_up_appointments(db_manager, MAX_ITEMS)
+    appointments, locator_uuid_map, end_time_uuid_map = set_up_appointments(db_manager, MAX_ITEMS)
 
     for uuid in list(appointments.keys()):
-        Cleaner.delete_appointment_from_memory(uuid, appointments, locator_uuid_map)
+        Cleaner.delete_appointment_from_memory(uuid, appointments, locator_uuid_map, end_time_uuid_map)
 
         # The appointment should have been deleted from memory, but not from the db
         assert uuid not in appointments
+        assert all(uuid not in uuids for uuids in end_time_uuid_map.values())
         assert db_manager.load_watcher_appointment(uuid) is not None
 
+    # Once all the appointments are gone, so are the maps
+    assert len(locator_uuid_map) == 0 and len(end_time_uuid_map) == 0
+
 
 def test_delete_appointment_from_db(db_manager):
-    appointments, locator_uuid_map = set_up_appointments(db_manager, MAX_ITEMS)
+    appointments, locator_uuid_map, end_time_uuid_map = set_up_appointments(db_manager, MAX_ITEMS)
 
     for uuid in list(appointments.keys()):
         Cleaner.delete_appointment_from_db(uuid, db_manager)
@@ -99,10 +113,10 @@ def test_delete_appointment_from_db(db_manager):
 
 
 def test_update_delete_db_locator_map(db_manager):
-    appointments, locator_uuid_map = set_up_appointments(db_manager, MAX_ITEMS)
+    appointments, locator_uuid_map, end_time_uuid_map = set_up_appointments(db_manager, MAX_ITEMS)
 
     for uuid, appointment in appointments.items():
-        locator = appointment.get("locator")
+        locator = appointment.locator
         locator_map_before = db_manager.load_locator_map(locator)
         Cleaner.update_delete_db_locator_map([uuid], locator, db_manager)
         locator_map_after = db_manager.load_locator_map(locator)
@@ -116,21 +130,25 @@ def test_update_delete_db_locator_map(db_manager):
 
 def test_delete_expired_appointment(db_manager):
     for _ in range(ITERATIONS):
-        appointments, locator_uuid_map = set_up_appointments(db_manager, MAX_ITEMS)
+        appointments, locator_uuid_map, end_time_uuid_map = set_up_appointments(db_manager, MAX_ITEMS)
         expired_appointments = random.sample(list(appointments.keys()), k=ITEMS)
 
-        Cleaner.delete_expired_appointments(expired_appointments, appointments, locator_uuid_map, db_manager)
+        Cleaner.delete_expired_appointments(
+            expired_appointments, appointments, locator_uuid_map, end_time_uuid_map, db_manager
+        )
 
         assert not set(expired_appointments).issubset(appointments.keys())
 
 
 def test_delete_completed_appointments(db_manager):
     for _ in range(ITERATIONS):
-        appointments, locator_uuid_map = set_up_appointments(db_manager, MAX_ITEMS)
+        appointments, locator_uuid_map, end_time_uuid_map = set_up_appointments(db_manager, MAX_ITEMS)
         completed_appointments = random.sample(list(appointments.keys()), k=ITEMS)
 
         len_before_clean = len(appointments)
-        Cleaner.delete_completed_appointments(completed_appointments, appointments, locator_uuid_map, db_manager)
+        Cleaner.delete_completed_appointments(
+            completed_appointments, appointments, locator_uuid_map, end_time_uuid_map, db_manager
+        )
 
         # ITEMS appointments should have been deleted from memory
         assert len(appointments) == len_before_clean - ITEMS
@@ -142,11 +160,13 @@ def test_delete_completed_appointments(db_manager):
 
 def test_flag_triggered_appointments(db_manager):
     for _ in range(ITERATIONS):
-        appointments, locator_uuid_map = set_up_appointments(db_manager, MAX_ITEMS)
+        appointments, locator_uuid_map, end_time_uuid_map = set_up_appointments(db_manager, MAX_ITEMS)
         triggered_appointments = random.sample(list(appointments.keys()), k=ITEMS)
 
         len_before_clean = len(appointments)
-        Cleaner.flag_triggered_appointments(triggered_appointments, appointments, locator_uuid_map, db_manager)
+        Cleaner.flag_triggered_appointments(
+            triggered_appointments, appointments, locator_uuid_map, end_time_uuid_map, db_manager
+        )
 
         # ITEMS appointments should have been deleted from memory
         assert len(appointments) == len_before_clean - ITEMS
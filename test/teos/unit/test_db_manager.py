@@ -3,15 +3,19 @@ import json
 import pytest
 import shutil
 from uuid import uuid4
+from threading import Thread
 
 from teos.db_manager import DBManager
 from teos.db_manager import (
+    WATCHER_PREFIX,
+    RESPONDER_PREFIX,
     WATCHER_LAST_BLOCK_KEY,
     RESPONDER_LAST_BLOCK_KEY,
     LOCATOR_MAP_PREFIX,
     TRIGGERED_APPOINTMENTS_PREFIX,
 )
 
+from common.appointment import Appointment
 from common.constants import LOCATOR_LEN_BYTES
 
 from test.teos.unit.conftest import get_random_value_hex, generate_dummy_appointment
@@ -262,6 +266,13 @@ def test_store_load_watcher_appointment(db_manager, watcher_appointments):
         assert json.dumps(db_watcher_appointments[uuid], sort_keys=True, separators=(",", ":")) == appointment.to_json()
 
 
+def test_load_encrypted_blob(db_manager, watcher_appointments):
+    for uuid, appointment in watcher_appointments.items():
+        assert db_manager.load_encrypted_blob(uuid) == bytes.fromhex(appointment.encrypted_blob.data)
+
+    assert db_manager.load_encrypted_blob(uuid4().hex) is None
+
+
 def test_store_load_triggered_appointment(db_manager):
     db_watcher_appointments = db_manager.load_watcher_appointments()
     db_watcher_appointments_with_triggered = db_manager.load_watcher_appointments(include_triggered=True)
@@ -381,12 +392,23 @@ def test_store_load_last_block_hash_responder(db_manager):
     assert local_last_block_hash == db_last_block_hash
 
 
+def test_store_load_missed_confirmations(db_manager):
+    # Nothing is found if nothing has been stored
+    assert db_manager.load_missed_confirmations() == {}
+
+    missed_confirmations = {get_random_value_hex(32): i for i in range(10)}
+    db_manager.store_missed_confirmations(missed_confirmations)
+
+    assert db_manager.load_missed_confirmations() == missed_confirmations
+
+
 def test_create_triggered_appointment_flag(db_manager):
     # Test that flags are added
     key = get_random_value_hex(16)
     db_manager.create_triggered_appointment_flag(key)
 
     assert db_manager.db.get((TRIGGERED_APPOINTMENTS_PREFIX + key).encode("utf-8")) is not None
+    assert db_manager.is_triggered(key)
 
     # Test to get a random one that we haven't added
     key = get_random_value_hex(16)
@@ -405,6 +427,7 @@ def test_batch_create_triggered_appointment_flag(db_manager):
     db_manager.batch_create_triggered_appointment_flag(keys)
     db_flags = db_manager.load_all_triggered_flags()
     assert set(db_flags).issuperset(keys)
+    assert all(db_manager.is_triggered(key) for key in keys)
 
 
 def test_load_all_triggered_flags(db_manager):
@@ -430,6 +453,7 @@ def test_delete_triggered_appointment_flag(db_manager):
     # Try to load them back
     for k in keys:
         assert db_manager.db.get((TRIGGERED_APPOINTMENTS_PREFIX + k).encode("utf-8")) is None
+        assert not db_manager.is_triggered(k)
 
 
 def test_batch_delete_triggered_appointment_flag(db_manager):
@@ -445,7 +469,260 @@ def test_batch_delete_triggered_appointment_flag(db_manager):
     db_falgs = db_manager.load_all_triggered_flags()
     assert not set(db_falgs).issuperset(first_half)
     assert set(db_falgs).issuperset(second_half)
+    assert not any(db_manager.is_triggered(key) for key in first_half)
+    assert all(db_manager.is_triggered(key) for key in second_half)
 
     # Delete the rest
     db_manager.batch_delete_triggered_appointment_flag(second_half)
     assert not db_manager.load_all_triggered_flags()
+
+
+def test_is_triggered_loaded_on_init():
+    db_path = "triggered_test_db"
+    db_manager = DBManager(db_path)
+
+    uuid = uuid4().hex
+    assert not db_manager.is_triggered(uuid)
+    db_manager.create_triggered_appointment_flag(uuid)
+    db_manager.db.close()
+
+    # The flags are loaded back in memory when the db is reopened
+    db_manager = DBManager(db_path)
+    assert db_manager.is_triggered(uuid)
+
+    db_manager.db.close()
+    shutil.rmtree(db_path)
+
+
+def test_atomic_batch(db_manager):
+    uuid = uuid4().hex
+    locator = get_random_value_hex(LOCATOR_LEN_BYTES)
+    block_hash = get_random_value_hex(32)
+
+    with db_manager.atomic_batch():
+        db_manager.store_watcher_appointment(uuid, json.dumps({"locator": locator}))
+        db_manager.create_append_locator_map(locator, uuid)
+        db_manager.store_last_block_hash_watcher(block_hash)
+
+        # Nothing is written until the batch is done, but the pending writes can be read within it
+        assert db_manager.db.get((WATCHER_LAST_BLOCK_KEY).encode("utf-8")) != block_hash.encode("utf-8")
+        assert db_manager.load_watcher_appointment(uuid) == {"locator": locator}
+        assert db_manager.load_locator_map(locator) == [uuid]
+
+        # Deletions are also seen
+        db_manager.delete_watcher_appointment(uuid)
+        assert db_manager.load_watcher_appointment(uuid) is None
+
+    assert db_manager.load_last_block_hash_watcher() == block_hash
+    assert db_manager.load_watcher_appointment(uuid) is None
+    assert db_manager.load_locator_map(locator) == [uuid]
+
+
+def test_atomic_batch_exception(db_manager):
+    uuid = uuid4().hex
+    block_hash = db_manager.load_last_block_hash_watcher()
+
+    # If something goes wrong, none of the writes are committed
+    with pytest.raises(ValueError):
+        with db_manager.atomic_batch():
+            db_manager.store_watcher_appointment(uuid, json.dumps({}))
+            db_manager.store_last_block_hash_watcher(get_random_value_hex(32))
+            raise ValueError()
+
+    assert db_manager.load_watcher_appointment(uuid) is None
+    assert db_manager.load_last_block_hash_watcher() == block_hash
+
+    # And the db can be written normally afterwards
+    db_manager.store_watcher_appointment(uuid, json.dumps({}))
+    assert db_manager.load_watcher_appointment(uuid) == {}
+
+
+def test_atomic_batch_triggered_flags(db_manager):
+    uuid = uuid4().hex
+
+    # The in-memory flags are not updated if the batch is discarded
+    with pytest.raises(ValueError):
+        with db_manager.atomic_batch():
+            db_manager.batch_create_triggered_appointment_flag([uuid])
+            assert db_manager.is_triggered(uuid)
+            raise ValueError()
+
+    assert uuid not in db_manager.triggered_appointments and not db_manager.is_triggered(uuid)
+
+    # And only updated once the batch is written otherwise
+    with db_manager.atomic_batch():
+        db_manager.create_triggered_appointment_flag(uuid)
+        assert db_manager.is_triggered(uuid) and uuid not in db_manager.triggered_appointments
+
+    assert uuid in db_manager.triggered_appointments
+
+    with db_manager.atomic_batch():
+        db_manager.delete_triggered_appointment_flag(uuid)
+        assert not db_manager.is_triggered(uuid) and uuid in db_manager.triggered_appointments
+
+    assert uuid not in db_manager.triggered_appointments
+
+
+def test_atomic_batch_iterator(db_manager):
+    stored_uuid = uuid4().hex
+    db_manager.store_watcher_appointment(stored_uuid, json.dumps({}))
+
+    # Loading all the entries of a prefix within a batch also sees the pending writes and deletions
+    with db_manager.atomic_batch():
+        new_uuid = uuid4().hex
+        db_manager.store_watcher_appointment(new_uuid, json.dumps({}))
+        db_manager.delete_watcher_appointment(stored_uuid)
+
+        appointments = db_manager.load_appointments_db(prefix=WATCHER_PREFIX)
+        assert new_uuid in appointments and stored_uuid not in appointments
+
+        keys = set(db_manager.iterator(WATCHER_PREFIX.encode("utf-8"), include_value=False))
+        assert (WATCHER_PREFIX + new_uuid).encode("utf-8") in keys
+        assert (WATCHER_PREFIX + stored_uuid).encode("utf-8") not in keys
+
+    assert set(db_manager.load_appointments_db(prefix=WATCHER_PREFIX)) == set(appointments)
+
+
+def test_atomic_batch_other_threads(db_manager):
+    uuid = uuid4().hex
+
+    with db_manager.atomic_batch():
+        # Writes from other threads are not part of the batch
+        t = Thread(target=db_manager.store_responder_tracker, args=[uuid, json.dumps({})])
+        t.start()
+        t.join()
+
+        assert db_manager.db.get((RESPONDER_PREFIX + uuid).encode("utf-8")) is not None
+
+
+def test_atomic_batch_locator_map_other_threads(db_manager):
+    locator = get_random_value_hex(LOCATOR_LEN_BYTES)
+    uuids = [uuid4().hex, uuid4().hex]
+
+    # Updates of the same locator map from different threads do not overwrite each other
+    with db_manager.atomic_batch():
+        db_manager.create_append_locator_map(locator, uuids[0])
+
+        t = Thread(target=db_manager.create_append_locator_map, args=[locator, uuids[1]])
+        t.start()
+        t.join(timeout=0.5)
+        assert t.is_alive()
+
+    t.join()
+    assert db_manager.load_locator_map(locator) == uuids
+
+
+def test_store_watcher_appointment_binary_record(db_manager):
+    appointment = Appointment(get_random_value_hex(16), 10, 40, 20, get_random_value_hex(200))
+    uuid = uuid4().hex
+    db_manager.store_watcher_appointment(uuid, appointment.to_json())
+
+    # Appointments are stored as binary records but loaded as dicts
+    assert db_manager.db.get((WATCHER_PREFIX + uuid).encode("utf-8"))[:1] != b"{"
+    assert db_manager.load_watcher_appointment(uuid) == appointment.to_dict()
+    assert db_manager.load_watcher_appointments().get(uuid) == appointment.to_dict()
+
+
+def test_migrate_records(db_manager):
+    appointment = Appointment(get_random_value_hex(16), 10, 40, 20, get_random_value_hex(200))
+    appointment_uuid = uuid4().hex
+    tracker_uuid = uuid4().hex
+    tracker_data = {
+        "locator": get_random_value_hex(16),
+        "dispute_txid": get_random_value_hex(32),
+        "penalty_txid": get_random_value_hex(32),
+        "penalty_rawtx": get_random_value_hex(100),
+        "appointment_end": 100,
+    }
+
+    # Store the data as legacy json records
+    db_manager.create_entry(appointment_uuid, appointment.to_json(), prefix=WATCHER_PREFIX)
+    db_manager.create_entry(tracker_uuid, json.dumps(tracker_data), prefix=RESPONDER_PREFIX)
+    assert db_manager.load_watcher_appointment(appointment_uuid) == appointment.to_dict()
+    assert db_manager.load_responder_tracker(tracker_uuid) == tracker_data
+
+    assert db_manager.migrate_records() >= 2
+
+    # The records are now binary and the data is the same
+    assert db_manager.db.get((WATCHER_PREFIX + appointment_uuid).encode("utf-8"))[:1] != b"{"
+    assert db_manager.db.get((RESPONDER_PREFIX + tracker_uuid).encode("utf-8"))[:1] != b"{"
+    assert db_manager.load_watcher_appointment(appointment_uuid) == appointment.to_dict()
+    assert db_manager.load_responder_tracker(tracker_uuid) == tracker_data
+
+    # Nothing else is left to migrate
+    assert db_manager.migrate_records() == 0
+
+
+def test_store_load_watcher_snapshot():
+    db_path = "snapshot_test_db"
+    db_manager = DBManager(db_path)
+    block_hash = get_random_value_hex(32)
+    db_manager.store_last_block_hash_watcher(block_hash)
+
+    # No snapshot yet
+    assert db_manager.load_watcher_snapshot() is None
+
+    appointments = {}
+    for _ in range(5):
+        uuid = uuid4().hex
+        appointment = Appointment(get_random_value_hex(16), 10, 40, 20, get_random_value_hex(200))
+        db_manager.store_watcher_appointment(uuid, appointment.to_json())
+        appointments[uuid] = {"locator": appointment.locator, "end_time": appointment.end_time}
+
+    db_manager.store_watcher_snapshot(block_hash, appointments)
+    assert db_manager.load_watcher_snapshot() == appointments
+
+    # Appointments added after the snapshot are loaded from the db, triggered ones are left out
+    new_uuid = uuid4().hex
+    new_appointment = Appointment(get_random_value_hex(16), 10, 40, 20, get_random_value_hex(200))
+    db_manager.store_watcher_appointment(new_uuid, new_appointment.to_json())
+    triggered_uuid = list(appointments.keys())[0]
+    db_manager.create_triggered_appointment_flag(triggered_uuid)
+    appointments.pop(triggered_uuid)
+    db_manager.store_watcher_snapshot(block_hash, appointments)
+
+    snapshot = db_manager.load_watcher_snapshot()
+    assert set(snapshot.keys()) == set(appointments.keys()) | {new_uuid}
+    assert snapshot[new_uuid] == new_appointment.to_dict()
+
+    # The snapshot is not used if it contains data that is not in the db or if it was taken at a different block
+    db_manager.store_watcher_snapshot(
+        block_hash, {**appointments, uuid4().hex: {"locator": new_appointment.locator, "end_time": 40}}
+    )
+    assert db_manager.load_watcher_snapshot() is None
+
+    db_manager.store_watcher_snapshot(get_random_value_hex(32), appointments)
+    assert db_manager.load_watcher_snapshot() is None
+
+    db_manager.db.close()
+    shutil.rmtree(db_path)
+
+
+def test_store_load_responder_snapshot():
+    db_path = "snapshot_test_db"
+    db_manager = DBManager(db_path)
+    block_hash = get_random_value_hex(32)
+    db_manager.store_last_block_hash_responder(block_hash)
+
+    trackers = {}
+    for _ in range(5):
+        uuid = uuid4().hex
+        tracker_data = {
+            "locator": get_random_value_hex(16),
+            "dispute_txid": get_random_value_hex(32),
+            "penalty_txid": get_random_value_hex(32),
+            "penalty_rawtx": get_random_value_hex(100),
+            "appointment_end": 100,
+        }
+        db_manager.store_responder_tracker(uuid, json.dumps(tracker_data))
+        trackers[uuid] = {k: tracker_data[k] for k in ["penalty_txid", "locator", "appointment_end"]}
+
+    db_manager.store_responder_snapshot(block_hash, trackers)
+    assert db_manager.load_responder_snapshot() == trackers
+
+    # A tracker deleted from the db makes the snapshot outdated
+    db_manager.delete_responder_tracker(list(trackers.keys())[0])
+    assert db_manager.load_responder_snapshot() is None
+
+    db_manager.db.close()
+    shutil.rmtree(db_path)
@@ -0,0 +1,60 @@
+from teos.utils.header_chain import HeaderChain
+
+from test.teos.unit.conftest import get_random_value_hex
+
+
+def build_chain(header_chain, prev_block_hash, start_height, length):
+    # Adds a chain of random headers and returns their hashes (from the lowest to the highest)
+    block_hashes = []
+
+    for height in range(start_height, start_height + length):
+        block_hash = get_random_value_hex(32)
+        header_chain.add_header(block_hash, height, prev_block_hash)
+        block_hashes.append(block_hash)
+        prev_block_hash = block_hash
+
+    return block_hashes
+
+
+def test_connect():
+    header_chain = HeaderChain()
+    blocks = build_chain(header_chain, get_random_value_hex(32), 100, 10)
+    header_chain.connect(blocks[::-1])
+
+    assert header_chain.tip == blocks[-1]
+    assert header_chain.tip_height == 109 and header_chain.start_height == 100
+    assert all(header_chain.is_in_best_chain(block_hash) for block_hash in blocks)
+
+    # Unknown blocks can't be told apart
+    assert header_chain.is_in_best_chain(get_random_value_hex(32)) is None
+
+
+def test_connect_reorg():
+    header_chain = HeaderChain()
+    blocks = build_chain(header_chain, get_random_value_hex(32), 100, 10)
+    header_chain.connect(blocks[::-1])
+
+    # Fork from the 5th block with a shorter chain (3 blocks instead of 5). The old blocks are not in the best chain
+    # anymore but their heights are still known
+    fork = build_chain(header_chain, blocks[4], 105, 3)
+    header_chain.connect(fork[::-1])
+
+    assert header_chain.tip == fork[-1] and header_chain.tip_height == 107
+    assert all(header_chain.is_in_best_chain(block_hash) for block_hash in blocks[:5] + fork)
+    assert not any(header_chain.is_in_best_chain(block_hash) for block_hash in blocks[5:])
+    assert header_chain.get_height(blocks[-1]) == 109
+    assert 108 not in header_chain.best_chain and 109 not in header_chain.best_chain
+
+
+def test_prune():
+    header_chain = HeaderChain(max_size=10)
+    blocks = build_chain(header_chain, get_random_value_hex(32), 0, 50)
+
+    for i in range(len(blocks)):
+        header_chain.connect([blocks[i]])
+
+    # Old headers are dropped, and the blocks below the start of the chain can't be told anymore
+    assert len(header_chain.headers) <= 20
+    assert header_chain.start_height > 0
+    assert header_chain.is_in_best_chain(blocks[0]) is None
+    assert header_chain.is_in_best_chain(blocks[-1])
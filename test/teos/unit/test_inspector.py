@@ -2,7 +2,7 @@ from binascii import unhexlify
 
 from teos.errors import *
 from teos import LOG_PREFIX
-from teos.inspector import Inspector
+from teos.inspector import Inspector, load_public_key
 from teos.block_processor import BlockProcessor
 
 import common.cryptographer
@@ -197,6 +197,67 @@ def test_check_appointment_signature():
     )
 
 
+def test_check_signature_format():
+    _, client_pk = generate_keypair()
+    client_pk_hex = client_pk.format().hex()
+    signature = "d" * 104
+
+    assert Inspector.check_signature_format(signature, client_pk_hex) == APPOINTMENT_OK
+    assert Inspector.check_signature_format(None, client_pk_hex)[0] == APPOINTMENT_EMPTY_FIELD
+    assert Inspector.check_signature_format(signature, None)[0] == APPOINTMENT_EMPTY_FIELD
+    assert Inspector.check_signature_format(123, client_pk_hex)[0] == APPOINTMENT_WRONG_FIELD_TYPE
+
+    for pk in [client_pk_hex[:-2], client_pk_hex + "00", "R" * 66, 123]:
+        assert Inspector.check_signature_format(signature, pk)[0] == APPOINTMENT_WRONG_FIELD
+
+
+def test_load_public_key():
+    _, client_pk = generate_keypair()
+    client_pk_hex = client_pk.format().hex()
+
+    # Parsed keys are cached
+    pk = load_public_key(client_pk_hex)
+    assert pk.format() == client_pk.format()
+    assert load_public_key(client_pk_hex) is pk
+
+    # Keys that are not a valid point are not accepted
+    assert load_public_key("02" + "ff" * 32) is None
+
+
+def test_verify_signatures():
+    signed_messages = []
+    for _ in range(20):
+        appointment_data, _ = generate_dummy_appointment_data(real_height=False)
+        signed_messages.append(
+            (
+                Appointment.from_dict(appointment_data["appointment"]).serialize(),
+                appointment_data["signature"],
+                appointment_data["public_key"],
+            )
+        )
+
+    # Make a couple of them invalid (signed by someone else and wrongly encoded)
+    fake_sk, _ = generate_keypair()
+    message, _, pk = signed_messages[3]
+    signed_messages[3] = (message, Cryptographer.sign(message, fake_sk), pk)
+    message, _, pk = signed_messages[7]
+    signed_messages[7] = (message, "", pk)
+    expected = [i not in [3, 7] for i in range(len(signed_messages))]
+
+    # Signatures are verified in the calling thread by a single worker and by a process pool otherwise, with the same
+    # results and in the same order
+    single_worker_inspector = Inspector(block_processor, MIN_TO_SELF_DELAY, verify_workers=1)
+    assert single_worker_inspector.verify_signatures(signed_messages) == expected
+    assert single_worker_inspector.verifier is None
+
+    pooled_inspector = Inspector(block_processor, MIN_TO_SELF_DELAY, verify_workers=2)
+    assert pooled_inspector.verify_signatures(signed_messages) == expected
+    assert pooled_inspector.verifier is not None
+    assert pooled_inspector.verify_signatures([]) == []
+
+    pooled_inspector.shutdown()
+
+
 def test_inspect(run_bitcoind):
     # At this point every single check function has been already tested, let's test inspect with an invalid and a valid
     # appointments.
@@ -231,3 +292,33 @@ def test_inspect(run_bitcoind):
         and appointment.to_self_delay == to_self_delay
         and appointment.encrypted_blob.data == encrypted_blob
     )
+
+
+def test_inspect_batch(run_bitcoind):
+    client_sk, client_pk = generate_keypair()
+    client_pk_hex = client_pk.format().hex()
+
+    start_time = block_processor.get_block_count() + 5
+    appointment_data = {
+        "locator": get_random_value_hex(LOCATOR_LEN_BYTES),
+        "start_time": start_time,
+        "end_time": start_time + 20,
+        "to_self_delay": MIN_TO_SELF_DELAY,
+        "encrypted_blob": get_random_value_hex(64),
+    }
+    signature = Cryptographer.sign(Appointment.from_dict(appointment_data).serialize(), client_sk)
+    valid_request = {"appointment": appointment_data, "signature": signature, "public_key": client_pk_hex}
+
+    # An invalid one (wrong to_self_delay), a non-dict request and a request with a non-dict appointment
+    invalid_request = dict(valid_request, appointment=dict(appointment_data, to_self_delay=0))
+    requests_data = [valid_request, invalid_request, "appointment", {"appointment": []}, valid_request]
+
+    results = inspector.inspect_batch(requests_data)
+
+    # Results are returned in the same order the requests were given
+    assert len(results) == len(requests_data)
+    assert type(results[0]) == Appointment and results[0].locator == appointment_data["locator"]
+    assert type(results[4]) == Appointment and results[4].locator == appointment_data["locator"]
+    assert type(results[1]) == tuple and results[1][0] == APPOINTMENT_FIELD_TOO_SMALL
+    assert type(results[2]) == tuple and results[2][0] == APPOINTMENT_WRONG_FIELD_TYPE
+    assert type(results[3]) == tuple and results[3][0] == APPOINTMENT_WRONG_FIELD_TYPE
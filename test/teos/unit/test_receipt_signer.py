@@ -0,0 +1,67 @@
+from time import sleep
+from threading import Thread, Event
+
+import teos.receipt_signer
+from teos.receipt_signer import ReceiptSigner, LATENCY_PERCENTILES
+
+from common.cryptographer import Cryptographer
+
+from test.teos.unit.conftest import get_random_value_hex, generate_keypair
+
+
+signing_key, public_key = generate_keypair()
+
+
+def test_submit():
+    receipt_signer = ReceiptSigner(signing_key, workers=2, queue_size=10)
+    messages = [bytes.fromhex(get_random_value_hex(32)) for _ in range(20)]
+
+    # Every receipt resolves to the signature of its own message
+    receipts = [receipt_signer.submit(message) for message in messages]
+
+    for message, receipt in zip(messages, receipts):
+        rpk = Cryptographer.recover_pk(message, receipt.result(timeout=5))
+        assert Cryptographer.verify_rpk(public_key, rpk)
+
+    receipt_signer.queue.join()
+    assert receipt_signer.signed == len(messages) and len(receipt_signer.latencies) == len(messages)
+
+
+def test_submit_backpressure(monkeypatch):
+    # Block the only worker so the queue fills up
+    release = Event()
+
+    def blocking_sign(message, sk):
+        release.wait()
+        return message.hex()
+
+    monkeypatch.setattr(teos.receipt_signer.Cryptographer, "sign", blocking_sign)
+    receipt_signer = ReceiptSigner(signing_key, workers=1, queue_size=1)
+
+    receipts = [receipt_signer.submit(b"\x00")]
+    sleep(0.1)
+    receipts.append(receipt_signer.submit(b"\x01"))
+
+    # Submitting on top of a full queue blocks until the workers catch up
+    blocked_submission = Thread(target=lambda: receipts.append(receipt_signer.submit(b"\x02")), daemon=True)
+    blocked_submission.start()
+    sleep(0.1)
+    assert blocked_submission.is_alive()
+
+    release.set()
+    blocked_submission.join(timeout=5)
+    assert not blocked_submission.is_alive()
+    assert [receipt.result(timeout=5) for receipt in receipts] == ["00", "01", "02"]
+
+
+def test_get_latency_percentiles():
+    receipt_signer = ReceiptSigner(signing_key, workers=1, queue_size=1)
+
+    # Nothing has been signed yet
+    assert receipt_signer.get_latency_percentiles() == {}
+
+    receipt_signer.latencies.extend([i / 1000 for i in range(1, 101)])
+    percentiles = receipt_signer.get_latency_percentiles()
+
+    assert list(percentiles.keys()) == ["p{}".format(p) for p in LATENCY_PERCENTILES]
+    assert percentiles["p50"] == 51 and percentiles["p90"] == 91 and percentiles["p99"] == 100
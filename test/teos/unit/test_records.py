@@ -0,0 +1,107 @@
+import json
+import pytest
+
+from teos.utils.records import (
+    RECORD_VERSION,
+    encode_varint,
+    decode_varint,
+    encode_appointment,
+    decode_appointment,
+    decode_appointment_blob,
+    encode_tracker,
+    decode_tracker,
+)
+
+from common.appointment import Appointment
+
+from test.teos.unit.conftest import get_random_value_hex, generate_dummy_tracker
+
+
+def get_random_appointment():
+    return Appointment(get_random_value_hex(16), 10, 40, 20, get_random_value_hex(200))
+
+
+def test_encode_decode_varint():
+    for value in [0, 1, 127, 128, 300, 2**32, 2**64]:
+        data = b"\xff" + encode_varint(value)
+        assert decode_varint(data, 1) == (value, len(data))
+
+    # Small values take a single byte
+    assert len(encode_varint(127)) == 1 and len(encode_varint(128)) == 2
+
+
+def test_decode_varint_truncated():
+    with pytest.raises(ValueError):
+        decode_varint(encode_varint(2**32)[:-1], 0)
+
+
+def test_encode_decode_appointment():
+    appointment_data = get_random_appointment().to_dict()
+    record = encode_appointment(appointment_data)
+
+    # The record is smaller than the json and decodes to the same data
+    assert record[0] == RECORD_VERSION
+    assert len(record) < len(json.dumps(appointment_data)) // 2
+    assert decode_appointment(record) == appointment_data
+
+
+def test_encode_appointment_wrong_data():
+    appointment_data = get_random_appointment().to_dict()
+
+    # Data that does not fit the format cannot be encoded
+    wrong_data = [
+        dict(appointment_data, locator=appointment_data.get("locator").upper()),
+        dict(appointment_data, locator=get_random_value_hex(15)),
+        dict(appointment_data, encrypted_blob="abc"),
+        dict(appointment_data, end_time=-1),
+        dict(appointment_data, end_time="1"),
+        dict(appointment_data, extra_field=1),
+        {"locator": appointment_data.get("locator")},
+        None,
+    ]
+
+    for data in wrong_data:
+        assert encode_appointment(data) is None
+
+
+def test_decode_appointment_legacy():
+    appointment = get_random_appointment()
+    assert decode_appointment(appointment.to_json().encode("utf-8")) == appointment.to_dict()
+
+
+def test_decode_appointment_blob():
+    # The blob is given raw, both for binary and legacy records
+    appointment = get_random_appointment()
+    encrypted_blob = bytes.fromhex(appointment.encrypted_blob.data)
+
+    assert decode_appointment_blob(encode_appointment(appointment.to_dict())) == encrypted_blob
+    assert decode_appointment_blob(appointment.to_json().encode("utf-8")) == encrypted_blob
+
+    with pytest.raises(ValueError):
+        decode_appointment_blob(json.dumps({"locator": appointment.locator}).encode("utf-8"))
+
+
+def test_decode_wrong_record():
+    for record in [b"", b"\x00" + bytes(32), bytes([RECORD_VERSION]) + bytes(10)]:
+        with pytest.raises(ValueError):
+            decode_appointment(record)
+
+        with pytest.raises(ValueError):
+            decode_appointment_blob(record)
+
+        with pytest.raises(ValueError):
+            decode_tracker(record)
+
+
+def test_encode_decode_tracker():
+    tracker_data = generate_dummy_tracker().to_dict()
+    record = encode_tracker(tracker_data)
+
+    assert record[0] == RECORD_VERSION
+    assert decode_tracker(record) == tracker_data
+
+    # Legacy records are still decoded
+    assert decode_tracker(json.dumps(tracker_data).encode("utf-8")) == tracker_data
+
+    # And data that does not fit the format is not encoded
+    assert encode_tracker(dict(tracker_data, penalty_txid=None)) is None
@@ -5,13 +5,13 @@ from uuid import uuid4
 from queue import Queue
 from shutil import rmtree
 from copy import deepcopy
-from threading import Thread
+from threading import Thread, Event
 
 from teos.carrier import Carrier
 from teos.tools import bitcoin_cli
 from teos.db_manager import DBManager
 from teos.chain_monitor import ChainMonitor
-from teos.responder import Responder, TransactionTracker
+from teos.responder import Responder, TransactionTracker, MIN_CONFIRMATIONS
 
 from common.constants import LOCATOR_LEN_HEX
 from bitcoind_mock.transaction import create_dummy_transaction, create_tx_from_hex
@@ -157,7 +157,7 @@ def test_init_responder(temp_db_manager, carrier, block_processor):
     responder = Responder(temp_db_manager, carrier, block_processor)
     assert isinstance(responder.trackers, dict) and len(responder.trackers) == 0
     assert isinstance(responder.tx_tracker_map, dict) and len(responder.tx_tracker_map) == 0
-    assert isinstance(responder.unconfirmed_txs, list) and len(responder.unconfirmed_txs) == 0
+    assert isinstance(responder.unconfirmed_txs, set) and len(responder.unconfirmed_txs) == 0
     assert isinstance(responder.missed_confirmations, dict) and len(responder.missed_confirmations) == 0
     assert responder.block_queue.empty()
 
@@ -226,6 +226,9 @@ def test_add_tracker(responder):
         assert penalty_txid in responder.tx_tracker_map
         assert penalty_txid in responder.unconfirmed_txs
 
+        # The missed confirmation count is stored along with the tracker
+        assert responder.db_manager.load_missed_confirmations().get(penalty_txid) == 0
+
         # Check that the rest of tracker data also matches
         tracker = responder.trackers[uuid]
         assert (
@@ -235,6 +238,48 @@ def test_add_tracker(responder):
         )
 
 
+def test_add_tracker_while_locked(responder):
+    # Trackers added from other threads (e.g. the Watcher) wait until the Responder is done with the current block
+    uuid = uuid4().hex
+    locator, dispute_txid, penalty_txid, penalty_rawtx, appointment_end = create_dummy_tracker_data(random_txid=True)
+    adding_thread = Thread(
+        target=responder.add_tracker,
+        args=(uuid, locator, dispute_txid, penalty_txid, penalty_rawtx, appointment_end),
+        daemon=True,
+    )
+
+    with responder.lock:
+        adding_thread.start()
+        adding_thread.join(timeout=0.1)
+        assert adding_thread.is_alive() and uuid not in responder.trackers
+
+    adding_thread.join(timeout=5)
+    assert uuid in responder.trackers and penalty_txid in responder.unconfirmed_txs
+
+
+def test_handle_reorgs_within_watcher_batch(db_manager, carrier, block_processor):
+    # Breaches handled by the Watcher are written in the batch of the Watcher thread, so the Responder waits for it to
+    # be written before processing a block (or a reorg), otherwise the new tracker would not be found in the db
+    responder = Responder(db_manager, carrier, block_processor)
+    reorg_handled = Event()
+
+    def handle_reorg():
+        with db_manager.atomic_batch(), responder.lock:
+            responder.handle_reorgs(get_random_value_hex(32))
+        reorg_handled.set()
+
+    with db_manager.atomic_batch():
+        uuid = uuid4().hex
+        locator, _, penalty_txid, penalty_rawtx, appointment_end = create_dummy_tracker_data(random_txid=True)
+        responder.add_tracker(uuid, locator, get_random_value_hex(32), penalty_txid, penalty_rawtx, appointment_end)
+
+        Thread(target=handle_reorg, daemon=True).start()
+        assert not reorg_handled.wait(0.5)
+
+    assert reorg_handled.wait(5)
+    assert uuid in responder.trackers
+
+
 def test_add_tracker_same_penalty_txid(responder):
     confirmations = 0
     locator, dispute_txid, penalty_txid, penalty_rawtx, appointment_end = create_dummy_tracker_data(random_txid=True)
@@ -271,6 +316,9 @@ def test_add_tracker_already_confirmed(responder):
 
         assert penalty_txid not in responder.unconfirmed_txs
 
+        # Since the confirmation height is unknown, the tracker is scheduled to be checked at the appointment end
+        assert uuid in responder.height_tracker_map[appointment_end]
+
 
 def test_do_watch(temp_db_manager, carrier, block_processor):
     # Create a fresh responder to simplify the test
@@ -291,7 +339,7 @@ def test_do_watch(temp_db_manager, carrier, block_processor):
         }
         responder.tx_tracker_map[tracker.penalty_txid] = [uuid]
         responder.missed_confirmations[tracker.penalty_txid] = 0
-        responder.unconfirmed_txs.append(tracker.penalty_txid)
+        responder.unconfirmed_txs.add(tracker.penalty_txid)
 
         # We also need to store the info in the db
         responder.db_manager.create_triggered_appointment_flag(uuid)
@@ -341,24 +389,36 @@ def test_check_confirmations(db_manager, carrier, block_processor):
     txs = [get_random_value_hex(32) for _ in range(20)]
 
     # The responder has a list of unconfirmed transaction, let make that some of them are the ones we've received
-    responder.unconfirmed_txs = [get_random_value_hex(32) for _ in range(10)]
+    responder.unconfirmed_txs = {get_random_value_hex(32) for _ in range(10)}
     txs_subset = random.sample(txs, k=10)
-    responder.unconfirmed_txs.extend(txs_subset)
+    responder.unconfirmed_txs.update(txs_subset)
 
-    # We also need to add them to the tx_tracker_map since they would be there in normal conditions
-    responder.tx_tracker_map = {
-        txid: TransactionTracker(txid[:LOCATOR_LEN_HEX], txid, None, None, None) for txid in responder.unconfirmed_txs
-    }
+    # We also need to add them to the trackers and tx_tracker_map since they would be there in normal conditions
+    appointment_end = 100
+    for txid in responder.unconfirmed_txs:
+        uuid = uuid4().hex
+        responder.trackers[uuid] = {
+            "locator": txid[:LOCATOR_LEN_HEX],
+            "penalty_txid": txid,
+            "appointment_end": appointment_end,
+        }
+        responder.tx_tracker_map[txid] = [uuid]
 
     # Let's make sure that there are no txs with missed confirmations yet
     assert len(responder.missed_confirmations) == 0
 
-    responder.check_confirmations(txs)
+    height = appointment_end - 2
+    responder.check_confirmations(txs, height)
 
     # After checking confirmations the txs in txs_subset should be confirmed (not part of unconfirmed_txs anymore)
     # and the rest should have a missing confirmation
     for tx in txs_subset:
-        assert tx not in responder.unconfirmed_txs
+        assert tx not in responder.unconfirmed_txs and tx not in responder.missed_confirmations
+        assert responder.confirmation_heights[tx] == height
+
+        # The trackers of the confirmed txs are scheduled for when they have enough confirmations
+        completion_height = max(appointment_end, height + MIN_CONFIRMATIONS - 1)
+        assert responder.tx_tracker_map[tx][0] in responder.height_tracker_map[completion_height]
 
     for tx in responder.unconfirmed_txs:
         assert responder.missed_confirmations[tx] == 1
@@ -404,7 +464,7 @@ def test_get_completed_trackers(db_manager, carrier, block_processor):
     trackers_end_no_conf = {}
     for _ in range(10):
         tracker = create_dummy_tracker(penalty_rawtx=create_dummy_transaction().hex())
-        responder.unconfirmed_txs.append(tracker.penalty_txid)
+        responder.unconfirmed_txs.add(tracker.penalty_txid)
         trackers_end_no_conf[uuid4().hex] = tracker
 
     trackers_no_end = {}
@@ -425,6 +485,7 @@ def test_get_completed_trackers(db_manager, carrier, block_processor):
             "penalty_txid": tracker.penalty_txid,
             "appointment_end": tracker.appointment_end,
         }
+        responder.schedule_tracker(uuid, tracker.appointment_end)
 
     for uuid, tracker in all_trackers.items():
         bitcoin_cli(bitcoind_connect_params).sendrawtransaction(tracker.penalty_rawtx)
@@ -448,6 +509,74 @@ def test_get_completed_trackers(db_manager, carrier, block_processor):
     assert set(completed_trackers_ids) == set(ended_trackers_keys)
 
 
+def test_get_completed_trackers_known_confirmation_height(db_manager, carrier, block_processor):
+    responder = Responder(db_manager, carrier, block_processor)
+    height = 100
+
+    # Trackers with a known confirmation height do not need to query bitcoind to be completed
+    trackers_completed = {}
+    trackers_not_deep_enough = {}
+    trackers_not_due = {}
+
+    for i in range(30):
+        uuid = uuid4().hex
+        penalty_txid = get_random_value_hex(32)
+        tracker = {"locator": get_random_value_hex(16), "penalty_txid": penalty_txid, "appointment_end": height}
+
+        if i % 3 == 0:
+            responder.confirmation_heights[penalty_txid] = height - MIN_CONFIRMATIONS + 1
+            trackers_completed[uuid] = tracker
+
+        elif i % 3 == 1:
+            responder.confirmation_heights[penalty_txid] = height - 1
+            trackers_not_deep_enough[uuid] = tracker
+
+        else:
+            responder.confirmation_heights[penalty_txid] = height - MIN_CONFIRMATIONS + 1
+            tracker["appointment_end"] = height + 1
+            trackers_not_due[uuid] = tracker
+
+        responder.trackers[uuid] = tracker
+        responder.tx_tracker_map[penalty_txid] = [uuid]
+        responder.schedule_tracker(uuid, tracker.get("appointment_end"))
+
+    completed_trackers = responder.get_completed_trackers(height)
+
+    assert set(completed_trackers.keys()) == set(trackers_completed.keys())
+    assert all(confirmations == MIN_CONFIRMATIONS for confirmations in completed_trackers.values())
+
+    # The ones that are not deep enough are rescheduled to when they will have enough confirmations
+    for uuid, tracker in trackers_not_deep_enough.items():
+        assert uuid in responder.height_tracker_map[height - 1 + MIN_CONFIRMATIONS - 1]
+        assert uuid not in responder.height_tracker_map[height]
+
+    # And the ones that were not due are left untouched
+    for uuid in trackers_not_due:
+        assert uuid in responder.height_tracker_map[height + 1]
+
+
+def test_get_completed_trackers_scheduled_heights(db_manager, carrier, block_processor):
+    responder = Responder(db_manager, carrier, block_processor)
+    height = 100
+
+    # Trackers scheduled for later on are not even visited, only the due heights are popped from the heap
+    for i in range(1, 101):
+        uuid = uuid4().hex
+        responder.trackers[uuid] = {"penalty_txid": get_random_value_hex(32), "appointment_end": height + i}
+        responder.schedule_tracker(uuid, height + i)
+
+    assert responder.get_completed_trackers(height) == {}
+    assert sorted(responder.scheduled_heights) == list(range(height + 1, height + 101))
+
+    # Setting the schedule (e.g. when bootstrapping from the database) rebuilds the heap
+    responder.height_tracker_map = {height + 5: [uuid4().hex], height - 5: [uuid4().hex]}
+    assert responder.scheduled_heights[0] == height - 5 and len(responder.scheduled_heights) == 2
+
+    # Due heights whose trackers are gone are cleared, and the heights are not checked again
+    assert responder.get_completed_trackers(height) == {}
+    assert height - 5 not in responder.height_tracker_map and responder.scheduled_heights == [height + 5]
+
+
 def test_rebroadcast(db_manager, carrier, block_processor):
     responder = Responder(db_manager, carrier, block_processor)
     chain_monitor = ChainMonitor(Queue(), responder.block_queue, block_processor, bitcoind_feed_params)
@@ -475,7 +604,7 @@ def test_rebroadcast(db_manager, carrier, block_processor):
         responder.db_manager.store_responder_tracker(uuid, tracker.to_json())
 
         responder.tx_tracker_map[penalty_txid] = [uuid]
-        responder.unconfirmed_txs.append(penalty_txid)
+        responder.unconfirmed_txs.add(penalty_txid)
 
         # Let's add some of the txs in the rebroadcast list
         if (i % 2) == 0:
@@ -1,6 +1,7 @@
-from teos.tools import can_connect_to_bitcoind, in_correct_network, bitcoin_cli
+from teos.utils.auth_proxy import AuthServiceProxy
+from teos.tools import can_connect_to_bitcoind, in_correct_network, bitcoin_cli, bitcoin_cli_batch
 from common.tools import check_sha256_hex_format
-from test.teos.unit.conftest import bitcoind_connect_params
+from test.teos.unit.conftest import bitcoind_connect_params, get_random_value_hex
 
 
 def test_in_correct_network(run_bitcoind):
@@ -56,3 +57,33 @@ def test_check_sha256_hex_format():
     assert (
         check_sha256_hex_format("g123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef") is False
     )  # non-hex
+
+
+def test_bitcoin_cli_batch():
+    block_hash = bitcoin_cli(bitcoind_connect_params).getbestblockhash()
+    results = bitcoin_cli_batch(bitcoind_connect_params, "getblock", [(block_hash,), (get_random_value_hex(32),)])
+
+    # Results follow the order of the requests. Errors are reported per item
+    assert results[0][0].get("hash") == block_hash and results[0][1] is None
+    assert results[1][0] is None and results[1][1] is not None
+
+
+def test_bitcoin_cli_batch_ids(monkeypatch):
+    # Every batch numbers its own requests, so the ids don't depend on the calls made by other threads meanwhile
+    batches = []
+
+    def batch(self, requests):
+        batches.append([request.get("id") for request in requests])
+        return [{"id": request.get("id"), "result": request.get("params")[0], "error": None} for request in requests]
+
+    monkeypatch.setattr(AuthServiceProxy, "batch", batch)
+
+    for _ in range(2):
+        results = bitcoin_cli_batch(bitcoind_connect_params, "getblock", [("a",), ("b",), ("c",)])
+        assert results == [("a", None), ("b", None), ("c", None)]
+
+    assert batches == [[0, 1, 2], [0, 1, 2]]
+
+
+def test_bitcoin_cli_batch_empty():
+    assert bitcoin_cli_batch(bitcoind_connect_params, "getblock", []) == []
@@ -0,0 +1,104 @@
+import pytest
+
+from teos.utils.tx_parser import deserialize_tx, deserialize_block, TxReader, sha256d
+
+# Transaction f4184fc596403b9d638783cf57adfe4c75c605f6356fbc91338530e9831e9e16 (first bitcoin transaction between users)
+hex_tx = (
+    "0100000001c997a5e56e104102fa209c6a852dd90660a20b2d9c352423edce25857fcd3704000000004847304402"
+    "204e45e16932b8af514961a1d3a1a25fdf3f4f7732e9d624c6c61548ab5fb8cd410220181522ec8eca07de4860a4"
+    "acdd12909d831cc56cbbac4622082221a8768d1d0901ffffffff0200ca9a3b00000000434104ae1a62fe09c5f51b"
+    "13905f07f06b99a2f7159b2225f374cd378d71302fa28414e7aab37397f554a7df5f142c21c1b7303b8a0626f1ba"
+    "ded5c72a704f7e6cd84cac00286bee0000000043410411db93e1dcdb8a016b49840f8c53bc1eb68a382e97b1482e"
+    "cad7b148a6909a5cb2e0eaddfb84ccf9744464f82e160bfa9b8b64f9d4c03f999b8643f656b412a3ac00000000"
+)
+txid = "f4184fc596403b9d638783cf57adfe4c75c605f6356fbc91338530e9831e9e16"
+
+
+def to_segwit(raw_tx, witness_items):
+    # Adds the segwit marker and flag after the version and a witness for the (only) input before the locktime
+    witness = "{:02x}".format(len(witness_items)) + "".join(
+        "{:02x}".format(len(item) // 2) + item for item in witness_items
+    )
+    return raw_tx[:8] + "0001" + raw_tx[8:-8] + witness + raw_tx[-8:]
+
+
+def test_deserialize_tx():
+    tx = deserialize_tx(hex_tx)
+
+    assert tx.get("txid") == txid and tx.get("hash") == txid
+    assert tx.get("version") == 1 and tx.get("locktime") == 0
+    assert tx.get("size") == len(hex_tx) // 2 and tx.get("vsize") == tx.get("size")
+
+    assert len(tx.get("vin")) == 1
+    assert tx.get("vin")[0].get("txid") == "0437cd7f8525ceed2324359c2d0ba26006d92d856a9c20fa0241106ee5a597c9"
+    assert tx.get("vin")[0].get("vout") == 0
+
+    assert len(tx.get("vout")) == 2
+    assert tx.get("vout")[0].get("value") == 10 and tx.get("vout")[1].get("value") == 40
+
+
+def test_deserialize_segwit_tx():
+    segwit_tx = to_segwit(hex_tx, ["00" * 72, "02" + "11" * 32])
+    tx = deserialize_tx(segwit_tx)
+
+    # The txid does not commit to the witness, but the hash does
+    assert tx.get("txid") == txid and tx.get("hash") != txid
+    assert tx.get("size") == len(segwit_tx) // 2
+    assert tx.get("vsize") < tx.get("size")
+    assert tx.get("vin")[0].get("txinwitness") == ["00" * 72, "02" + "11" * 32]
+
+
+def test_deserialize_segwit_tx_empty_witness():
+    with pytest.raises(ValueError, match="Superfluous witness record"):
+        deserialize_tx(to_segwit(hex_tx, []))
+
+
+def test_deserialize_raw_tx():
+    # Raw transactions are deserialized straightaway, with the same result as hex encoded ones
+    assert deserialize_tx(bytes.fromhex(hex_tx)) == deserialize_tx(hex_tx)
+
+
+def test_deserialize_tx_wrong_data():
+    # Wrong types, non-hex data, truncated data and trailing data must all fail
+    for wrong_tx in [None, 1, "", hex_tx[::-1], hex_tx[:-1], hex_tx[:-2], hex_tx + "00", "zz" + hex_tx[2:]]:
+        with pytest.raises(ValueError):
+            deserialize_tx(wrong_tx)
+
+
+def test_deserialize_tx_no_inputs():
+    # Version followed by an empty input list
+    with pytest.raises(ValueError):
+        deserialize_tx("01000000" + "00" + "00" + "00000000")
+
+
+def test_read_compact_size():
+    assert TxReader(bytes.fromhex("fc")).read_compact_size() == 0xFC
+    assert TxReader(bytes.fromhex("fdfd00")).read_compact_size() == 0xFD
+    assert TxReader(bytes.fromhex("fe00000100")).read_compact_size() == 0x10000
+
+    # Non-canonical encodings and sizes over MAX_SIZE are rejected
+    for data in ["fd0100", "fe01000000", "ff0100000000000000", "fe00000003"]:
+        with pytest.raises(ValueError):
+            TxReader(bytes.fromhex(data)).read_compact_size()
+
+
+def test_deserialize_block():
+    prev_block_hash = "00" * 4 + "11" * 28
+    header = bytes.fromhex("01000000" + prev_block_hash + "22" * 32 + "00" * 12)
+    segwit_tx = to_segwit(hex_tx, ["00" * 72])
+    raw_block = header + bytes([2]) + bytes.fromhex(hex_tx + segwit_tx)
+
+    block = deserialize_block(raw_block)
+
+    # Hashes are given in the usual (reversed) byte order
+    assert block.get("hash") == sha256d(header)[::-1].hex()
+    assert block.get("previousblockhash") == bytes.fromhex(prev_block_hash)[::-1].hex()
+    assert block.get("tx") == [txid, txid]
+
+
+def test_deserialize_block_wrong_data():
+    header = bytes(80)
+
+    for wrong_block in [None, header.hex(), header, header + bytes([1]), header + bytes([0, 0])]:
+        with pytest.raises(ValueError):
+            deserialize_block(wrong_block)
@@ -1,8 +1,11 @@
+import heapq
 import pytest
 from uuid import uuid4
+from queue import Queue
 from shutil import rmtree
 from threading import Thread
 from coincurve import PrivateKey
+from bitcoind_mock.transaction import create_dummy_transaction
 
 from teos import LOG_PREFIX
 from teos.carrier import Carrier
@@ -12,6 +15,8 @@ from teos.responder import Responder
 from teos.db_manager import DBManager
 from teos.chain_monitor import ChainMonitor
 from teos.block_processor import BlockProcessor
+from teos.utils.appointment_store import AppointmentStore
+from teos.utils.tx_parser import deserialize_tx
 
 import common.cryptographer
 from common.logger import Logger
@@ -104,7 +109,7 @@ def create_appointments(n):
 
 
 def test_init(run_bitcoind, watcher):
-    assert isinstance(watcher.appointments, dict) and len(watcher.appointments) == 0
+    assert isinstance(watcher.appointments, AppointmentStore) and len(watcher.appointments) == 0
     assert isinstance(watcher.locator_uuid_map, dict) and len(watcher.locator_uuid_map) == 0
     assert watcher.block_queue.empty()
     assert isinstance(watcher.block_processor, BlockProcessor)
@@ -113,6 +118,9 @@ def test_init(run_bitcoind, watcher):
     assert isinstance(watcher.expiry_delta, int)
     assert isinstance(watcher.signing_key, PrivateKey)
 
+    # The mempool is not watched unless the feed is enabled
+    assert watcher.mempool_queue is None
+
 
 def test_add_appointment(watcher):
     # We should be able to add appointments up to the limit
@@ -120,7 +128,8 @@ def test_add_appointment(watcher):
         appointment, dispute_tx = generate_dummy_appointment(
             start_time_offset=START_TIME_OFFSET, end_time_offset=END_TIME_OFFSET
         )
-        added_appointment, sig = watcher.add_appointment(appointment)
+        added_appointment, receipt = watcher.add_appointment(appointment)
+        sig = receipt.result()
 
         assert added_appointment is True
         assert Cryptographer.verify_rpk(
@@ -128,23 +137,50 @@ def test_add_appointment(watcher):
         )
 
         # Check that we can also add an already added appointment (same locator)
-        added_appointment, sig = watcher.add_appointment(appointment)
+        added_appointment, receipt = watcher.add_appointment(appointment)
+        sig = receipt.result()
+
+        assert added_appointment is True
+        assert Cryptographer.verify_rpk(
+            watcher.signing_key.public_key, Cryptographer.recover_pk(appointment.serialize(), sig)
+        )
+
+
+def test_add_appointments(watcher):
+    # A batch of appointments is added at once, getting one receipt per appointment in the same order
+    appointments = [
+        generate_dummy_appointment(start_time_offset=START_TIME_OFFSET, end_time_offset=END_TIME_OFFSET)[0]
+        for _ in range(10)
+    ]
 
+    # Add one of them twice to check that appointments with the same locator are also accepted within a batch
+    appointments.append(appointments[0])
+    receipts = watcher.add_appointments(appointments)
+
+    assert len(receipts) == len(appointments)
+    for appointment, (added_appointment, receipt) in zip(appointments, receipts):
+        sig = receipt.result()
         assert added_appointment is True
         assert Cryptographer.verify_rpk(
             watcher.signing_key.public_key, Cryptographer.recover_pk(appointment.serialize(), sig)
         )
 
+    assert len(watcher.locator_uuid_map[appointments[0].locator]) >= 2
+
+    # An empty batch returns no receipts
+    assert watcher.add_appointments([]) == []
+
 
 def test_add_too_many_appointments(watcher):
     # Any appointment on top of those should fail
-    watcher.appointments = dict()
+    watcher.appointments = AppointmentStore()
 
     for _ in range(config.get("MAX_APPOINTMENTS")):
         appointment, dispute_tx = generate_dummy_appointment(
             start_time_offset=START_TIME_OFFSET, end_time_offset=END_TIME_OFFSET
         )
-        added_appointment, sig = watcher.add_appointment(appointment)
+        added_appointment, receipt = watcher.add_appointment(appointment)
+        sig = receipt.result()
 
         assert added_appointment is True
         assert Cryptographer.verify_rpk(
@@ -154,10 +190,10 @@ def test_add_too_many_appointments(watcher):
     appointment, dispute_tx = generate_dummy_appointment(
         start_time_offset=START_TIME_OFFSET, end_time_offset=END_TIME_OFFSET
     )
-    added_appointment, sig = watcher.add_appointment(appointment)
+    added_appointment, receipt = watcher.add_appointment(appointment)
 
     assert added_appointment is False
-    assert sig is None
+    assert receipt is None
 
 
 def test_do_watch(watcher, temp_db_manager):
@@ -168,13 +204,22 @@ def test_do_watch(watcher, temp_db_manager):
 
     # Set the data into the Watcher and in the db
     watcher.locator_uuid_map = locator_uuid_map
-    watcher.appointments = {}
+    watcher.appointments = AppointmentStore()
+    end_time_uuid_map = {}
 
     for uuid, appointment in appointments.items():
         watcher.appointments[uuid] = {"locator": appointment.locator, "end_time": appointment.end_time}
+
+        if appointment.end_time in end_time_uuid_map:
+            end_time_uuid_map[appointment.end_time].append(uuid)
+        else:
+            end_time_uuid_map[appointment.end_time] = [uuid]
+
         watcher.db_manager.store_watcher_appointment(uuid, appointment.to_json())
         watcher.db_manager.create_append_locator_map(appointment.locator, uuid)
 
+    watcher.end_time_uuid_map = end_time_uuid_map
+
     do_watch_thread = Thread(target=watcher.do_watch, daemon=True)
     do_watch_thread.start()
 
@@ -194,6 +239,81 @@ def test_do_watch(watcher, temp_db_manager):
     assert len(watcher.appointments) == 0
 
 
+def test_do_watch_mempool(watcher, temp_db_manager):
+    watcher.db_manager = temp_db_manager
+
+    appointments, locator_uuid_map, dispute_txs = create_appointments(APPOINTMENTS)
+
+    watcher.locator_uuid_map = locator_uuid_map
+    watcher.appointments = AppointmentStore()
+    end_time_uuid_map = {}
+
+    for uuid, appointment in appointments.items():
+        watcher.appointments[uuid] = {"locator": appointment.locator, "end_time": appointment.end_time}
+        end_time_uuid_map[appointment.end_time] = [uuid]
+
+        watcher.db_manager.store_watcher_appointment(uuid, appointment.to_json())
+        watcher.db_manager.create_append_locator_map(appointment.locator, uuid)
+
+    watcher.end_time_uuid_map = end_time_uuid_map
+
+    # Feed the mempool as the ChainMonitor would do if FEED_MEMPOOL is set
+    watcher.mempool_queue = Queue()
+    Thread(target=watcher.do_watch_mempool, daemon=True).start()
+
+    # Two dispute transactions reach the mempool (along with some data that is not a transaction). They are received raw
+    watcher.mempool_queue.put(bytes.fromhex(get_random_value_hex(32)))
+    for dispute_tx in dispute_txs[:2]:
+        bitcoin_cli(bitcoind_connect_params).sendrawtransaction(dispute_tx)
+        watcher.mempool_queue.put(bytes.fromhex(dispute_tx))
+
+    watcher.mempool_queue.join()
+
+    # The breaches are handled without waiting for a block, and flagged as triggered so they are not handled twice
+    assert len(watcher.appointments) == APPOINTMENTS - 2
+    for uuid in set(appointments) - set(watcher.appointments):
+        assert uuid in watcher.responder.trackers
+        assert uuid in watcher.db_manager.triggered_appointments
+
+
+def test_get_expired_appointments(watcher):
+    current_height = 100
+
+    # Create some appointments ending at different heights around the current one
+    uuids_by_end_time = {}
+    for end_time in range(current_height - config.get("EXPIRY_DELTA") - 5, current_height + 5):
+        uuids_by_end_time[end_time] = [uuid4().hex for _ in range(3)]
+
+    watcher.end_time_uuid_map = dict(uuids_by_end_time)
+    expired_appointments = watcher.get_expired_appointments(current_height)
+
+    # Only the ones where height > end_time + EXPIRY_DELTA should be returned
+    for end_time, uuids in uuids_by_end_time.items():
+        if current_height > end_time + config.get("EXPIRY_DELTA"):
+            assert set(uuids).issubset(expired_appointments)
+        else:
+            assert not set(uuids).intersection(expired_appointments)
+
+    # The expired end times are popped from the schedule
+    assert all(current_height <= end_time + config.get("EXPIRY_DELTA") for end_time in watcher.scheduled_end_times)
+
+
+def test_get_expired_appointments_scheduled_end_times(watcher):
+    current_height = 100
+    expired_end_time = current_height - config.get("EXPIRY_DELTA") - 1
+    uuids = [uuid4().hex for _ in range(3)]
+
+    # End times that are no longer in the map (e.g. all their appointments were triggered) are skipped
+    watcher.end_time_uuid_map = {expired_end_time: uuids, expired_end_time - 1: [uuid4().hex]}
+    watcher.end_time_uuid_map.pop(expired_end_time - 1)
+
+    # End times pushed more than once are only returned once
+    heapq.heappush(watcher.scheduled_end_times, expired_end_time)
+
+    assert watcher.get_expired_appointments(current_height) == uuids
+    assert watcher.scheduled_end_times == []
+
+
 def test_get_breaches(watcher, txids, locator_uuid_map):
     watcher.locator_uuid_map = locator_uuid_map
     potential_breaches = watcher.get_breaches(txids)
@@ -232,7 +352,7 @@ def test_filter_valid_breaches_random_data(watcher):
             breaches[dummy_appointment.locator] = dispute_txid
 
     watcher.locator_uuid_map = locator_uuid_map
-    watcher.appointments = appointments
+    watcher.appointments = AppointmentStore(appointments)
 
     valid_breaches, invalid_breaches = watcher.filter_valid_breaches(breaches)
 
@@ -271,3 +391,43 @@ def test_filter_valid_breaches(watcher):
 
     # We have "triggered" a single breach and it was valid.
     assert len(invalid_breaches) == 0 and len(valid_breaches) == 1
+
+
+def test_decrypt_penalties():
+    # A valid penalty, a blob that cannot be decrypted and a blob that does not contain a transaction
+    penalty_rawtx = create_dummy_transaction().hex()
+    dispute_txid = get_random_value_hex(32)
+    secret = bytes.fromhex(dispute_txid)
+
+    triggered_blobs = [
+        (Cryptographer.encrypt_raw(bytes.fromhex(penalty_rawtx), secret), dispute_txid, uuid4().hex),
+        (bytes.fromhex(get_random_value_hex(100)), dispute_txid, uuid4().hex),
+        (Cryptographer.encrypt_raw(bytes.fromhex(get_random_value_hex(32)), secret), dispute_txid, uuid4().hex),
+    ]
+
+    penalties = Watcher.decrypt_penalties(triggered_blobs)
+
+    assert penalties[0] == (deserialize_tx(penalty_rawtx), penalty_rawtx)
+    assert penalties[1] == (None, None) and penalties[2] == (None, None)
+
+
+def test_filter_valid_breaches_order(watcher):
+    # The breaches must be given in the same order no matter how many workers decrypt them
+    breaches = {}
+    locator_uuid_map = {}
+
+    for _ in range(10):
+        appointment, dispute_tx = generate_dummy_appointment()
+        uuid = uuid4().hex
+        watcher.db_manager.store_watcher_appointment(uuid, appointment.to_json())
+        locator_uuid_map[appointment.locator] = [uuid]
+        breaches[appointment.locator] = deserialize_tx(dispute_tx).get("txid")
+
+    watcher.locator_uuid_map = locator_uuid_map
+
+    for decrypt_workers in [1, 4]:
+        watcher.decrypt_workers = decrypt_workers
+        valid_breaches, invalid_breaches = watcher.filter_valid_breaches(breaches)
+
+        assert len(invalid_breaches) == 0
+        assert list(valid_breaches) == [uuids[0] for uuids in locator_uuid_map.values()]